@@ -0,0 +1,166 @@
+"""
+Admission control based on estimated in-flight bytes.
+
+Each endpoint has a budget of input bytes that may be combined at the same
+time: the upload ``Content-Length`` for ``/combine/`` and the pre-scanned folder
+size for ``/combine-folder/``. Background folder jobs and the specs of
+``/combine-batch/`` are admitted against the ``/combine-folder/`` budget by
+their pre-scanned size, so every combine that reads from disk shares one
+limit. A request that does not fit waits in a FIFO queue
+for up to ``queue_timeout`` seconds; when the queue is full or the wait times
+out it is rejected with ``AdmissionRejected`` (429 with ``Retry-After``).
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque
+
+from .config import settings
+from .metrics import (
+    ADMISSION_BUDGET,
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_LENGTH,
+    ADMISSION_REJECTED,
+    ADMISSION_WAIT,
+    REGISTRY,
+)
+
+
+class AdmissionRejected(Exception):
+    """A request could not be admitted within the byte budget."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, size: int, future: asyncio.Future) -> None:
+        self.size = size
+        self.future = future
+
+
+class AdmissionController:
+    """FIFO byte-budget semaphore for one endpoint; use from the event loop only."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        budget_bytes: int,
+        queue_timeout: float,
+        max_queue: int,
+        retry_after: int,
+    ) -> None:
+        self.endpoint = endpoint
+        self.budget_bytes = budget_bytes
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.in_flight_bytes = 0
+        self._waiters: Deque[_Waiter] = deque()
+
+    @property
+    def queue_length(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def admit(self, size: int) -> AsyncIterator[None]:
+        """Hold ``size`` bytes of the budget for the duration of the block.
+
+        A request larger than the whole budget is clamped to it, so it runs
+        alone instead of waiting forever.
+        """
+        size = min(max(size, 0), self.budget_bytes)
+        await self._acquire(size)
+        try:
+            yield
+        finally:
+            self.in_flight_bytes -= size
+            self._wake()
+
+    async def _acquire(self, size: int) -> None:
+        if not self._waiters and self.in_flight_bytes + size <= self.budget_bytes:
+            self.in_flight_bytes += size
+            ADMISSION_WAIT.observe(0.0, endpoint=self.endpoint)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", "Too many requests are waiting for admission.")
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(size, loop.create_future())
+        self._waiters.append(waiter)
+        started = loop.time()
+        try:
+            # Unlike wait_for, wait leaves the future alone on timeout or cancel
+            await asyncio.wait({waiter.future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.future.done():
+            self._abandon(waiter)
+            self._reject(
+                "timeout",
+                f"Not enough capacity for {size} bytes within "
+                f"{self.queue_timeout} seconds.",
+            )
+        ADMISSION_WAIT.observe(loop.time() - started, endpoint=self.endpoint)
+
+    def _wake(self) -> None:
+        """Admit queued requests in order while they fit into the budget."""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.future.done():
+                self._waiters.popleft()
+                continue
+            if self.in_flight_bytes + waiter.size > self.budget_bytes:
+                break
+            self._waiters.popleft()
+            self.in_flight_bytes += waiter.size
+            waiter.future.set_result(None)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Give up waiting; bytes already granted by ``_wake`` are released."""
+        if waiter.future.done():
+            self.in_flight_bytes -= waiter.size
+            self._wake()
+        else:
+            waiter.future.cancel()
+            self._drop(waiter)
+
+    def _drop(self, waiter: _Waiter) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        # The dropped request may have been blocking smaller ones behind it
+        self._wake()
+
+    def _reject(self, reason: str, message: str) -> None:
+        ADMISSION_REJECTED.inc(endpoint=self.endpoint, reason=reason)
+        raise AdmissionRejected(message, self.retry_after)
+
+    def refresh_metrics(self) -> None:
+        ADMISSION_BUDGET.set(self.budget_bytes, endpoint=self.endpoint)
+        ADMISSION_IN_FLIGHT.set(self.in_flight_bytes, endpoint=self.endpoint)
+        ADMISSION_QUEUE_LENGTH.set(self.queue_length, endpoint=self.endpoint)
+
+
+def _controller(endpoint: str, budget_bytes: int) -> AdmissionController:
+    return AdmissionController(
+        endpoint,
+        budget_bytes,
+        settings.admission_queue_timeout,
+        settings.admission_max_queue,
+        settings.admission_retry_after,
+    )
+
+
+upload_admission = _controller(
+    "combine_files_endpoint", settings.combine_max_in_flight_bytes
+)
+folder_admission = _controller(
+    "combine_folder_endpoint", settings.combine_folder_max_in_flight_bytes
+)
+REGISTRY.register_callback(upload_admission.refresh_metrics)
+REGISTRY.register_callback(folder_admission.refresh_metrics)
@@ -0,0 +1,206 @@
+"""
+Batch combine execution.
+
+Runs many combine specs concurrently under one concurrency limit and streams the
+results back as a zip archive. The limit is capped at the number of combine
+workers and specs wait for a free executor slot, so a batch neither fails specs
+nor fills the queue that interactive requests rely on. Each spec is admitted
+against the ``/combine-folder/`` byte budget by its pre-scanned size; a spec that
+cannot be admitted in time is reported as failed. Specs in one batch share a
+``ScanCache`` so that overlapping folders are listed and read only once.
+"""
+
+import asyncio
+import io
+import json
+import os
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from shared.cancellation import CancellationToken
+from shared.combine_logic import combine_files_content
+from shared.scan_logic import (
+    ScanCache,
+    estimate_directory_size,
+    read_file_group,
+    scan_directory,
+)
+from shared.stats import CombineStats
+
+from .admission import folder_admission
+from .executor import combine_executor
+from .metrics import CANCELLATIONS, observe_combine_stats, record_cache_lookups
+from .models import CombineSpec
+
+FORMAT_EXTENSIONS = {"markdown": "md", "json": "json", "yaml": "yaml"}
+MANIFEST_NAME = "manifest.json"
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink; ``zipfile`` falls back to data descriptors."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:  # type: ignore[override]
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def validate_spec_paths(spec: CombineSpec) -> None:
+    """Raise ``ValueError`` if the spec points at a missing folder or file."""
+    if spec.folder_path is not None:
+        if not os.path.isdir(spec.folder_path):
+            raise ValueError(
+                f"Folder path '{spec.folder_path}' does not exist or is not a directory."
+            )
+    else:
+        for path in spec.file_paths or []:
+            if not os.path.isfile(path):
+                raise ValueError(f"File path '{path}' does not exist or is not a file.")
+
+
+def entry_names(specs: List[CombineSpec]) -> List[str]:
+    """Build unique archive entry names for the specs, in order."""
+    names: List[str] = []
+    used = {MANIFEST_NAME}
+    for index, spec in enumerate(specs):
+        extension = FORMAT_EXTENSIONS[spec.output_format]
+        if spec.name:
+            base = spec.name
+        elif spec.folder_path:
+            base = os.path.basename(os.path.normpath(spec.folder_path)) or "root"
+        else:
+            base = f"group_{index:03d}"
+        candidate = f"{base}.{extension}"
+        suffix = 1
+        while candidate in used:
+            candidate = f"{base}_{suffix}.{extension}"
+            suffix += 1
+        used.add(candidate)
+        names.append(candidate)
+    return names
+
+
+def spec_size(spec: CombineSpec) -> int:
+    """Estimated input bytes of a spec, from file metadata only."""
+    if spec.folder_path is not None:
+        return estimate_directory_size(
+            spec.folder_path, spec.max_depth, spec.extensions_list()
+        )
+    total = 0
+    for path in spec.file_paths or []:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            # A file that vanished adds nothing to read
+            pass
+    return total
+
+
+def run_spec(
+    spec: CombineSpec, cache: ScanCache, cancel: Optional[CancellationToken] = None
+) -> Tuple[str, int]:
+    """Execute one spec synchronously; returns the combined text and file count."""
+    extensions_list = spec.extensions_list()
+    stats = CombineStats()
+    if spec.folder_path is not None:
+        file_data_list = scan_directory(
+            spec.folder_path,
+            spec.max_depth,
+            extensions_list,
+            cache=cache,
+            stats=stats,
+            cancel=cancel,
+        )
+    else:
+        file_data_list = read_file_group(
+            spec.file_paths or [], cache=cache, stats=stats, cancel=cancel
+        )
+    combined = combine_files_content(
+        file_data_list,
+        spec.sort_mode,
+        extensions_list,
+        spec.preprocessing_options(),
+        spec.output_format,
+        stats=stats,
+        cancel=cancel,
+    )
+    observe_combine_stats(stats, "combine_batch_endpoint")
+    return combined, len(file_data_list)
+
+
+def batch_concurrency(requested: int) -> int:
+    """How many specs of a batch may run at once; at most the combine workers."""
+    return max(1, min(requested, combine_executor.workers))
+
+
+async def stream_batch_zip(
+    specs: List[CombineSpec], max_concurrency: int
+) -> AsyncIterator[bytes]:
+    """
+    Run all specs and yield a zip archive incrementally.
+
+    Each result is added to the archive as soon as it finishes. Failures do not
+    abort the batch; they are reported in ``manifest.json`` at the end. If the
+    client disconnects, specs still running stop at their next file.
+    """
+    cache = ScanCache()
+    cancel = CancellationToken()
+    semaphore = asyncio.Semaphore(batch_concurrency(max_concurrency))
+    names = entry_names(specs)
+
+    async def _run(index: int) -> Tuple[int, Any, int]:
+        async with semaphore:
+            try:
+                size = await combine_executor.run_when_free(spec_size, specs[index])
+                async with folder_admission.admit(size):
+                    combined, file_count = await combine_executor.run_when_free(
+                        run_spec, specs[index], cache, cancel
+                    )
+            except Exception as e:  # noqa: BLE001 - reported per spec in manifest
+                return index, e, 0
+            return index, combined, file_count
+
+    buffer = _ZipStreamBuffer()
+    manifest: List[Dict[str, Any]] = [{} for _ in specs]
+    tasks = [asyncio.ensure_future(_run(i)) for i in range(len(specs))]
+    try:
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for finished in asyncio.as_completed(tasks):
+                index, outcome, file_count = await finished
+                entry: Dict[str, Any] = {"name": names[index], "index": index}
+                if isinstance(outcome, Exception):
+                    entry.update(status="error", error=str(outcome))
+                else:
+                    archive.writestr(names[index], outcome)
+                    entry.update(status="ok", files=file_count)
+                manifest[index] = entry
+                yield buffer.drain()
+            archive.writestr(
+                MANIFEST_NAME,
+                json.dumps(
+                    {
+                        "results": manifest,
+                        "cache": {"hits": cache.hits, "misses": cache.misses},
+                    },
+                    ensure_ascii=False,
+                    indent=2,
+                ),
+            )
+        yield buffer.drain()
+    finally:
+        if not cancel.cancelled and any(not task.done() for task in tasks):
+            CANCELLATIONS.inc(endpoint="combine_batch_endpoint", stage="batch")
+        cancel.cancel()
+        for task in tasks:
+            task.cancel()
+        record_cache_lookups("batch_scan", cache.hits, cache.misses)
@@ -0,0 +1,54 @@
+"""
+Backend configuration.
+
+Settings are read from environment variables with the ``FILE_COMBINER_`` prefix,
+e.g. ``FILE_COMBINER_ENABLE_DEBUG_PROFILE=true``.
+"""
+
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Runtime settings of the backend."""
+
+    # Allow `debug_profile=true` on /combine-folder/ to return a cProfile report
+    enable_debug_profile: bool = False
+    # Number of hottest functions included in a debug profile report
+    debug_profile_top: int = 25
+    # Worker threads running the blocking combine pipeline
+    combine_workers: int = 4
+    # Combine calls that may wait for a worker before new ones are rejected
+    combine_queue_size: int = 32
+    # Estimated input bytes that may be combined at once, per endpoint
+    combine_max_in_flight_bytes: int = 256 * 1024 * 1024
+    combine_folder_max_in_flight_bytes: int = 512 * 1024 * 1024
+    # Seconds a request over the byte budget waits before it is rejected
+    admission_queue_timeout: float = 10.0
+    # Requests that may wait for the byte budget at once, per endpoint
+    admission_max_queue: int = 64
+    # Retry-After (seconds) sent with 429 responses from admission control
+    admission_retry_after: int = 5
+    # Seconds between client disconnect checks while a combine runs
+    disconnect_poll_interval: float = 0.25
+    # Share one computation between identical concurrent /combine-folder/ calls
+    coalesce_folder_requests: bool = True
+    # Directory of the on-disk store of finished /combine-folder/ outputs
+    # (defaults to a folder in the system temp directory)
+    output_store_dir: Optional[str] = None
+    # Size cap of the output store; 0 disables it
+    output_store_max_bytes: int = 1024 * 1024 * 1024
+    # SQLite file of the persistent folder index; unset disables the index.
+    # With the index, folder combines only re-list directories whose mtime
+    # changed and lstat the indexed files of the others (see shared.folder_index)
+    folder_index_path: Optional[str] = None
+    # Files kept in the in-memory search index; the least recently searched
+    # folders are evicted first. 0 disables the cap
+    search_index_max_files: int = 100_000
+
+    class Config:
+        env_prefix = "FILE_COMBINER_"
+
+
+settings = Settings()
@@ -0,0 +1,40 @@
+"""
+Cancelling combine work when the client goes away.
+
+The combine runs on a worker thread, so it cannot notice a closed connection by
+itself. ``cancel_on_disconnect`` polls ``request.is_disconnected()`` from the
+event loop while the work runs and trips a ``CancellationToken`` that the scan,
+read, preprocess and render stages check before every file.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Request
+
+from shared.cancellation import CancellationToken
+
+from .config import settings
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(request: Request) -> AsyncIterator[CancellationToken]:
+    """Yield a token that is cancelled once the client disconnects."""
+    token = CancellationToken()
+
+    async def watch() -> None:
+        while not token.cancelled:
+            if await request.is_disconnected():
+                token.cancel()
+                return
+            await asyncio.sleep(settings.disconnect_poll_interval)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        yield token
+    except asyncio.CancelledError:
+        token.cancel()
+        raise
+    finally:
+        watcher.cancel()
@@ -0,0 +1,124 @@
+"""
+Bounded executor for the blocking combine pipeline.
+
+Scanning, reading, preprocessing and rendering are synchronous; run on the event
+loop, one large request would stall every other client, health checks included.
+Endpoints hand that work to a dedicated pool of ``workers`` threads instead. At
+most ``queue_size`` further calls wait for a free worker; calls beyond that are
+rejected with ``ExecutorSaturated`` rather than queued without bound. Batch
+work uses ``run_when_free`` instead, which waits for a slot.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from .config import settings
+from .metrics import (
+    EXECUTOR_ACTIVE,
+    EXECUTOR_QUEUE_WAIT,
+    EXECUTOR_QUEUED,
+    EXECUTOR_REJECTED,
+    EXECUTOR_SATURATION,
+    EXECUTOR_WORKERS,
+    REGISTRY,
+)
+
+T = TypeVar("T")
+
+# Backoff between capacity checks in run_when_free, in seconds
+_FIRST_RETRY_DELAY = 0.01
+_MAX_RETRY_DELAY = 0.5
+
+
+class ExecutorSaturated(RuntimeError):
+    """All workers are busy and the queue is full."""
+
+
+class CombineExecutor:
+    """Thread pool with a bounded queue and saturation counters."""
+
+    def __init__(self, workers: int, queue_size: int, name: str = "combine") -> None:
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.active = 0
+        self.queued = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def saturation(self) -> float:
+        """Share of workers and queue slots in use, from 0 to 1."""
+        return (self.active + self.queued) / self.capacity
+
+    def ensure_capacity(self) -> None:
+        """Raise ``ExecutorSaturated`` if a new call would be rejected."""
+        if self.active + self.queued >= self.capacity:
+            EXECUTOR_REJECTED.inc(executor=self.name)
+            raise ExecutorSaturated(
+                f"All {self.workers} {self.name} workers are busy and "
+                f"{self.queue_size} requests are already queued."
+            )
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``func(*args, **kwargs)`` on a worker thread and await its result."""
+        with self._lock:
+            self.ensure_capacity()
+            self.queued += 1
+        return await self._submit(functools.partial(func, *args, **kwargs))
+
+    async def run_when_free(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Like ``run``, but wait with backoff while the executor is saturated."""
+        delay = _FIRST_RETRY_DELAY
+        while True:
+            with self._lock:
+                if self.active + self.queued < self.capacity:
+                    self.queued += 1
+                    break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _MAX_RETRY_DELAY)
+        return await self._submit(functools.partial(func, *args, **kwargs))
+
+    async def _submit(self, call: Callable[[], T]) -> T:
+        # The caller has already counted the call in ``queued``
+        future = self._pool.submit(self._call, call, time.perf_counter())
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A call cancelled before it started never reaches _call
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def _call(self, call: Callable[[], T], submitted: float) -> T:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        EXECUTOR_QUEUE_WAIT.observe(time.perf_counter() - submitted, executor=self.name)
+        try:
+            return call()
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def refresh_metrics(self) -> None:
+        EXECUTOR_WORKERS.set(self.workers, executor=self.name)
+        EXECUTOR_ACTIVE.set(self.active, executor=self.name)
+        EXECUTOR_QUEUED.set(self.queued, executor=self.name)
+        EXECUTOR_SATURATION.set(self.saturation, executor=self.name)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+combine_executor = CombineExecutor(settings.combine_workers, settings.combine_queue_size)
+REGISTRY.register_callback(combine_executor.refresh_metrics)
@@ -0,0 +1,107 @@
+"""
+Background combine jobs with Server-Sent Events progress.
+
+A job runs a coroutine that combines on the combine executor while its
+``ProgressTracker`` collects counters from the scan, read and render stages. Subscribers of the events
+stream receive throttled progress snapshots; with no subscribers the tracker
+only increments counters.
+"""
+
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from shared.progress import ProgressTracker
+
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+class CombineJob:
+    """State of one background combine."""
+
+    def __init__(self, job_id: str, media_type: str) -> None:
+        self.id = job_id
+        self.media_type = media_type
+        self.progress = ProgressTracker()
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.progress.finished
+
+
+class JobRegistry:
+    """In-memory registry of combine jobs; keeps the most recent finished ones."""
+
+    def __init__(self, max_finished: int = 100) -> None:
+        self.max_finished = max_finished
+        self._jobs: OrderedDict[str, CombineJob] = OrderedDict()
+
+    def start(
+        self, work: Callable[[ProgressTracker], Awaitable[str]], media_type: str
+    ) -> CombineJob:
+        """Schedule ``work(progress)`` as a task and register the job.
+
+        ``work`` is responsible for admission and for running the combine on the
+        combine executor.
+        """
+        job = CombineJob(uuid.uuid4().hex, media_type)
+        self._jobs[job.id] = job
+        job.task = asyncio.ensure_future(self._run(job, work))
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[CombineJob]:
+        return self._jobs.get(job_id)
+
+    async def _run(
+        self, job: CombineJob, work: Callable[[ProgressTracker], Awaitable[str]]
+    ) -> None:
+        try:
+            job.result = await work(job.progress)
+        except Exception as e:  # noqa: BLE001 - surfaced through the job result
+            job.error = str(e)
+        finally:
+            job.progress.finish()
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """Serialize one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_job_events(job: CombineJob) -> AsyncIterator[str]:
+    """Yield SSE messages for a job until it finishes."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[Dict] = asyncio.Queue()
+
+    def listener(snapshot: Dict) -> None:
+        # Stage hooks run in a worker thread.
+        loop.call_soon_threadsafe(queue.put_nowait, snapshot)
+
+    unsubscribe = job.progress.subscribe(listener)
+    try:
+        yield format_sse("progress", job.progress.snapshot())
+        while not job.done:
+            try:
+                snapshot = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse("progress", snapshot)
+    finally:
+        unsubscribe()
+
+    if job.error is not None:
+        yield format_sse("error", {"job_id": job.id, "detail": job.error})
+    else:
+        yield format_sse("done", {"job_id": job.id, "progress": job.progress.snapshot()})
@@ -4,18 +4,79 @@ Main FastAPI application.
 This module provides the main API for file combination functionality.
 """
 
+import io
 import os
-import tempfile
+import re
+import time
+import zipfile
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Set, Tuple
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, PlainTextResponse
-from shared.combine_logic import combine_files_content  # Импортируем логику из shared
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+
+from shared.cancellation import CancellationToken, OperationCancelled
+from shared.combine_logic import FileCorpus, combine_files_content
+from shared.content_filter import ContentFilter
+from shared.excerpt import Excerpt
+from shared.folder_index import FolderIndex
+from shared.passthrough import can_pass_through, write_folder_markdown
+from shared.pipeline import check_options as check_preprocessing_options
+from shared.progress import ProgressTracker
+from shared.scan_logic import (
+    DirectoryManifest,
+    DirEntryInfo,
+    directory_manifest,
+    scan_directory,
+)
+from shared.search_index import SearchIndex
+from shared.stats import CombineStats, measure_stage
+
+from .admission import AdmissionRejected, folder_admission, upload_admission
+from .batch import FORMAT_EXTENSIONS, stream_batch_zip, validate_spec_paths
+from .config import settings
+from .disconnect import cancel_on_disconnect
+from .executor import ExecutorSaturated, combine_executor
+from .jobs import JobRegistry, stream_job_events
+from .metrics import (
+    CANCELLATIONS,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    MetricsMiddleware,
+    observe_combine_stats,
+    record_cache_lookups,
+)
+from .models import BatchCombineRequest
+from .output_store import RangeFileResponse, StoredOutput, output_store
+from .profiling import profile_call, server_timing_header, stage_timings_ms
+from .single_flight import folder_flights
 
 app = FastAPI(title="File Combiner API", description="API for combining file contents.")
 
+# Background combine jobs, observable through Server-Sent Events
+jobs = JobRegistry()
+
+# Trigram index over scanned folders, kept up to date on every search
+search_index = SearchIndex(settings.search_index_max_files)
+
+# Persistent index of folder metadata, enabled by settings.folder_index_path
+folder_index = (
+    FolderIndex(settings.folder_index_path) if settings.folder_index_path else None
+)
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "yaml": "application/yaml",
+    "markdown": "text/markdown",
+}
+
 
 # CORS middleware configuration
 app.add_middleware(
@@ -31,6 +92,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts, latencies and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
+
+
+# Errors with their own exception handlers pass through the endpoints' generic
+# error handling
+HANDLED_ERRORS = (ExecutorSaturated, AdmissionRejected, OperationCancelled)
+
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.exception_handler(OperationCancelled)
+async def operation_cancelled_handler(request: Request, exc: OperationCancelled):
+    endpoint = request.scope.get("endpoint")
+    CANCELLATIONS.inc(endpoint=getattr(endpoint, "__name__", "unknown"), stage=exc.stage)
+    # 499 Client Closed Request; nobody is left to read the response
+    return Response(status_code=499)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -50,6 +141,7 @@ async def read_root():
 
 @app.post("/combine/", response_class=PlainTextResponse)
 async def combine_files_endpoint(
+    request: Request,
     files: List[UploadFile] = File(...),
     sort_mode: str = Form("name"),
     extensions: Optional[str] = Form(None),
@@ -57,6 +149,9 @@ async def combine_files_endpoint(
     remove_extra_empty_lines: bool = Form(False),
     normalize_line_endings: bool = Form(False),
     remove_trailing_whitespace: bool = Form(False),
+    strip_comments: bool = Form(False),
+    redact_secrets: bool = Form(False),
+    preprocessors: Optional[str] = Form(None),
 ):
     """
     Combines uploaded files.
@@ -69,6 +164,16 @@ async def combine_files_endpoint(
     - **normalize_line_endings**: Normalize line endings to LF (
     ).
     - **remove_trailing_whitespace**: Remove trailing whitespace from lines.
+    - **strip_comments**: Remove comments (and Python docstrings) from source
+      files such as `.py`, `.js`, `.ts` and `.go`, keeping string literals.
+    - **redact_secrets**: Replace API keys, tokens, private keys and e-mail
+      addresses with `[REDACTED:<rule>]`; counts are reported per file and in
+      the output metadata.
+    - **preprocessors**: Space-separated names of additional preprocessing
+      stages, such as installed plugins.
+
+    Uploads are admitted against an in-flight byte budget by `Content-Length`;
+    requests that do not fit in time are rejected with 429 and `Retry-After`.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded.")
@@ -96,45 +201,39 @@ async def combine_files_endpoint(
         raise HTTPException(
             status_code=400, detail=f"Invalid output_format: {output_format}"
         )
+    preprocessing_options = _preprocessing_options(
+        remove_extra_empty_lines,
+        normalize_line_endings,
+        remove_trailing_whitespace,
+        strip_comments,
+        redact_secrets,
+        preprocessors,
+    )
+    request.state.output_format = output_format
+    stats = CombineStats()
+    started = time.perf_counter()
 
     try:
-        # Convert UploadFile to format expected by our function
-        file_data_list = []
-        with tempfile.TemporaryDirectory() as _tmpdirname:
-            for file in files:
-                # Read file content
-                content = await file.read()
-                # Decode from bytes to str (assuming UTF-8)
-                try:
-                    content_str = content.decode("utf-8")
-                except UnicodeDecodeError:
-                    # If not UTF-8, use replacement characters
-                    content_str = content.decode("utf-8", errors="replace")
-
-                file_data_list.append(
-                    {
-                        "name": file.filename,
-                        "content": content_str,
-                        "last_modified": datetime.now(),  # Use upload time as "modified time"
-                    }
-                )
-
-        # Prepare preprocessing options
-        preprocessing_options = {
-            "remove_extra_empty_lines": remove_extra_empty_lines,
-            "normalize_line_endings": normalize_line_endings,
-            "remove_trailing_whitespace": remove_trailing_whitespace,
-        }
-
-        # Call combine logic with new parameters
+        # Admit by upload size, then combine off the event loop
+        upload_bytes = int(request.headers.get("content-length") or 0) or sum(
+            file.size or 0 for file in files
+        )
         try:
-            combined_content = combine_files_content(
-                file_data_list,
-                sort_mode,
-                extensions_list,
-                preprocessing_options,
-                output_format,
-            )
+            async with upload_admission.admit(upload_bytes), cancel_on_disconnect(
+                request
+            ) as cancel:
+                combined_content = await combine_executor.run(
+                    _combine_uploads,
+                    files,
+                    sort_mode,
+                    extensions_list,
+                    preprocessing_options,
+                    output_format,
+                    stats,
+                    cancel,
+                )
+        except HANDLED_ERRORS:
+            raise
         except ValueError as e:
             # Handle specific validation errors from combine logic
             raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}") from e
@@ -157,8 +256,19 @@ async def combine_files_endpoint(
         }
         media_type = media_type_map.get(output_format, "text/plain")
 
-        return PlainTextResponse(content=combined_content, media_type=media_type)
+        observe_combine_stats(stats, "combine_files_endpoint")
+        return PlainTextResponse(
+            content=combined_content,
+            media_type=media_type,
+            headers={
+                "Server-Timing": server_timing_header(
+                    stats, time.perf_counter() - started
+                )
+            },
+        )
 
+    except HANDLED_ERRORS:
+        raise
     except (ValueError, TypeError) as e:
         # Handle validation and type errors
         raise HTTPException(status_code=400, detail=f"Invalid request: {str(e)}") from e
@@ -169,30 +279,58 @@ async def combine_files_endpoint(
         ) from e
 
 
-@app.post("/combine-folder/", response_class=PlainTextResponse)
-async def combine_folder_endpoint(
-    folder_path: str = Form(...),
-    sort_mode: str = Form("name"),
-    extensions: Optional[str] = Form(None),
-    output_format: str = Form("markdown"),
-    remove_extra_empty_lines: bool = Form(False),
-    normalize_line_endings: bool = Form(False),
-    remove_trailing_whitespace: bool = Form(False),
-    max_depth: int = Form(0),  # 0 means unlimited depth
-):
-    """
-    Combines files from a specified folder.
+def _combine_uploads(
+    files: List[UploadFile],
+    sort_mode: str,
+    extensions_list: Optional[List[str]],
+    preprocessing_options: Dict[str, bool],
+    output_format: str,
+    stats: CombineStats,
+    cancel: Optional[CancellationToken] = None,
+) -> str:
+    """Read and decode uploaded files and combine them; runs synchronously."""
+    file_data_list = []
+    for file in files:
+        if cancel is not None:
+            cancel.raise_if_cancelled("read")
+        # Read file content; each upload's bytes are released once decoded
+        with stats.measure("read"):
+            content = file.file.read()
+        stats.count("bytes_read", len(content))
+        # Decode from bytes to str (assuming UTF-8)
+        with stats.measure("decode"):
+            try:
+                content_str = content.decode("utf-8")
+            except UnicodeDecodeError:
+                # If not UTF-8, use replacement characters
+                content_str = content.decode("utf-8", errors="replace")
 
-    - **folder_path**: Path to the folder containing files to combine.
-    - **sort_mode**: Sorting mode ('name', 'date_asc', 'date_desc').
-    - **extensions**: String with space-separated extensions (e.g., ".txt .md").
-    - **output_format**: Output format ('markdown', 'json', 'yaml').
-    - **remove_extra_empty_lines**: Remove extra empty lines.
-    - **normalize_line_endings**: Normalize line endings to LF (
-    ).
-    - **remove_trailing_whitespace**: Remove trailing whitespace from lines.
-    - **max_depth**: Maximum folder depth to process (0 for unlimited).
-    """
+        file_data_list.append(
+            {
+                "name": file.filename,
+                "content": content_str,
+                "last_modified": datetime.now(),  # Use upload time as "modified time"
+            }
+        )
+    return combine_files_content(
+        file_data_list,
+        sort_mode,
+        extensions_list,
+        preprocessing_options,
+        output_format,
+        stats=stats,
+        cancel=cancel,
+    )
+
+
+def _validate_folder_request(
+    folder_path: str,
+    sort_mode: str,
+    extensions: Optional[str],
+    output_format: str,
+    max_depth: int,
+) -> Tuple[Optional[List[str]], str]:
+    """Validate folder combine options; returns parsed extensions and output format."""
     # Validate folder_path
     if not os.path.isdir(folder_path):
         raise HTTPException(
@@ -231,92 +369,539 @@ async def combine_folder_endpoint(
             status_code=400, detail=f"Invalid output_format: {output_format}"
         )
 
-    try:
-        # Read files from folder recursively with depth limit
-        file_data_list = []
+    return extensions_list, output_format
 
-        # Function for recursive directory scanning
-        def scan_directory(current_path, current_depth, relative_root):
-            # Stop recursion if max_depth is set and reached
-            if max_depth > 0 and current_depth > max_depth:
-                return
 
-            try:
-                for entry in os.scandir(current_path):
-                    # Get relative path from root folder
-                    relative_path = (
-                        os.path.relpath(entry.path, relative_root)
-                        if relative_root
-                        else entry.name
-                    )
+def _output_formats(output_format: str) -> List[str]:
+    """Parse a space- or comma-separated list of output formats."""
+    formats: List[str] = []
+    for name in output_format.replace(",", " ").lower().split():
+        if name not in FORMAT_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid output_format: {name}")
+        if name not in formats:
+            formats.append(name)
+    if not formats:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid output_format: {output_format}"
+        )
+    return formats
 
-                    if entry.is_file():
-                        # Filter by extensions if specified
-                        if extensions_list:
-                            if any(
-                                entry.name.lower().endswith(ext)
-                                for ext in extensions_list
-                            ):
-                                pass  # File matches filter
-                            else:
-                                continue  # Skip file
-
-                        # Read file content
-                        try:
-                            with open(entry.path, encoding="utf-8") as f:
-                                content_str = f.read()
-                        except UnicodeDecodeError:
-                            # Use replacement for non-UTF-8 files
-                            with open(
-                                entry.path, encoding="utf-8", errors="replace"
-                            ) as f:
-                                content_str = f.read()
-
-                        # Get file modification time
-                        last_modified_timestamp = os.path.getmtime(entry.path)
-                        last_modified_datetime = datetime.fromtimestamp(
-                            last_modified_timestamp
-                        )
 
-                        # Create more descriptive filename with path
-                        file_name_with_path = (
-                            relative_path if current_depth > 0 else entry.name
-                        )
+def _preprocessing_options(
+    remove_extra_empty_lines: bool,
+    normalize_line_endings: bool,
+    remove_trailing_whitespace: bool,
+    strip_comments: bool,
+    redact_secrets: bool,
+    preprocessors: Optional[str],
+) -> Dict[str, bool]:
+    """Preprocessing options from form fields; unknown stage names are a 400."""
+    extra = preprocessors.split() if preprocessors else []
+    try:
+        check_preprocessing_options(extra)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    options = {
+        "remove_extra_empty_lines": remove_extra_empty_lines,
+        "normalize_line_endings": normalize_line_endings,
+        "remove_trailing_whitespace": remove_trailing_whitespace,
+        "strip_comments": strip_comments,
+        "redact_secrets": redact_secrets,
+    }
+    options.update(dict.fromkeys(extra, True))
+    return options
 
-                        file_data_list.append(
-                            {
-                                "name": file_name_with_path,
-                                "content": content_str,
-                                "last_modified": last_modified_datetime,
-                                "relative_path": relative_path,  # Add relative path for JSON
-                            }
-                        )
-                    elif entry.is_dir():
-                        # Recursively process subdirectories
-                        scan_directory(entry.path, current_depth + 1, relative_root)
-            except PermissionError:
-                # Skip directories we can't access
-                pass
-
-        # Start scanning from root folder
-        scan_directory(folder_path, 0, folder_path)
-
-        # Prepare preprocessing options
-        preprocessing_options = {
-            "remove_extra_empty_lines": remove_extra_empty_lines,
-            "normalize_line_endings": normalize_line_endings,
-            "remove_trailing_whitespace": remove_trailing_whitespace,
-        }
 
-        # Call combine logic with new parameters
+def _validate_search_query(query: str, regex: bool) -> None:
+    if not query:
+        raise HTTPException(status_code=400, detail="Search query must not be empty.")
+    if regex:
         try:
-            combined_content = combine_files_content(
-                file_data_list,
+            re.compile(query)
+        except re.error as e:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid regular expression: {e}"
+            ) from e
+
+
+def _combine_folder(
+    folder_path: str,
+    max_depth: int,
+    extensions_list: Optional[List[str]],
+    sort_mode: str,
+    preprocessing_options: Dict[str, bool],
+    output_format: str,
+    stats: CombineStats,
+    progress: Optional[ProgressTracker] = None,
+    cancel: Optional[CancellationToken] = None,
+    section_index: Optional[List[Dict[str, Any]]] = None,
+    search: Optional[Tuple[str, bool, bool]] = None,
+    content_filter: Optional[ContentFilter] = None,
+    excerpt: Optional[Excerpt] = None,
+    out: Optional[BinaryIO] = None,
+    follow_symlinks: bool = True,
+) -> Optional[str]:
+    """
+    Scan a folder and combine its files; runs synchronously.
+
+    ``search`` is a (query, regex, ignore_case) triple restricting the combine
+    to files matching the query, looked up through the search index.
+    ``content_filter`` selects files by their content while they are read and
+    ``excerpt`` limits how much of each file is read. Without
+    ``follow_symlinks`` symbolic links are skipped; either way every directory
+    and file is read once, however many links lead to it.
+
+    With ``out`` the markdown document is written into that file as bytes
+    copied from the files without decoding them, and None is returned. This
+    is only valid when ``can_pass_through`` allows it and neither a content
+    filter nor an excerpt is given.
+    """
+    only_paths = _search_paths(
+        folder_path, max_depth, extensions_list, stats, cancel, search
+    )
+    lister = _folder_lister()
+    if out is not None:
+        write_folder_markdown(
+            out,
+            folder_path,
+            max_depth,
+            extensions_list,
+            sort_mode,
+            progress=progress,
+            stats=stats,
+            cancel=cancel,
+            only_paths=only_paths,
+            section_index=section_index,
+            lister=lister,
+            follow_symlinks=follow_symlinks,
+        )
+        return None
+    file_data_list = scan_directory(
+        folder_path,
+        max_depth,
+        extensions_list,
+        progress=progress,
+        stats=stats,
+        cancel=cancel,
+        only_paths=only_paths,
+        content_filter=content_filter,
+        excerpt=excerpt,
+        lister=lister,
+        follow_symlinks=follow_symlinks,
+    )
+    return combine_files_content(
+        file_data_list,
+        sort_mode,
+        extensions_list,
+        preprocessing_options,
+        output_format,
+        progress=progress,
+        stats=stats,
+        cancel=cancel,
+        section_index=section_index,
+    )
+
+
+def _combine_folder_archive(
+    folder_path: str,
+    max_depth: int,
+    extensions_list: Optional[List[str]],
+    sort_mode: str,
+    preprocessing_options: Dict[str, bool],
+    output_formats: List[str],
+    stats: CombineStats,
+    cancel: Optional[CancellationToken] = None,
+    search: Optional[Tuple[str, bool, bool]] = None,
+    content_filter: Optional[ContentFilter] = None,
+    excerpt: Optional[Excerpt] = None,
+    follow_symlinks: bool = True,
+) -> bytes:
+    """
+    Scan a folder once and return a zip archive with one combine per format.
+
+    The files are read once into a ``FileCorpus`` that every format is
+    rendered from; preprocessing runs once for all of them. Entries are named
+    ``combined.<extension>`` (see ``FORMAT_EXTENSIONS``).
+    """
+    only_paths = _search_paths(
+        folder_path, max_depth, extensions_list, stats, cancel, search
+    )
+    corpus = FileCorpus(
+        scan_directory(
+            folder_path,
+            max_depth,
+            extensions_list,
+            stats=stats,
+            cancel=cancel,
+            only_paths=only_paths,
+            content_filter=content_filter,
+            excerpt=excerpt,
+            lister=_folder_lister(),
+            follow_symlinks=follow_symlinks,
+        )
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for output_format in output_formats:
+            content = corpus.render(
                 sort_mode,
                 extensions_list,
                 preprocessing_options,
                 output_format,
+                stats=stats,
+                cancel=cancel,
             )
+            archive.writestr(f"combined.{FORMAT_EXTENSIONS[output_format]}", content)
+    return buffer.getvalue()
+
+
+def _search_paths(
+    folder_path: str,
+    max_depth: int,
+    extensions_list: Optional[List[str]],
+    stats: CombineStats,
+    cancel: Optional[CancellationToken],
+    search: Optional[Tuple[str, bool, bool]],
+) -> Optional[Set[str]]:
+    """Paths of the files matching ``search`` or None when there is no search."""
+    if search is None:
+        return None
+    query, regex, ignore_case = search
+    with measure_stage(stats, "search"):
+        search_index.update(folder_path, max_depth, extensions_list, cancel)
+        return search_index.matching_paths(
+            folder_path,
+            query,
+            regex,
+            ignore_case,
+            max_depth,
+            extensions_list,
+            cancel,
+        )
+
+
+def _folder_manifest(
+    folder_path: str,
+    max_depth: int,
+    extensions_list: Optional[List[str]],
+    cancel: Optional[CancellationToken] = None,
+    follow_symlinks: bool = True,
+) -> DirectoryManifest:
+    """
+    Manifest of the files a folder combine reads.
+
+    With the folder index enabled the index is refreshed first, and the combine
+    then lists directories from it (see ``_folder_lister``).
+    """
+    if folder_index is None:
+        return directory_manifest(
+            folder_path, max_depth, extensions_list, follow_symlinks
+        )
+    folder_index.refresh(folder_path, cancel=cancel)
+    return folder_index.manifest(folder_path, max_depth, extensions_list, follow_symlinks)
+
+
+def _folder_lister() -> Optional[Callable[[str], List[DirEntryInfo]]]:
+    """Directory lister for folder scans: the folder index when it is enabled."""
+    return folder_index.list_directory if folder_index is not None else None
+
+
+def _folder_request_key(
+    folder_path: str,
+    max_depth: int,
+    extensions_list: Optional[List[str]],
+    sort_mode: str,
+    preprocessing_options: Dict[str, bool],
+    output_format: str,
+    fingerprint: str,
+    search: Optional[Tuple[str, bool, bool]] = None,
+    content_rules: Optional[Tuple[Optional[str], Optional[str], bool]] = None,
+    excerpt_rules: Tuple[int, int, int] = (0, 0, 0),
+    follow_symlinks: bool = True,
+) -> Tuple:
+    """Key under which identical folder combines are coalesced and stored."""
+    return (
+        os.path.realpath(folder_path),
+        max_depth,
+        tuple(sorted(extensions_list or ())),
+        sort_mode,
+        tuple(sorted(preprocessing_options.items())),
+        output_format,
+        fingerprint,
+        search,
+        content_rules,
+        excerpt_rules,
+        follow_symlinks,
+    )
+
+
+def _open_stored_output(key: Optional[Tuple]) -> Optional[StoredOutput]:
+    """Look ``key`` up in the output store, counting the hit or miss."""
+    if key is None or not output_store.enabled:
+        return None
+    stored = output_store.open(key)
+    hit = stored is not None
+    record_cache_lookups("output_store", int(hit), int(not hit))
+    return stored
+
+
+@app.post("/combine-folder/", response_class=PlainTextResponse)
+async def combine_folder_endpoint(
+    request: Request,
+    folder_path: str = Form(...),
+    sort_mode: str = Form("name"),
+    extensions: Optional[str] = Form(None),
+    output_format: str = Form("markdown"),
+    remove_extra_empty_lines: bool = Form(False),
+    normalize_line_endings: bool = Form(False),
+    remove_trailing_whitespace: bool = Form(False),
+    strip_comments: bool = Form(False),
+    redact_secrets: bool = Form(False),
+    preprocessors: Optional[str] = Form(None),
+    max_depth: int = Form(0),  # 0 means unlimited depth
+    debug_profile: bool = Form(False),
+    search_query: Optional[str] = Form(None),
+    search_regex: bool = Form(False),
+    search_ignore_case: bool = Form(False),
+    content_pattern: Optional[str] = Form(None),
+    content_exclude_pattern: Optional[str] = Form(None),
+    content_regex: bool = Form(False),
+    head_lines: int = Form(0),
+    tail_lines: int = Form(0),
+    max_bytes_per_file: int = Form(0),
+    follow_symlinks: bool = Form(True),
+):
+    """
+    Combines files from a specified folder.
+
+    - **folder_path**: Path to the folder containing files to combine.
+    - **sort_mode**: Sorting mode ('name', 'date_asc', 'date_desc').
+    - **extensions**: String with space-separated extensions (e.g., ".txt .md").
+    - **output_format**: Output format ('markdown', 'json', 'yaml'). Several
+      space- or comma-separated formats (e.g. "markdown json") return a zip
+      archive with `combined.md`, `combined.json` and/or `combined.yaml`,
+      all rendered from a single read of the folder.
+    - **remove_extra_empty_lines**: Remove extra empty lines.
+    - **normalize_line_endings**: Normalize line endings to LF (
+    ).
+    - **remove_trailing_whitespace**: Remove trailing whitespace from lines.
+    - **strip_comments**: Remove comments (and Python docstrings) from source
+      files such as `.py`, `.js`, `.ts` and `.go`, keeping string literals.
+    - **redact_secrets**: Replace API keys, tokens, private keys and e-mail
+      addresses with `[REDACTED:<rule>]`; counts are reported per file and in
+      the output metadata.
+    - **preprocessors**: Space-separated names of additional preprocessing
+      stages, such as installed plugins.
+    - **max_depth**: Maximum folder depth to process (0 for unlimited).
+    - **debug_profile**: Return a JSON report with stage timings and the hottest
+      functions instead of the document. Requires `FILE_COMBINER_ENABLE_DEBUG_PROFILE`.
+      Only one request is profiled at a time; while another profile runs the
+      report has `"profile": null` and the `X-Debug-Profile: skipped` header.
+    - **search_query**: Combine only files containing this text (see `/search/`).
+    - **search_regex**: Treat `search_query` as a regular expression.
+    - **search_ignore_case**: Match `search_query` case-insensitively.
+    - **content_pattern**: Combine only files whose content contains this text.
+    - **content_exclude_pattern**: Skip files whose content contains this text.
+    - **content_regex**: Treat both content patterns as regular expressions.
+    - **head_lines**: Include only the first N lines of each file (0 for all).
+    - **tail_lines**: Include only the last N lines of each file (0 for all);
+      combined with `head_lines` both ends are kept.
+    - **max_bytes_per_file**: Byte limit for the start and for the end of each
+      file; alone it keeps the first N bytes. Cut files carry an
+      `[... N bytes omitted ...]` marker.
+    - **follow_symlinks**: Follow symbolic links to files and folders; when
+      off they are skipped. Either way every folder and file is read once,
+      so link loops and hard links do not repeat content.
+
+    Per-stage durations are returned in the `Server-Timing` header. The combine
+    runs on a bounded worker pool; when it is saturated the endpoint responds 503.
+    Requests whose pre-scanned folder size does not fit into the in-flight byte
+    budget wait for room and are rejected with 429 and `Retry-After` on timeout.
+    Identical concurrent requests for an unchanged folder share one combine; the
+    responses that joined it carry `X-Combine-Coalesced: 1`. Finished outputs
+    are kept in a size-capped on-disk store and served from it (marked with
+    `X-Combine-Cache: hit`) until a file in the folder changes; stored outputs
+    support `Range` requests for resuming downloads. Responses served from the
+    store carry `X-Combine-Output-Id`; for markdown it gives access to single
+    file sections via `/outputs/{output_id}/sections/`.
+    """
+    output_formats = _output_formats(output_format)
+    extensions_list, output_format = _validate_folder_request(
+        folder_path, sort_mode, extensions, output_formats[0], max_depth
+    )
+    archive_formats = output_formats if len(output_formats) > 1 else None
+    if archive_formats is not None:
+        output_format = "zip"
+    if debug_profile and not settings.enable_debug_profile:
+        raise HTTPException(
+            status_code=403, detail="Debug profiling is disabled on this server."
+        )
+    if debug_profile and archive_formats is not None:
+        raise HTTPException(
+            status_code=400, detail="debug_profile takes a single output_format."
+        )
+    search = None
+    if search_query:
+        _validate_search_query(search_query, search_regex)
+        search = (search_query, search_regex, search_ignore_case)
+    content_rules = content_filter = None
+    if content_pattern or content_exclude_pattern:
+        content_rules = (content_pattern, content_exclude_pattern, content_regex)
+        try:
+            content_filter = ContentFilter(*content_rules)
+        except re.error as e:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid content pattern: {e}"
+            ) from e
+    excerpt_rules = (head_lines, tail_lines, max_bytes_per_file)
+    try:
+        excerpt = Excerpt(*excerpt_rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    preprocessing_options = _preprocessing_options(
+        remove_extra_empty_lines,
+        normalize_line_endings,
+        remove_trailing_whitespace,
+        strip_comments,
+        redact_secrets,
+        preprocessors,
+    )
+    request.state.output_format = output_format
+    started = time.perf_counter()
+
+    try:
+        try:
+            async with cancel_on_disconnect(request) as cancel:
+                manifest = await combine_executor.run(
+                    _folder_manifest,
+                    folder_path,
+                    max_depth,
+                    extensions_list,
+                    cancel,
+                    follow_symlinks,
+                )
+                key = None
+                if not debug_profile:
+                    key = _folder_request_key(
+                        folder_path,
+                        max_depth,
+                        extensions_list,
+                        sort_mode,
+                        preprocessing_options,
+                        " ".join(output_formats),
+                        manifest.fingerprint,
+                        search,
+                        content_rules,
+                        excerpt_rules,
+                        follow_symlinks,
+                    )
+
+                # Without text transforms the files' bytes are copied into the
+                # store as they are, without decoding them
+                passthrough = (
+                    key is not None
+                    and output_store.enabled
+                    and content_filter is None
+                    and not excerpt.active
+                    and can_pass_through(preprocessing_options, output_format)
+                )
+
+                async def compute(token: CancellationToken, passthrough=passthrough):
+                    stats = CombineStats()
+
+                    def work(section_index=None, out=None) -> Optional[str]:
+                        # Read files from folder recursively with depth limit
+                        # and combine them
+                        return _combine_folder(
+                            folder_path,
+                            max_depth,
+                            extensions_list,
+                            sort_mode,
+                            preprocessing_options,
+                            output_format,
+                            stats,
+                            cancel=token,
+                            section_index=section_index,
+                            search=search,
+                            content_filter=content_filter,
+                            excerpt=excerpt,
+                            out=out,
+                            follow_symlinks=follow_symlinks,
+                        )
+
+                    def work_and_store() -> Optional[bytes]:
+                        if archive_formats is not None:
+                            # Every format is rendered from one read of the
+                            # folder
+                            content = _combine_folder_archive(
+                                folder_path,
+                                max_depth,
+                                extensions_list,
+                                sort_mode,
+                                preprocessing_options,
+                                archive_formats,
+                                stats,
+                                cancel=token,
+                                search=search,
+                                content_filter=content_filter,
+                                excerpt=excerpt,
+                                follow_symlinks=follow_symlinks,
+                            )
+                            output_store.put(key, content)
+                            return content
+                        # Markdown outputs get a section index sidecar
+                        index = (
+                            []
+                            if output_format == "markdown" and output_store.enabled
+                            else None
+                        )
+                        if passthrough:
+                            stored = output_store.put_stream(
+                                key, lambda out: work(index, out), index
+                            )
+                            if stored:
+                                # Responses open the stored copy
+                                return None
+                            # Larger than the whole store: keep it in memory
+                            index = []
+                        # Encode once so coalesced waiters share one buffer
+                        content = work(index).encode("utf-8")
+                        output_store.put(key, content, index)
+                        return content
+
+                    async with folder_admission.admit(manifest.total_bytes):
+                        # The client may have left while the request was queued
+                        token.raise_if_cancelled("admission")
+                        if debug_profile:
+                            content, profile = await combine_executor.run(
+                                profile_call, work, top=settings.debug_profile_top
+                            )
+                        else:
+                            content = await combine_executor.run(work_and_store)
+                            profile = None
+                    observe_combine_stats(stats, "combine_folder_endpoint")
+                    return content, stats, profile
+
+                stored = _open_stored_output(key)
+                cache_hit = stored is not None
+                coalesced = False
+                if cache_hit:
+                    combined_content, stats, profile = None, CombineStats(), None
+                elif debug_profile or not settings.coalesce_folder_requests:
+                    combined_content, stats, profile = await compute(cancel)
+                else:
+                    result, coalesced = await folder_flights.run(key, compute, cancel)
+                    combined_content, stats, profile = result
+                if combined_content is None and not cache_hit:
+                    stored = output_store.open(key)
+                    if stored is None:
+                        # The passthrough output was evicted before it could
+                        # be opened; render it again in memory
+                        combined_content, stats, profile = await compute(
+                            cancel, passthrough=False
+                        )
+        except HANDLED_ERRORS:
+            raise
         except Exception as e:
             # Catch errors from shared logic
             raise HTTPException(
@@ -328,11 +913,44 @@ async def combine_folder_endpoint(
             "json": "application/yaml",
             "yaml": "application/yaml",
             "markdown": "text/markdown",
+            "zip": "application/zip",
         }
         media_type = media_type_map.get(output_format, "text/plain")
 
-        return PlainTextResponse(content=combined_content, media_type=media_type)
+        total = time.perf_counter() - started
+        headers = {"Server-Timing": server_timing_header(stats, total)}
+        if coalesced:
+            headers["X-Combine-Coalesced"] = "1"
+        if archive_formats is not None:
+            headers["Content-Disposition"] = 'attachment; filename="combined.zip"'
+        if cache_hit:
+            headers["X-Combine-Cache"] = "hit"
+        elif stored is None and key is not None:
+            # Serve the freshly stored copy so even the first response can be
+            # resumed with a Range request
+            stored = output_store.open(key) if output_store.enabled else None
+        if stored is not None:
+            headers["X-Combine-Output-Id"] = stored.digest
+            return RangeFileResponse(request, stored, media_type, headers)
+        if debug_profile:
+            if profile is None:
+                headers["X-Debug-Profile"] = "skipped"
+            return JSONResponse(
+                content={
+                    "result": combined_content,
+                    "media_type": media_type,
+                    "server_timing_ms": stage_timings_ms(stats),
+                    "total_ms": round(total * 1000, 3),
+                    "profile": profile,
+                },
+                headers=headers,
+            )
+        return PlainTextResponse(
+            content=combined_content, media_type=media_type, headers=headers
+        )
 
+    except HANDLED_ERRORS:
+        raise
     except Exception as e:
         # Catch any other unexpected errors
         raise HTTPException(
@@ -340,6 +958,338 @@ async def combine_folder_endpoint(
         ) from e
 
 
+@app.post("/search/")
+async def search_endpoint(
+    request: Request,
+    folder_path: str = Form(...),
+    query: str = Form(...),
+    regex: bool = Form(False),
+    ignore_case: bool = Form(False),
+    extensions: Optional[str] = Form(None),
+    max_depth: int = Form(0),
+    max_files: int = Form(100),
+    max_matches_per_file: int = Form(5),
+):
+    """
+    Searches the files of a folder without combining them.
+
+    - **folder_path**: Folder to search.
+    - **query**: Text to find, or a regular expression when `regex` is set.
+    - **regex**: Treat `query` as a regular expression.
+    - **ignore_case**: Match case-insensitively.
+    - **extensions**: String with space-separated extensions (e.g., ".txt .md").
+    - **max_depth**: Maximum folder depth to search (0 for unlimited).
+    - **max_files**: Maximum number of matching files to return.
+    - **max_matches_per_file**: Maximum number of matching lines per file.
+
+    The folder is indexed by trigrams on first use and re-indexed incrementally
+    (only files whose mtime or size changed are read again). Only files that
+    contain every trigram of the query, or of the literal parts of a regular
+    expression, are opened and matched line by line. The index holds at most
+    `FILE_COMBINER_SEARCH_INDEX_MAX_FILES` files and evicts the least recently
+    searched folders first; a folder larger than that is not indexed, every
+    file is read and `indexed_files` is 0.
+    """
+    extensions_list, _ = _validate_folder_request(
+        folder_path, "name", extensions, "markdown", max_depth
+    )
+    _validate_search_query(query, regex)
+    if max_files < 1 or max_matches_per_file < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="max_files and max_matches_per_file must be positive integers",
+        )
+
+    def work():
+        update = search_index.update(folder_path, max_depth, extensions_list, cancel)
+        results, candidates = search_index.search(
+            folder_path,
+            query,
+            regex,
+            ignore_case,
+            max_depth,
+            extensions_list,
+            max_files,
+            max_matches_per_file,
+            cancel,
+        )
+        return update, results, candidates
+
+    try:
+        async with cancel_on_disconnect(request) as cancel:
+            update, results, candidates = await combine_executor.run(work)
+    except HANDLED_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in search: {str(e)}") from e
+
+    return {
+        "query": query,
+        "indexed_files": update.indexed,
+        "reindexed_files": update.updated,
+        "candidates": candidates,
+        "files": [
+            {
+                "name": result.relative_path,
+                "matches": [
+                    {"line": match.line, "text": match.text} for match in result.matches
+                ],
+            }
+            for result in results
+        ],
+    }
+
+
+@app.post("/folder-preview/")
+async def folder_preview_endpoint(
+    request: Request,
+    folder_path: str = Form(...),
+    sort_mode: str = Form("name"),
+    extensions: Optional[str] = Form(None),
+    max_depth: int = Form(0),
+    follow_symlinks: bool = Form(True),
+):
+    """
+    Lists the files a folder combine would read, without reading them.
+
+    - **folder_path**: Folder to preview.
+    - **sort_mode**: Order of the files ('name', 'date_asc', 'date_desc').
+    - **extensions**: String with space-separated extensions (e.g., ".txt .md").
+    - **max_depth**: Maximum folder depth (0 for unlimited).
+    - **follow_symlinks**: Follow symbolic links (see `/combine-folder/`).
+
+    Answered from the folder index (`FILE_COMBINER_FOLDER_INDEX_PATH`), which
+    is refreshed first: only directories whose mtime changed are listed again,
+    the files of the others are checked with `lstat`, and only new or changed
+    files are hashed. Every file comes with its size,
+    modification time, line count, SHA-256 and whether it looks binary.
+    """
+    if folder_index is None:
+        raise HTTPException(
+            status_code=403, detail="The folder index is disabled on this server."
+        )
+    extensions_list, _ = _validate_folder_request(
+        folder_path, sort_mode, extensions, "markdown", max_depth
+    )
+
+    def work():
+        folder_index.refresh(folder_path, cancel=cancel)
+        return folder_index.files(
+            folder_path, max_depth, extensions_list, sort_mode, follow_symlinks
+        )
+
+    try:
+        async with cancel_on_disconnect(request) as cancel:
+            files = await combine_executor.run(work)
+    except HANDLED_ERRORS:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error in folder preview: {str(e)}"
+        ) from e
+
+    return {
+        "file_count": len(files),
+        "total_bytes": sum(f.size for f in files),
+        "total_lines": sum(f.line_count for f in files if not f.binary),
+        "files": [
+            {
+                "name": f.relative_path,
+                "size": f.size,
+                "last_modified": datetime.fromtimestamp(f.mtime_ns / 1e9).isoformat(),
+                "line_count": f.line_count,
+                "binary": f.binary,
+                "sha256": f.sha256,
+            }
+            for f in files
+        ],
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Exposes Prometheus metrics in the text exposition format."""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.post("/combine-batch/")
+async def combine_batch_endpoint(batch: BatchCombineRequest):
+    """
+    Combines many folders or file groups in one call.
+
+    - **specs**: List of combine specs. Each spec takes either `folder_path` or
+      `file_paths` plus the same options as `/combine-folder/`, and an optional
+      `name` for its entry in the archive.
+    - **max_concurrency**: How many specs are executed at the same time, at
+      most the number of combine workers.
+
+    Specs run concurrently and share directory listings and file reads. The
+    response is a zip archive streamed as results complete; `manifest.json`
+    at the end of the archive lists the status of every spec.
+    """
+    for spec in batch.specs:
+        try:
+            validate_spec_paths(spec)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+    return StreamingResponse(
+        stream_batch_zip(batch.specs, batch.max_concurrency),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="combined_batch.zip"'},
+    )
+
+
+@app.post("/combine-folder/jobs/", status_code=202)
+async def start_combine_folder_job(
+    request: Request,
+    folder_path: str = Form(...),
+    sort_mode: str = Form("name"),
+    extensions: Optional[str] = Form(None),
+    output_format: str = Form("markdown"),
+    remove_extra_empty_lines: bool = Form(False),
+    normalize_line_endings: bool = Form(False),
+    remove_trailing_whitespace: bool = Form(False),
+    strip_comments: bool = Form(False),
+    redact_secrets: bool = Form(False),
+    preprocessors: Optional[str] = Form(None),
+    max_depth: int = Form(0),
+):
+    """
+    Starts a folder combine in the background.
+
+    Takes these `/combine-folder/` form fields: `folder_path`, `sort_mode`,
+    `extensions`, a single `output_format`, the preprocessing flags,
+    `preprocessors` and `max_depth`. Content patterns, excerpts
+    (`head_lines`, `tail_lines`, `max_bytes`), `follow_symlinks`, search and
+    `debug_profile` are not supported; jobs always follow symbolic links.
+    The job is admitted against the `/combine-folder/` byte budget; when it
+    cannot be admitted in time it fails with an `error` event. Returns the job id and the URLs of its progress event stream and of its
+    result.
+    """
+    extensions_list, output_format = _validate_folder_request(
+        folder_path, sort_mode, extensions, output_format, max_depth
+    )
+    request.state.output_format = output_format
+    preprocessing_options = _preprocessing_options(
+        remove_extra_empty_lines,
+        normalize_line_endings,
+        remove_trailing_whitespace,
+        strip_comments,
+        redact_secrets,
+        preprocessors,
+    )
+    combine_executor.ensure_capacity()
+
+    def work(progress: ProgressTracker) -> str:
+        stats = CombineStats()
+        combined = _combine_folder(
+            folder_path,
+            max_depth,
+            extensions_list,
+            sort_mode,
+            preprocessing_options,
+            output_format,
+            stats,
+            progress,
+        )
+        observe_combine_stats(stats, "start_combine_folder_job")
+        return combined
+
+    async def run(progress: ProgressTracker) -> str:
+        manifest = await combine_executor.run(
+            _folder_manifest, folder_path, max_depth, extensions_list
+        )
+        progress.expect(manifest.file_count, manifest.total_bytes)
+        # Shares the /combine-folder/ budget; a rejection fails the job
+        async with folder_admission.admit(manifest.total_bytes):
+            return await combine_executor.run(work, progress)
+
+    job = jobs.start(run, MEDIA_TYPES[output_format])
+    return {
+        "job_id": job.id,
+        "events_url": f"/jobs/{job.id}/events",
+        "result_url": f"/jobs/{job.id}/result",
+    }
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Streams progress of a combine job as Server-Sent Events.
+
+    `progress` events carry directories walked, files matched and bytes read
+    against the files and bytes expected from the folder manifest, then files
+    rendered. The ETA is null until rendering starts, and for JSON and YAML
+    until the document is serialized. The stream ends with a `done` or `error`
+    event.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return StreamingResponse(
+        stream_job_events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """
+    Returns the result of a combine job.
+
+    Responds with 202 and the current progress while the job is still running.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if not job.done:
+        return JSONResponse(
+            status_code=202,
+            content={"status": "running", "progress": job.progress.snapshot()},
+        )
+    if job.error is not None:
+        raise HTTPException(
+            status_code=500, detail=f"Error in combine logic: {job.error}"
+        )
+    return PlainTextResponse(content=job.result or "", media_type=job.media_type)
+
+
+@app.get("/outputs/{output_id}/sections")
+async def output_sections(output_id: str):
+    """
+    Lists the sections of a stored markdown output.
+
+    `output_id` is the `X-Combine-Output-Id` header of a `/combine-folder/`
+    response. Each section gives the file name, its anchor, the byte offset
+    and length of the file's section in the document and its SHA-256.
+    """
+    index = output_store.section_index(output_id)
+    if index is None:
+        raise HTTPException(
+            status_code=404, detail=f"No section index for output: {output_id}"
+        )
+    return {"output_id": output_id, "sections": list(index.values())}
+
+
+@app.get("/outputs/{output_id}/sections/{name:path}")
+async def output_section(request: Request, output_id: str, name: str):
+    """
+    Returns one file's section of a stored markdown output.
+
+    The section is located through the output's index and read straight from
+    the stored file, so the cost does not depend on the document size. `Range`
+    requests are applied within the section.
+    """
+    section = output_store.open_section(output_id, name)
+    if section is None:
+        raise HTTPException(
+            status_code=404, detail=f"Unknown section {name!r} of output {output_id}"
+        )
+    return RangeFileResponse(request, section, "text/markdown")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,426 @@
+"""
+Prometheus-compatible metrics without external dependencies.
+
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format (version 0.0.4) by the ``/metrics`` endpoint.
+``MetricsMiddleware`` records per-endpoint request counts, latencies, bytes out
+and in-flight requests; ``observe_combine_stats`` records per-stage latencies of
+the combine pipeline.
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from shared.stats import CombineStats
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._callbacks: List[Callable[[], None]] = []
+
+    def register(self, metric: "_Metric") -> None:
+        self._metrics.append(metric)
+
+    def register_callback(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` before every render, e.g. to refresh derived gauges."""
+        self._callbacks.append(callback)
+
+    def render(self) -> str:
+        for callback in self._callbacks:
+            callback()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in items
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in items
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> ([per-bucket counts], sum, count)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s, n)) for k, (c, s, n) in self._values.items())
+        lines: List[str] = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labelnames + ("le",), key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# --- Application metrics ---
+
+REQUESTS_TOTAL = Counter(
+    "file_combiner_requests_total",
+    "HTTP requests by endpoint, output format and status code.",
+    ["endpoint", "output_format", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "file_combiner_request_duration_seconds",
+    "HTTP request latency by endpoint and output format.",
+    ["endpoint", "output_format"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "file_combiner_requests_in_flight",
+    "HTTP requests currently being served.",
+)
+STAGE_LATENCY = Histogram(
+    "file_combiner_stage_duration_seconds",
+    "Time spent per combine call in each pipeline stage.",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025) + DEFAULT_BUCKETS,
+)
+BYTES_IN = Counter(
+    "file_combiner_bytes_in_total",
+    "Bytes of file content read from disk or uploads.",
+    ["endpoint"],
+)
+BYTES_OUT = Counter(
+    "file_combiner_bytes_out_total",
+    "Bytes of response bodies sent.",
+    ["endpoint"],
+)
+FILES_PROCESSED = Counter(
+    "file_combiner_files_processed_total",
+    "Files rendered into combined output.",
+    ["endpoint"],
+)
+CACHE_REQUESTS = Counter(
+    "file_combiner_cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ["cache", "result"],
+)
+CACHE_HIT_RATIO = Gauge(
+    "file_combiner_cache_hit_ratio",
+    "Share of cache lookups that were hits, since start.",
+    ["cache"],
+)
+
+EXECUTOR_WORKERS = Gauge(
+    "file_combiner_executor_workers",
+    "Worker threads of the combine executor.",
+    ["executor"],
+)
+EXECUTOR_ACTIVE = Gauge(
+    "file_combiner_executor_active",
+    "Combine calls currently running on a worker.",
+    ["executor"],
+)
+EXECUTOR_QUEUED = Gauge(
+    "file_combiner_executor_queued",
+    "Combine calls waiting for a free worker.",
+    ["executor"],
+)
+EXECUTOR_SATURATION = Gauge(
+    "file_combiner_executor_saturation",
+    "Share of executor workers and queue slots in use (0 to 1).",
+    ["executor"],
+)
+EXECUTOR_REJECTED = Counter(
+    "file_combiner_executor_rejected_total",
+    "Combine calls rejected because the executor queue was full.",
+    ["executor"],
+)
+EXECUTOR_QUEUE_WAIT = Histogram(
+    "file_combiner_executor_queue_wait_seconds",
+    "Time combine calls waited for a free worker.",
+    ["executor"],
+    buckets=(0.0005, 0.001, 0.0025) + DEFAULT_BUCKETS,
+)
+
+ADMISSION_BUDGET = Gauge(
+    "file_combiner_admission_budget_bytes",
+    "Budget of estimated in-flight input bytes per endpoint.",
+    ["endpoint"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "file_combiner_admission_in_flight_bytes",
+    "Estimated input bytes of admitted requests per endpoint.",
+    ["endpoint"],
+)
+ADMISSION_QUEUE_LENGTH = Gauge(
+    "file_combiner_admission_queue_length",
+    "Requests waiting for room in the byte budget.",
+    ["endpoint"],
+)
+ADMISSION_REJECTED = Counter(
+    "file_combiner_admission_rejected_total",
+    "Requests rejected by admission control, by reason (queue_full or timeout).",
+    ["endpoint", "reason"],
+)
+ADMISSION_WAIT = Histogram(
+    "file_combiner_admission_wait_seconds",
+    "Time admitted requests waited for room in the byte budget.",
+    ["endpoint"],
+    buckets=(0.0005, 0.001, 0.0025) + DEFAULT_BUCKETS,
+)
+
+CANCELLATIONS = Counter(
+    "file_combiner_cancellations_total",
+    "Combines abandoned because the client disconnected, by endpoint and stage.",
+    ["endpoint", "stage"],
+)
+
+COALESCED_REQUESTS = Counter(
+    "file_combiner_coalesced_requests_total",
+    "Requests served by joining an identical combine already in progress.",
+    ["endpoint"],
+)
+
+OUTPUT_STORE_BYTES = Gauge(
+    "file_combiner_output_store_bytes",
+    "Bytes of combined outputs kept in the on-disk output store.",
+)
+OUTPUT_STORE_ENTRIES = Gauge(
+    "file_combiner_output_store_entries",
+    "Combined outputs kept in the on-disk output store.",
+)
+OUTPUT_STORE_EVICTIONS = Counter(
+    "file_combiner_output_store_evictions_total",
+    "Outputs deleted from the on-disk store to stay under its size cap.",
+)
+
+
+_KNOWN_CACHES = set()
+
+
+def _refresh_cache_hit_ratio() -> None:
+    for cache in list(_KNOWN_CACHES):
+        hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+        misses = CACHE_REQUESTS.value(cache=cache, result="miss")
+        if hits + misses:
+            CACHE_HIT_RATIO.set(hits / (hits + misses), cache=cache)
+
+
+REGISTRY.register_callback(_refresh_cache_hit_ratio)
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int) -> None:
+    _KNOWN_CACHES.add(cache)
+    if hits:
+        CACHE_REQUESTS.inc(hits, cache=cache, result="hit")
+    if misses:
+        CACHE_REQUESTS.inc(misses, cache=cache, result="miss")
+
+
+def observe_combine_stats(stats: CombineStats, endpoint: str) -> None:
+    """Move stage durations and counters of one combine call into the metrics."""
+    for stage, seconds in stats.durations.items():
+        STAGE_LATENCY.observe(seconds, stage=stage)
+    bytes_read = stats.counters.get("bytes_read", 0)
+    if bytes_read:
+        BYTES_IN.inc(bytes_read, endpoint=endpoint)
+    files_rendered = stats.counters.get("files_rendered", 0)
+    if files_rendered:
+        FILES_PROCESSED.inc(files_rendered, endpoint=endpoint)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count, latency, bytes out and in-flight."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})
+        start = time.perf_counter()
+        status = 500
+        bytes_out = 0
+
+        async def send_wrapper(message) -> None:
+            nonlocal status, bytes_out
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            endpoint = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            output_format = scope["state"].get("output_format", "none")
+            REQUESTS_TOTAL.inc(
+                endpoint=endpoint, output_format=output_format, status=str(status)
+            )
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                endpoint=endpoint,
+                output_format=output_format,
+            )
+            if bytes_out:
+                BYTES_OUT.inc(bytes_out, endpoint=endpoint)
@@ -4,7 +4,11 @@ Minimal models for the file combiner backend.
 This module provides basic models needed for the application.
 """
 
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field, root_validator, validator
+
+from shared.pipeline import check_options as check_preprocessing_options
 
 
 class User(BaseModel):
@@ -21,3 +25,81 @@ class User(BaseModel):
 
 # Global user storage instance for compatibility
 user_storage = None
+
+
+SORT_MODES = ("name", "date_asc", "date_desc")
+OUTPUT_FORMATS = ("markdown", "json", "yaml")
+
+
+class CombineSpec(BaseModel):
+    """One combine job inside a batch request: a folder or an explicit file group."""
+
+    name: Optional[str] = None
+    folder_path: Optional[str] = None
+    file_paths: Optional[List[str]] = None
+    sort_mode: str = "name"
+    extensions: Optional[str] = None
+    output_format: str = "markdown"
+    remove_extra_empty_lines: bool = False
+    normalize_line_endings: bool = False
+    remove_trailing_whitespace: bool = False
+    strip_comments: bool = False
+    redact_secrets: bool = False
+    # Additional preprocessing stages by name, e.g. installed plugins
+    preprocessors: List[str] = []
+    max_depth: int = Field(0, ge=0)
+
+    @root_validator(skip_on_failure=True)
+    def check_source(cls, values):
+        if bool(values.get("folder_path")) == bool(values.get("file_paths")):
+            raise ValueError("Exactly one of 'folder_path' or 'file_paths' is required.")
+        return values
+
+    @validator("sort_mode")
+    def check_sort_mode(cls, value):
+        if value not in SORT_MODES:
+            raise ValueError(f"Invalid sort_mode: {value}")
+        return value
+
+    @validator("output_format")
+    def check_output_format(cls, value):
+        value = value.lower()
+        if value not in OUTPUT_FORMATS:
+            raise ValueError(f"Invalid output_format: {value}")
+        return value
+
+    @validator("extensions")
+    def check_extensions(cls, value):
+        if value is None:
+            return value
+        for ext in value.split():
+            if not ext.startswith("."):
+                raise ValueError(f"Extension '{ext}' must start with a dot.")
+        return value
+
+    @validator("preprocessors")
+    def check_preprocessors(cls, value):
+        check_preprocessing_options(value)
+        return value
+
+    def extensions_list(self) -> Optional[List[str]]:
+        if not self.extensions:
+            return None
+        return [ext.strip().lower() for ext in self.extensions.split() if ext.strip()]
+
+    def preprocessing_options(self) -> Dict[str, bool]:
+        return {
+            "remove_extra_empty_lines": self.remove_extra_empty_lines,
+            "normalize_line_endings": self.normalize_line_endings,
+            "remove_trailing_whitespace": self.remove_trailing_whitespace,
+            "strip_comments": self.strip_comments,
+            "redact_secrets": self.redact_secrets,
+            **dict.fromkeys(self.preprocessors, True),
+        }
+
+
+class BatchCombineRequest(BaseModel):
+    """Request body for ``/combine-batch/``."""
+
+    specs: List[CombineSpec] = Field(..., min_items=1, max_items=1000)
+    max_concurrency: int = Field(4, ge=1, le=32)
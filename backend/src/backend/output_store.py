@@ -0,0 +1,459 @@
+"""
+Size-capped on-disk store for finished combine outputs.
+
+Each output is written once under a file named after its key digest and later
+requests for the same key are served straight from that file with
+``RangeFileResponse``. When the store grows over ``max_bytes`` the least
+recently used outputs are deleted. Markdown outputs carry a section index
+sidecar (file name to byte offset, length, anchor and hash) so that a single
+file's section can be served with one range read.
+
+Digests are salted with the store's ``version``, by default a hash of the
+backend and shared sources (``code_version``), so an output is only found by
+the code that rendered it. Files left by a previous process are adopted on
+start, oldest first, when the directory's ``VERSION`` file matches; after an
+upgrade the directory is emptied instead.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .config import settings
+from .metrics import (
+    OUTPUT_STORE_BYTES,
+    OUTPUT_STORE_ENTRIES,
+    OUTPUT_STORE_EVICTIONS,
+    REGISTRY,
+)
+
+_SUFFIX = ".out"
+_INDEX_SUFFIX = ".index.json"
+_VERSION_FILE = "VERSION"
+_CHUNK_SIZE = 256 * 1024
+
+
+class StoredOutput(NamedTuple):
+    """
+    An output file opened for serving; the open handle survives eviction.
+
+    ``offset`` and ``size`` select the served window, e.g. one section.
+    """
+
+    digest: str
+    file: BinaryIO
+    size: int
+    offset: int = 0
+
+
+class _Entry(NamedTuple):
+    size: int
+    # Output plus its section index sidecar, counted against the cap
+    disk_bytes: int
+
+
+def code_version() -> str:
+    """Hash of the backend and shared sources that render the stored outputs."""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for source_dir in (backend_dir, os.path.join(os.path.dirname(backend_dir), "shared")):
+        try:
+            names = sorted(os.listdir(source_dir))
+        except OSError:
+            continue
+        for name in names:
+            if not name.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(source_dir, name), "rb") as f:
+                    source = f.read()
+            except OSError:
+                continue
+            digest.update(os.path.basename(source_dir).encode() + b"/" + name.encode())
+            digest.update(hashlib.sha256(source).digest())
+    return digest.hexdigest()
+
+
+CODE_VERSION = code_version()
+
+
+class OutputStore:
+    """LRU store of combine outputs in ``root``, capped at ``max_bytes``."""
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        index_cache_size: int = 64,
+        version: str = CODE_VERSION,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.version = version
+        self.total_bytes = 0
+        self.index_cache_size = index_cache_size
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # Parsed section indexes by output digest, most recently used last
+        self._indexes: OrderedDict[str, Dict[str, Dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+            self._adopt_existing()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def digest(self, key: Hashable) -> str:
+        salted = repr((self.version, key))
+        return hashlib.sha256(salted.encode("utf-8", "surrogateescape")).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest + _SUFFIX)
+
+    def _index_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest + _INDEX_SUFFIX)
+
+    def _adopt_existing(self) -> None:
+        version_path = os.path.join(self.root, _VERSION_FILE)
+        try:
+            with open(version_path, encoding="utf-8") as f:
+                same_version = f.read().strip() == self.version
+        except OSError:
+            same_version = False
+        if not same_version:
+            # Rendered by other code and never served again, so free the space now
+            for entry in os.scandir(self.root):
+                if entry.name.endswith((_SUFFIX, _INDEX_SUFFIX, ".tmp")):
+                    _remove(entry.path)
+            self._write(version_path, self.version.encode("utf-8"))
+            return
+        found = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith(_SUFFIX):
+                stat = entry.stat()
+                digest = entry.name[: -len(_SUFFIX)]
+                try:
+                    index_bytes = os.path.getsize(self._index_path(digest))
+                except OSError:
+                    index_bytes = 0
+                entry_info = _Entry(stat.st_size, stat.st_size + index_bytes)
+                found.append((stat.st_mtime, digest, entry_info))
+            elif entry.name.endswith(".tmp"):
+                # Leftover of an interrupted write
+                _remove(entry.path)
+        with self._lock:
+            for _, digest, entry_info in sorted(found):
+                self._entries[digest] = entry_info
+                self.total_bytes += entry_info.disk_bytes
+            self._evict()
+
+    def open(self, key: Hashable) -> Optional[StoredOutput]:
+        """Open the stored output for ``key`` and mark it recently used."""
+        if not self.enabled:
+            return None
+        return self.open_output(self.digest(key))
+
+    def open_output(self, digest: str) -> Optional[StoredOutput]:
+        """Open a stored output by its digest (the output id given to clients)."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            self._entries.move_to_end(digest)
+            try:
+                file = open(self._path(digest), "rb")
+            except OSError:
+                # Removed behind our back; forget it
+                self._forget(digest)
+                return None
+        return StoredOutput(digest, file, entry.size)
+
+    def section_index(self, digest: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Section index of a stored markdown output, keyed by file name.
+
+        Returns None when the output is unknown or has no index. Parsed
+        indexes are cached, so repeated lookups do not touch the sidecar.
+        """
+        with self._lock:
+            if digest not in self._entries:
+                return None
+            index = self._indexes.get(digest)
+            if index is not None:
+                self._indexes.move_to_end(digest)
+                return index
+        try:
+            with open(self._index_path(digest), encoding="utf-8") as f:
+                sections = json.load(f)
+        except (OSError, ValueError):
+            return None
+        index = {section["name"]: section for section in sections}
+        with self._lock:
+            self._indexes[digest] = index
+            while len(self._indexes) > self.index_cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def open_section(self, digest: str, name: str) -> Optional[StoredOutput]:
+        """Open one file's section of a stored output for serving."""
+        index = self.section_index(digest)
+        section = index.get(name) if index is not None else None
+        if section is None:
+            return None
+        output = self.open_output(digest)
+        if output is None:
+            return None
+        return StoredOutput(
+            section["sha256"], output.file, section["length"], section["offset"]
+        )
+
+    def put(
+        self,
+        key: Hashable,
+        content: bytes,
+        section_index: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        """
+        Write ``content`` for ``key``; returns False when it cannot fit at all.
+
+        ``section_index`` is written next to the output as a JSON sidecar.
+        Writes go to temporary files that are renamed into place, the sidecar
+        first, so readers never see a partial output or an output whose index
+        is missing.
+        """
+        if not self.enabled or len(content) > self.max_bytes:
+            return False
+        digest = self.digest(key)
+        disk_bytes = len(content) + self._write_index(digest, section_index)
+        self._write(self._path(digest), content)
+        self._add(digest, len(content), disk_bytes)
+        return True
+
+    def put_stream(
+        self,
+        key: Hashable,
+        write: Callable[[BinaryIO], None],
+        section_index: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        """
+        Let ``write`` produce the output for ``key`` straight into the store.
+
+        ``write`` receives a seekable binary file and may fill
+        ``section_index`` while writing; the sidecar is written once it
+        returns. Returns False, keeping nothing, when the store is disabled or
+        the output turned out larger than the whole store.
+        """
+        if not self.enabled:
+            return False
+        digest = self.digest(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                size = f.tell()
+            if size > self.max_bytes:
+                _remove(tmp_path)
+                return False
+            disk_bytes = size + self._write_index(digest, section_index)
+            os.replace(tmp_path, self._path(digest))
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        self._add(digest, size, disk_bytes)
+        return True
+
+    def _write_index(
+        self, digest: str, section_index: Optional[List[Dict[str, Any]]]
+    ) -> int:
+        if section_index is None:
+            return 0
+        index_data = json.dumps(section_index, ensure_ascii=False).encode("utf-8")
+        self._write(self._index_path(digest), index_data)
+        return len(index_data)
+
+    def _add(self, digest: str, size: int, disk_bytes: int) -> None:
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            self._indexes.pop(digest, None)
+            self.total_bytes += disk_bytes - (old.disk_bytes if old else 0)
+            self._entries[digest] = _Entry(size, disk_bytes)
+            self._evict()
+
+    def _write(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+
+    def _forget(self, digest: str) -> None:
+        self.total_bytes -= self._entries.pop(digest).disk_bytes
+        self._indexes.pop(digest, None)
+        _remove(self._path(digest))
+        _remove(self._index_path(digest))
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            self._forget(next(iter(self._entries)))
+            OUTPUT_STORE_EVICTIONS.inc()
+
+    def clear(self) -> None:
+        with self._lock:
+            for digest in list(self._entries):
+                self._forget(digest)
+
+    def refresh_metrics(self) -> None:
+        OUTPUT_STORE_BYTES.set(self.total_bytes)
+        OUTPUT_STORE_ENTRIES.set(len(self._entries))
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header into an inclusive (start, end) pair.
+
+    Returns None when the whole file should be sent (no header, several ranges
+    or a unit other than bytes) and raises ValueError for a range that cannot
+    be satisfied.
+    """
+    if not header or not size:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError(header)
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(Response):
+    """
+    Serves a ``StoredOutput`` with support for single byte ranges.
+
+    The body is streamed in chunks read off the event loop from the handle
+    opened by the store, which stays readable if the output is evicted
+    meanwhile; Starlette's ``FileResponse`` reopens by path and would fail
+    then. There is no zero-copy path: uvicorn does not offer the ASGI
+    ``http.response.zerocopysend`` extension. The file handle is closed
+    afterwards.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        output: StoredOutput,
+        media_type: str,
+        headers: Optional[dict] = None,
+    ) -> None:
+        self.output = output
+        self.media_type = media_type
+        etag = f'"{output.digest}"'
+        headers = dict(headers or {}, ETag=etag)
+        headers["Accept-Ranges"] = "bytes"
+
+        self.offset, self.count = 0, output.size
+        status_code = 200
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, output.size)
+            except ValueError:
+                byte_range = None
+                status_code = 416
+                self.count = 0
+                headers["Content-Range"] = f"bytes */{output.size}"
+            if byte_range is not None:
+                start, end = byte_range
+                self.offset, self.count = start, end - start + 1
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{output.size}"
+        self.status_code = status_code
+        headers["Content-Length"] = str(self.count)
+        self.init_headers(headers)
+        self.background = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            if scope.get("method") == "HEAD" or not self.count:
+                await send({"type": "http.response.body", "body": b""})
+            else:
+                await self._send_chunks(send)
+        finally:
+            self.output.file.close()
+
+    async def _send_chunks(self, send: Send) -> None:
+        file = self.output.file
+        remaining = self.count
+        await anyio.to_thread.run_sync(file.seek, self.output.offset + self.offset)
+        while remaining:
+            chunk = await anyio.to_thread.run_sync(file.read, min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": bool(remaining),
+                }
+            )
+        if remaining:
+            # The file shrank under us; end the response anyway
+            await send({"type": "http.response.body", "body": b""})
+
+
+output_store = OutputStore(
+    settings.output_store_dir
+    or os.path.join(tempfile.gettempdir(), "file-combiner-outputs"),
+    settings.output_store_max_bytes,
+)
+REGISTRY.register_callback(output_store.refresh_metrics)
@@ -0,0 +1,72 @@
+"""
+Per-request timing and profiling helpers.
+
+``server_timing_header`` turns the stage durations collected in ``CombineStats``
+into a ``Server-Timing`` header. ``profile_call`` runs a callable under cProfile
+and summarizes its hottest functions for the opt-in ``debug_profile`` report.
+Only one profile runs at a time: cProfile cannot profile overlapping calls
+(Python 3.12+ raises ``ValueError``), so concurrent requests are not profiled.
+"""
+
+import cProfile
+import pstats
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from shared.stats import STAGES, CombineStats
+
+T = TypeVar("T")
+
+_profile_lock = threading.Lock()
+
+
+def server_timing_header(stats: CombineStats, total: Optional[float] = None) -> str:
+    """Build a ``Server-Timing`` value, durations in milliseconds."""
+    names = [stage for stage in STAGES if stage in stats.durations]
+    names += sorted(set(stats.durations) - set(STAGES))
+    metrics = [f"{name};dur={stats.durations[name] * 1000:.3f}" for name in names]
+    if total is not None:
+        metrics.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(metrics)
+
+
+def stage_timings_ms(stats: CombineStats) -> Dict[str, float]:
+    return {stage: round(seconds * 1000, 3) for stage, seconds in stats.durations.items()}
+
+
+def profile_call(
+    func: Callable[[], T], top: int = 25
+) -> Tuple[T, Optional[List[Dict[str, Any]]]]:
+    """
+    Run ``func`` under cProfile.
+
+    Returns the result and the ``top`` functions by own time, each with call
+    count, own time and cumulative time in milliseconds. If another call is
+    being profiled, ``func`` runs without the profiler and the report is None.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return func(), None
+    try:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(func)
+    finally:
+        _profile_lock.release()
+    profile_stats = pstats.Stats(profiler)
+    entries = []
+    for (filename, line, function), (
+        _primitive_calls,
+        total_calls,
+        own_time,
+        cumulative_time,
+        _callers,
+    ) in profile_stats.stats.items():  # type: ignore[attr-defined]
+        entries.append(
+            {
+                "function": f"{filename}:{line}({function})",
+                "calls": total_calls,
+                "own_ms": round(own_time * 1000, 3),
+                "cumulative_ms": round(cumulative_time * 1000, 3),
+            }
+        )
+    entries.sort(key=lambda entry: entry["own_ms"], reverse=True)
+    return result, entries[:top]
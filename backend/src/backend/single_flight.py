@@ -0,0 +1,135 @@
+"""
+Single-flight coalescing of identical concurrent combines.
+
+Requests with the same key (normalized parameters plus a fingerprint of the
+folder manifest) share one computation: the first request starts it as a task
+of its own, later ones wait for the same result object. A waiter whose client
+disconnects stops waiting without touching the computation; the computation's
+``CancellationToken`` reports cancellation only once every waiter has been
+cancelled or has left. A cancelled flight is forgotten at once, so a request
+arriving after the others left starts a fresh computation instead of joining
+one that is about to fail.
+"""
+
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from shared.cancellation import CancellationToken, OperationCancelled
+
+from .config import settings
+from .metrics import COALESCED_REQUESTS
+
+T = TypeVar("T")
+
+
+class _FlightToken(CancellationToken):
+    """Cancelled once every caller waiting for the flight has been cancelled."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.waiters: List[Optional[CancellationToken]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        if super().cancelled:
+            return True
+        # Read from worker threads while the loop updates the list
+        waiters = tuple(self.waiters)
+        return bool(waiters) and all(
+            token is not None and token.cancelled for token in waiters
+        )
+
+    def raise_if_cancelled(self, stage: str) -> None:
+        if self.cancelled:
+            raise OperationCancelled(stage)
+
+
+class _Flight(Generic[T]):
+    def __init__(self) -> None:
+        self.token = _FlightToken()
+        self.task: Optional[asyncio.Task[T]] = None
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one computation per key at a time."""
+
+    def __init__(self, endpoint: str, poll_interval: float = 0.25) -> None:
+        self.endpoint = endpoint
+        self.poll_interval = poll_interval
+        self._flights: Dict[Hashable, _Flight[T]] = {}
+
+    @property
+    def in_progress(self) -> int:
+        return len(self._flights)
+
+    async def run(
+        self,
+        key: Hashable,
+        compute: Callable[[CancellationToken], Awaitable[T]],
+        cancel: Optional[CancellationToken] = None,
+    ) -> Tuple[T, bool]:
+        """
+        Return the result of ``compute(token)`` for ``key`` and whether it was shared.
+
+        ``cancel`` is the caller's own token; once it is cancelled the caller
+        stops waiting with ``OperationCancelled``.
+        """
+        flight = self._flights.get(key)
+        if flight is not None and flight.token.cancelled:
+            # Every waiter has left; the computation stops at its next check
+            self._forget(key, flight)
+            flight = None
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight()
+            flight.token.waiters.append(cancel)
+            flight.task = asyncio.ensure_future(compute(flight.token))
+            flight.task.add_done_callback(lambda task: self._finish(key, flight, task))
+            self._flights[key] = flight
+        else:
+            flight.token.waiters.append(cancel)
+            COALESCED_REQUESTS.inc(endpoint=self.endpoint)
+
+        try:
+            return await self._wait(flight, cancel), shared
+        finally:
+            flight.token.waiters.remove(cancel)
+            if not flight.token.waiters and not flight.task.done():
+                flight.token.cancel()
+                self._forget(key, flight)
+
+    async def _wait(self, flight: _Flight[T], cancel: Optional[CancellationToken]) -> T:
+        task = flight.task
+        if cancel is None:
+            return await asyncio.shield(task)
+        while not task.done():
+            # The caller's token is set from another task; check it periodically
+            await asyncio.wait({task}, timeout=self.poll_interval)
+            if cancel.cancelled and not task.done():
+                raise OperationCancelled("coalesced")
+        return task.result()
+
+    def _forget(self, key: Hashable, flight: _Flight[T]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finish(self, key: Hashable, flight: _Flight[T], task: "asyncio.Task[T]") -> None:
+        self._forget(key, flight)
+        # Mark the exception as retrieved when every waiter has already left
+        if not task.cancelled():
+            task.exception()
+
+
+folder_flights: SingleFlight = SingleFlight(
+    "combine_folder_endpoint", settings.disconnect_poll_interval
+)
@@ -0,0 +1,44 @@
+"""
+Кооперативная отмена операций объединения.
+
+``CancellationToken`` передаётся в ``scan_directory`` и ``combine_files_content``.
+Они проверяют его перед каждым файлом и прерываются исключением
+``OperationCancelled``, когда результат больше никому не нужен (например,
+клиент закрыл соединение). Без токена проверки не выполняются.
+"""
+
+import threading
+from typing import Optional
+
+
+class OperationCancelled(Exception):
+    """Операция прервана через ``CancellationToken``."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Operation cancelled during {stage}")
+        self.stage = stage
+
+
+class CancellationToken:
+    """Потокобезопасный флаг отмены: выставляется в одном потоке, проверяется в другом."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self, stage: str) -> None:
+        """Бросает ``OperationCancelled`` с названием этапа, если отмена запрошена."""
+        if self._event.is_set():
+            raise OperationCancelled(stage)
+
+
+def check_cancelled(token: Optional[CancellationToken], stage: str) -> None:
+    """``raise_if_cancelled`` для необязательного токена."""
+    if token is not None:
+        token.raise_if_cancelled(stage)
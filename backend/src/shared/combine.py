@@ -0,0 +1,255 @@
+"""
+Объединение папок из командной строки, без бэкенда и HTTP.
+
+    python -m shared.combine ПАПКА [ПАПКА ...] [-o ФАЙЛ] [опции]
+
+Опции повторяют эндпоинт ``/combine-folder/``. Файлы читаются пулом потоков
+(``--jobs``). Markdown без предобработки, отбора по содержимому и выборки
+частей файлов собирается копированием байтов (см. ``shared.passthrough``) и
+пишется в вывод по мере чтения, не накапливаясь в памяти. Если папок
+несколько, они объединяются в один документ, а имена файлов начинаются с
+пути папки относительно общего родителя всех папок.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+from .combine_logic import combine_files_content
+from .content_filter import ContentFilter
+from .excerpt import Excerpt
+from .passthrough import can_pass_through, write_files_markdown
+from .pipeline import build_pipeline
+from .scan_logic import list_folder_files, scan_directory
+from .stats import CombineStats
+
+PREPROCESSING_FLAGS = (
+    "remove_extra_empty_lines",
+    "normalize_line_endings",
+    "remove_trailing_whitespace",
+    "strip_comments",
+    "redact_secrets",
+)
+
+
+def default_jobs() -> int:
+    """Число потоков чтения по умолчанию: чтение упирается в диск, а не в CPU."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m shared.combine",
+        description="Combine the files of one or more folders into one document.",
+    )
+    parser.add_argument(
+        "folders", nargs="+", metavar="FOLDER", help="Folders to combine."
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="Output file; '-' (the default) writes to stdout.",
+    )
+    parser.add_argument(
+        "--output-format", choices=("markdown", "json", "yaml"), default="markdown"
+    )
+    parser.add_argument(
+        "--sort-mode", choices=("name", "date_asc", "date_desc"), default="name"
+    )
+    parser.add_argument(
+        "--extensions",
+        nargs="+",
+        metavar="EXT",
+        help="Only combine files with these extensions, e.g. .py .md",
+    )
+    parser.add_argument(
+        "--max-depth", type=int, default=0, help="Maximum folder depth (0 for unlimited)."
+    )
+    for flag in PREPROCESSING_FLAGS:
+        parser.add_argument("--" + flag.replace("_", "-"), action="store_true")
+    parser.add_argument(
+        "--preprocessors",
+        nargs="+",
+        default=[],
+        metavar="NAME",
+        help="Additional preprocessing stages, such as installed plugins.",
+    )
+    parser.add_argument("--content-pattern", help="Only files containing this text.")
+    parser.add_argument(
+        "--content-exclude-pattern", help="Skip files containing this text."
+    )
+    parser.add_argument(
+        "--content-regex",
+        action="store_true",
+        help="Treat both content patterns as regular expressions.",
+    )
+    parser.add_argument("--head-lines", type=int, default=0)
+    parser.add_argument("--tail-lines", type=int, default=0)
+    parser.add_argument("--max-bytes-per-file", type=int, default=0)
+    parser.add_argument(
+        "--no-follow-symlinks",
+        dest="follow_symlinks",
+        action="store_false",
+        help="Skip symbolic links instead of following them.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=default_jobs(),
+        help="How many files to read at the same time.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print stage durations and counters to stderr.",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            parser.error(f"Folder path '{folder}' does not exist or is not a directory.")
+    if args.max_depth < 0:
+        parser.error("--max-depth must be a non-negative integer (0 for unlimited depth)")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    extensions = None
+    if args.extensions:
+        extensions = [ext.lower() for ext in args.extensions]
+        for ext in extensions:
+            if not ext.startswith("."):
+                parser.error(f"Extension '{ext}' must start with a dot.")
+
+    options: Dict[str, bool] = {flag: getattr(args, flag) for flag in PREPROCESSING_FLAGS}
+    options.update((name, True) for name in args.preprocessors)
+    content_filter = None
+    try:
+        build_pipeline(options)
+        if args.content_pattern or args.content_exclude_pattern:
+            content_filter = ContentFilter(
+                args.content_pattern, args.content_exclude_pattern, args.content_regex
+            )
+        excerpt = Excerpt(args.head_lines, args.tail_lines, args.max_bytes_per_file)
+    except (ValueError, re.error) as e:
+        parser.error(str(e))
+
+    stats = CombineStats()
+    started = time.perf_counter()
+    prefixes = folder_prefixes(args.folders)
+    if (
+        can_pass_through(options, args.output_format)
+        and content_filter is None
+        and not excerpt.active
+    ):
+        files: List[Dict[str, Any]] = []
+        for folder, prefix in zip(args.folders, prefixes):
+            listed = list_folder_files(
+                folder,
+                args.max_depth,
+                extensions,
+                stats=stats,
+                follow_symlinks=args.follow_symlinks,
+            )
+            files.extend(_prefixed(listed, prefix))
+        _write_output(
+            args.output,
+            lambda out: write_files_markdown(out, files, args.sort_mode, stats=stats),
+        )
+    else:
+        files = []
+        for folder, prefix in zip(args.folders, prefixes):
+            scanned = scan_directory(
+                folder,
+                args.max_depth,
+                extensions,
+                stats=stats,
+                content_filter=content_filter,
+                excerpt=excerpt,
+                workers=args.jobs,
+                follow_symlinks=args.follow_symlinks,
+            )
+            files.extend(_prefixed(scanned, prefix))
+        combined = combine_files_content(
+            files, args.sort_mode, extensions, options, args.output_format, stats=stats
+        )
+        data = combined.encode("utf-8")
+        del combined
+        _write_output(args.output, lambda out: out.write(data))
+
+    if args.stats:
+        _print_stats(stats, time.perf_counter() - started)
+    return 0
+
+
+def folder_prefixes(folders: List[str]) -> List[str]:
+    """
+    Префиксы имён файлов каждой папки: путь папки относительно общего
+    родителя всех папок. У единственной папки префикса нет.
+    """
+    if len(folders) == 1:
+        return [""]
+    paths = [os.path.abspath(folder) for folder in folders]
+    base = os.path.commonpath(paths)
+    if base in paths:
+        # Одна папка внутри другой: префиксы считаются от родителя внешней
+        base = os.path.dirname(base)
+    return [os.path.relpath(path, base) for path in paths]
+
+
+def _prefixed(files: List[Dict[str, Any]], prefix: str) -> List[Dict[str, Any]]:
+    if prefix:
+        for file_data in files:
+            file_data["name"] = os.path.join(prefix, file_data["name"])
+            file_data["relative_path"] = os.path.join(prefix, file_data["relative_path"])
+    return files
+
+
+def _write_output(path: str, write: Callable[[BinaryIO], Any]) -> None:
+    """
+    Вызывает ``write`` с файлом вывода.
+
+    Вывод в канал (например, stdout в конвейере) не поддерживает ``seek``,
+    а запись markdown копированием байтов иногда переписывает раздел файла,
+    поэтому в этом случае документ сначала пишется во временный файл.
+    """
+    if path == "-":
+        sys.stdout.flush()
+        target = sys.stdout.buffer
+        _write_seekable(target, write)
+        target.flush()
+        return
+    with open(path, "wb") as target:
+        _write_seekable(target, write)
+
+
+def _write_seekable(target: BinaryIO, write: Callable[[BinaryIO], Any]) -> None:
+    if target.seekable():
+        write(target)
+        return
+    with tempfile.TemporaryFile() as buffer:
+        write(buffer)
+        buffer.seek(0)
+        shutil.copyfileobj(buffer, target)
+
+
+def _print_stats(stats: CombineStats, total: float) -> None:
+    for stage, seconds in sorted(stats.durations.items()):
+        print(f"{stage}: {seconds * 1000:.1f} ms", file=sys.stderr)
+    for name, value in sorted(stats.counters.items()):
+        print(f"{name}: {value}", file=sys.stderr)
+    print(f"total: {total * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,28 @@
+import hashlib
 import json
 import re
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
 
 import yaml
 
+from .cancellation import CancellationToken, check_cancelled
+from .pipeline import FileContext, Pipeline, build_pipeline
+from .progress import ProgressTracker
+from .stats import CombineStats, measure_stage
+
 
 def normalize_anchor(filename: str) -> str:
     """Генерирует валидную якорную ссылку для markdown из имени файла."""
@@ -19,10 +37,15 @@ def normalize_anchor(filename: str) -> str:
     ).strip("-")
 
 
-def preprocess_content(content: str, options: Dict[str, bool]) -> str:
+def preprocess_content(
+    content: str, options: Dict[str, bool], filename: Optional[str] = None
+) -> str:
     """
     Выполняет предварительную обработку содержимого файла.
 
+    Этапы выполняются конвейером ``shared.pipeline``: все построчные
+    преобразования - за один проход по строкам.
+
     Args:
         content (str): Исходное содержимое файла.
         options (Dict[str, bool]): Словарь с опциями обработки.
@@ -30,28 +53,21 @@ def preprocess_content(content: str, options: Dict[str, bool]) -> str:
             - 'remove_extra_empty_lines': bool - Удалить лишние пустые строки (оставить максимум одну подряд).
             - 'normalize_line_endings': bool - Заменить все окончания строк на '\\n'.
             - 'remove_trailing_whitespace': bool - Удалить пробельные символы в конце строк.
+            - 'strip_comments': bool - Удалить комментарии (и докстринги Python)
+              из исходного кода, сохранив строки (см. ``shared.comments``).
+            - 'redact_secrets': bool - Заменить ключи, токены и e-mail метками
+              ``[REDACTED:<правило>]`` (см. ``shared.redaction``).
+            - имена этапов-плагинов (см. ``shared.pipeline.register_stage``).
+        filename (Optional[str]): Имя файла; по расширению выбирается язык
+            для 'strip_comments'.
 
     Returns:
         str: Обработанное содержимое.
-    """
-    if options.get("normalize_line_endings", False):
-        # Заменяем CRLF и CR на LF
-        content = content.replace("\r\n", "\n").replace("\r", "\n")
-
-    if options.get("remove_trailing_whitespace", False):
-        # Разбиваем на строки, убираем пробелы в конце, соединяем обратно
-        lines = content.split("\n")
-        processed_lines = [line.rstrip() for line in lines]
-        content = "\n".join(processed_lines)
 
-    if options.get("remove_extra_empty_lines", False):
-        # Заменяем 3 и более пустых строки подряд на 2 пустых строки
-        while "\n\n\n" in content:
-            content = content.replace("\n\n\n", "\n\n")
-        # Убираем пустые строки в самом начале
-        content = content.lstrip("\n")
-
-    return content
+    Raises:
+        ValueError: Если включена неизвестная опция.
+    """
+    return build_pipeline(options).run(content, filename)
 
 
 def combine_files_content(
@@ -60,72 +76,200 @@ def combine_files_content(
     extensions: Optional[List[str]] = None,
     preprocessing_options: Optional[Dict[str, bool]] = None,
     output_format: str = "markdown",
+    progress: Optional[ProgressTracker] = None,
+    stats: Optional[CombineStats] = None,
+    cancel: Optional[CancellationToken] = None,
+    section_index: Optional[List[Dict[str, Any]]] = None,
 ) -> str:
     """
     Объединяет содержимое файлов из списка словарей с данными файлов.
 
+    Чтобы объединить одни и те же файлы несколько раз (в разных форматах или
+    с разными опциями), используйте ``FileCorpus``: он не повторяет
+    предобработку.
+
     Args:
         file_data_list: Список словарей, где каждый словарь содержит:
             - 'name': str - Имя файла.
             - 'content': str - Содержимое файла.
             - 'last_modified': datetime - Дата последнего изменения (или загрузки).
             - 'relative_path': str (опционально) - Относительный путь к файлу (для рекурсивной обработки папок).
+            - 'truncated': bool (опционально) - В 'content' только часть файла
+              с маркером пропуска; в JSON и YAML выводится как поле 'truncated'.
+            Предобработка может добавить ключ 'redactions' - число замен
+            секретов по правилам; он выводится у файла и суммой в метаданных.
+            Ни словари, ни сам список не изменяются (см. ``FileCorpus``).
         sort_mode: Режим сортировки ('name', 'date_asc', 'date_desc').
         extensions: Список расширений для фильтрации (например, ['.txt', '.md']).
         preprocessing_options: Опции для предварительной обработки содержимого.
         output_format: Формат вывода ('markdown', 'json', 'yaml').
+        progress: Необязательный трекер прогресса для этапа рендеринга.
+        stats: Необязательный сборщик длительностей этапов 'preprocess', 'sort',
+            'render'.
+        cancel: Необязательный токен отмены; проверяется перед обработкой
+            каждого файла.
+        section_index: Необязательный список, в который для формата markdown
+            добавляется по словарю на каждый файл: 'name', 'anchor', 'offset'
+            и 'length' (границы раздела файла в байтах UTF-8 итогового
+            документа) и 'sha256' раздела.
 
     Returns:
         str: Объединённое содержимое в выбранном формате.
+
+    Raises:
+        OperationCancelled: Если через ``cancel`` запрошена отмена.
     """
-    if not file_data_list:
-        empty_message = "No files found matching the criteria."
-        if output_format == "json":
-            return json.dumps({"error": empty_message}, ensure_ascii=False, indent=2)
-        elif output_format == "yaml":
-            return yaml.dump(
-                {"error": empty_message}, allow_unicode=True, default_flow_style=False
-            )
-        else:  # markdown
-            return "# Combined Files\n\nNo files found matching the criteria.\n"
-
-    # --- 1. Фильтрация ---
-    if extensions:
-        filtered_files = [
-            f
-            for f in file_data_list
-            if any(f["name"].lower().endswith(ext) for ext in extensions)
-        ]
-    else:
-        filtered_files = file_data_list
-
-    if not filtered_files:
-        empty_message = "No files found matching the criteria."
-        if output_format == "json":
-            return json.dumps({"error": empty_message}, ensure_ascii=False, indent=2)
-        elif output_format == "yaml":
-            return yaml.dump(
-                {"error": empty_message}, allow_unicode=True, default_flow_style=False
-            )
-        else:  # markdown
-            return "# Combined Files\n\nNo files found matching the criteria.\n"
+    return FileCorpus(file_data_list).render(
+        sort_mode,
+        extensions,
+        preprocessing_options,
+        output_format,
+        progress=progress,
+        stats=stats,
+        cancel=cancel,
+        section_index=section_index,
+    )
 
-    # --- 1.5. Предварительная обработка содержимого ---
-    if preprocessing_options:
-        for file_data in filtered_files:
-            file_data["content"] = preprocess_content(
-                file_data["content"], preprocessing_options
+
+class FileCorpus:
+    """
+    Прочитанные файлы, которые можно объединять несколько раз: в разных
+    форматах, с разной сортировкой и разными опциями предобработки.
+
+    Словари файлов не изменяются и не копируются, ``files`` - их
+    представления только для чтения. Предобработка создаёт для файла новый
+    словарь, который отличается от исходного только 'content' и метаданными
+    этапов; результат запоминается для каждого набора включённых опций, так
+    что при одном наборе опций каждый файл обрабатывается не больше одного
+    раза. Вызовы ``render`` одного корпуса не должны идти параллельно.
+    """
+
+    def __init__(self, file_data_list: Iterable[Mapping[str, Any]]) -> None:
+        self.files: Tuple[Mapping[str, Any], ...] = tuple(
+            file_data
+            if isinstance(file_data, MappingProxyType)
+            else MappingProxyType(file_data)
+            for file_data in file_data_list
+        )
+        # Предобработанные файлы по набору опций и номеру файла в ``files``
+        self._preprocessed: Dict[FrozenSet[str], Dict[int, Mapping[str, Any]]] = {}
+
+    def render(
+        self,
+        sort_mode: str = "name",
+        extensions: Optional[List[str]] = None,
+        preprocessing_options: Optional[Dict[str, bool]] = None,
+        output_format: str = "markdown",
+        progress: Optional[ProgressTracker] = None,
+        stats: Optional[CombineStats] = None,
+        cancel: Optional[CancellationToken] = None,
+        section_index: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        """Объединяет файлы; аргументы те же, что у ``combine_files_content``."""
+        # --- 1. Фильтрация ---
+        if extensions:
+            selected = [
+                number
+                for number, f in enumerate(self.files)
+                if any(f["name"].lower().endswith(ext) for ext in extensions)
+            ]
+        else:
+            selected = range(len(self.files))
+
+        if not selected:
+            return _empty_output(output_format)
+
+        # --- 1.5. Предварительная обработка содержимого ---
+        filtered_files = self.preprocessed(selected, preprocessing_options, stats, cancel)
+
+        # --- 2. Сортировка ---
+        with measure_stage(stats, "sort"):
+            _sort_files(filtered_files, sort_mode)
+
+        # --- 3. Создание контента в зависимости от формата ---
+        if progress is not None:
+            progress.start_render(len(filtered_files))
+
+        with measure_stage(stats, "render"):
+            combined = _render_output(
+                filtered_files,
+                sort_mode,
+                extensions,
+                output_format,
+                progress,
+                cancel,
+                section_index,
             )
+        if stats is not None:
+            stats.count("files_rendered", len(filtered_files))
+        return combined
 
-    # --- 2. Сортировка ---
-    if sort_mode == "name":
-        filtered_files.sort(key=lambda f: f["name"].lower())
-    elif sort_mode == "date_asc":
-        filtered_files.sort(key=lambda f: f["last_modified"])
-    elif sort_mode == "date_desc":
-        filtered_files.sort(key=lambda f: f["last_modified"], reverse=True)
+    def preprocessed(
+        self,
+        numbers: Iterable[int],
+        preprocessing_options: Optional[Dict[str, bool]],
+        stats: Optional[CombineStats] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> List[Mapping[str, Any]]:
+        """
+        Файлы с номерами ``numbers`` после предобработки, в том же порядке.
+
+        Файлы, уже обработанные с тем же набором опций, берутся из кэша.
+        """
+        pipeline = build_pipeline(preprocessing_options)
+        if not pipeline:
+            return [self.files[number] for number in numbers]
+        enabled = frozenset(
+            name for name, value in (preprocessing_options or {}).items() if value
+        )
+        done = self._preprocessed.setdefault(enabled, {})
+        result: List[Mapping[str, Any]] = []
+        with measure_stage(stats, "preprocess"):
+            for number in numbers:
+                file_data = done.get(number)
+                if file_data is None:
+                    check_cancelled(cancel, "preprocess")
+                    file_data = done[number] = _preprocess_file(
+                        self.files[number], pipeline, stats
+                    )
+                result.append(file_data)
+        return result
 
-    # --- 3. Создание контента в зависимости от формата ---
+
+def _preprocess_file(
+    file_data: Mapping[str, Any], pipeline: Pipeline, stats: Optional[CombineStats]
+) -> Mapping[str, Any]:
+    context = FileContext(file_data["name"])
+    processed = dict(file_data)
+    processed["content"] = pipeline.run(file_data["content"], context=context)
+    processed.update(context.metadata)
+    if stats is not None and "redactions" in context.metadata:
+        stats.count("redactions", sum(context.metadata["redactions"].values()))
+    return MappingProxyType(processed)
+
+
+def _empty_output(output_format: str) -> str:
+    empty_message = "No files found matching the criteria."
+    if output_format == "json":
+        return json.dumps({"error": empty_message}, ensure_ascii=False, indent=2)
+    elif output_format == "yaml":
+        return yaml.dump(
+            {"error": empty_message}, allow_unicode=True, default_flow_style=False
+        )
+    else:  # markdown
+        return "# Combined Files\n\nNo files found matching the criteria.\n"
+
+
+def _render_output(
+    filtered_files: List[Mapping[str, Any]],
+    sort_mode: str,
+    extensions: Optional[List[str]],
+    output_format: str,
+    progress: Optional[ProgressTracker],
+    cancel: Optional[CancellationToken] = None,
+    section_index: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """Формирует итоговый документ из отфильтрованных и отсортированных файлов."""
     if output_format.lower() == "json":
         # Создаем структурированный JSON с информацией о путях
         result: Dict[str, Any] = {
@@ -138,7 +282,9 @@ def combine_files_content(
             },
             "files": [],
         }
+        _add_redaction_totals(result["metadata"], filtered_files)
         for file_data in filtered_files:
+            check_cancelled(cancel, "render")
             file_info = {
                 "name": file_data["name"],
                 "last_modified": file_data["last_modified"].isoformat(),
@@ -147,8 +293,16 @@ def combine_files_content(
             # Добавляем информацию о пути, если она есть
             if "relative_path" in file_data:
                 file_info["relative_path"] = file_data["relative_path"]
+            if file_data.get("truncated"):
+                file_info["truncated"] = True
+            if file_data.get("redactions"):
+                file_info["redactions"] = file_data["redactions"]
             result["files"].append(file_info)
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        combined = json.dumps(result, ensure_ascii=False, indent=2)
+        # Основная работа — сериализация, поэтому файлы отмечаются после неё
+        if progress is not None:
+            progress.file_rendered(len(filtered_files))
+        return combined
 
     elif output_format.lower() == "yaml":
         # Создаем структурированный YAML с информацией о путях
@@ -162,7 +316,9 @@ def combine_files_content(
             },
             "files": [],
         }
+        _add_redaction_totals(result["metadata"], filtered_files)
         for file_data in filtered_files:
+            check_cancelled(cancel, "render")
             file_info = {
                 "name": file_data["name"],
                 "last_modified": file_data["last_modified"].isoformat(),
@@ -171,34 +327,225 @@ def combine_files_content(
             # Добавляем информацию о пути, если она есть
             if "relative_path" in file_data:
                 file_info["relative_path"] = file_data["relative_path"]
+            if file_data.get("truncated"):
+                file_info["truncated"] = True
+            if file_data.get("redactions"):
+                file_info["redactions"] = file_data["redactions"]
             result["files"].append(file_info)
-        return yaml.dump(
+        combined = yaml.dump(
             result, allow_unicode=True, default_flow_style=False, sort_keys=False
         )
+        if progress is not None:
+            progress.file_rendered(len(filtered_files))
+        return combined
 
     else:  # markdown (по умолчанию)
-        # Старая логика для Markdown
-        all_content = ["# Combined Files\n\n## Table of Contents\n"]
-        for i, file_data in enumerate(filtered_files, 1):
-            anchor = normalize_anchor(file_data["name"])
-            all_content.append(f"{i}. [{file_data['name']}](#{anchor})\n")
-        all_content.append("\n---\n")
+        # Тройные и более переходы на новую строку схлопываются по мере
+        # добавления частей, а не повторными проходами по всему документу:
+        # так не создаётся вторая полная копия результата.
+        writer = _CollapsingWriter(track_bytes=section_index is not None)
+        _write_markdown(writer, filtered_files, progress, cancel, section_index)
+        return writer.getvalue()
 
-        for file_data in filtered_files:
-            formatted_date = file_data["last_modified"].strftime("%Y-%m-%d %H:%M:%S")
-            all_content.extend(
-                [
-                    "\n---\n",
-                    f"## {file_data['name']}\n",
-                    f"*Last modified: {formatted_date}*\n\n",
-                    file_data["content"],
-                    "\n\n---",
-                ]
+
+def render_markdown_file(
+    file_data_list: List[Dict[str, Any]],
+    out: BinaryIO,
+    write_content: Callable[["_CollapsingWriter", Dict[str, Any]], None],
+    sort_mode: str = "name",
+    progress: Optional[ProgressTracker] = None,
+    stats: Optional[CombineStats] = None,
+    cancel: Optional[CancellationToken] = None,
+    section_index: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    """
+    Записывает markdown-документ в ``out`` в байтах UTF-8.
+
+    Документ совпадает с результатом ``combine_files_content`` без
+    предобработки, но содержимое каждого файла записывает ``write_content``
+    (например, копирует байты файла, не декодируя их). Заголовки и
+    оглавление формируются как текст.
+    """
+    if not file_data_list:
+        out.write(b"# Combined Files\n\nNo files found matching the criteria.\n")
+        return
+    files = list(file_data_list)
+    with measure_stage(stats, "sort"):
+        _sort_files(files, sort_mode)
+    if progress is not None:
+        progress.start_render(len(files))
+    with measure_stage(stats, "render"):
+        writer = _CollapsingWriter(out=out)
+        _write_markdown(writer, files, progress, cancel, section_index, write_content)
+    if stats is not None:
+        stats.count("files_rendered", len(files))
+
+
+def _sort_files(files: List[Mapping[str, Any]], sort_mode: str) -> None:
+    if sort_mode == "name":
+        files.sort(key=lambda f: f["name"].lower())
+    elif sort_mode == "date_asc":
+        files.sort(key=lambda f: f["last_modified"])
+    elif sort_mode == "date_desc":
+        files.sort(key=lambda f: f["last_modified"], reverse=True)
+
+
+def _write_content(writer: "_CollapsingWriter", file_data: Dict[str, Any]) -> None:
+    writer.write(file_data["content"])
+
+
+def _write_markdown(
+    writer: "_CollapsingWriter",
+    files: List[Dict[str, Any]],
+    progress: Optional[ProgressTracker],
+    cancel: Optional[CancellationToken],
+    section_index: Optional[List[Dict[str, Any]]],
+    write_content: Callable[["_CollapsingWriter", Dict[str, Any]], None] = _write_content,
+) -> None:
+    writer.write("# Combined Files\n\n## Table of Contents\n")
+    for i, file_data in enumerate(files, 1):
+        anchor = normalize_anchor(file_data["name"])
+        writer.write(f"{i}. [{file_data['name']}](#{anchor})\n")
+    writer.write("\n---\n")
+
+    for file_data in files:
+        check_cancelled(cancel, "render")
+        formatted_date = file_data["last_modified"].strftime("%Y-%m-%d %H:%M:%S")
+        writer.write("\n---\n")
+        # Раздел файла: от заголовка до конца содержимого
+        writer.begin_section()
+        writer.write(f"## {file_data['name']}\n")
+        writer.write(f"*Last modified: {formatted_date}*\n")
+        if file_data.get("redactions"):
+            writer.write(f"*Redacted: {_format_counts(file_data['redactions'])}*\n")
+        writer.write("\n")
+        write_content(writer, file_data)
+        if section_index is not None:
+            offset, length, digest = writer.end_section()
+            section_index.append(
+                {
+                    "name": file_data["name"],
+                    "anchor": normalize_anchor(file_data["name"]),
+                    "offset": offset,
+                    "length": length,
+                    "sha256": digest,
+                }
             )
+        writer.write("\n\n---")
+        if progress is not None:
+            progress.file_rendered()
+
+
+def _add_redaction_totals(
+    metadata: Dict[str, Any], files: List[Mapping[str, Any]]
+) -> None:
+    """Добавляет в метаданные суммарное число замен секретов, если они были."""
+    totals: Dict[str, int] = {}
+    for file_data in files:
+        for rule, count in file_data.get("redactions", {}).items():
+            totals[rule] = totals.get(rule, 0) + count
+    if totals:
+        metadata["redactions"] = dict(sorted(totals.items()))
+
+
+def _format_counts(counts: Dict[str, int]) -> str:
+    return ", ".join(f"{name} {count}" for name, count in sorted(counts.items()))
+
+
+_NEWLINE_RUN = re.compile(r"\n{3,}")
+_LEADING_NEWLINES = re.compile(r"\n*")
+
+
+class _CollapsingWriter:
+    """
+    Собирает текст из частей, заменяя любые серии из трёх и более '\\n'
+    на '\\n\\n', в том числе серии на стыке соседних частей.
+
+    Части без таких серий сохраняются по ссылке, без копирования. С
+    ``track_bytes=True`` писатель считает длину текста в байтах UTF-8 и
+    хэширует разделы между ``begin_section`` и ``end_section``: уже записанные
+    части не меняются, поэтому смещения остаются точными. С ``out`` части
+    сразу записываются в файл в UTF-8 (длина при этом считается всегда), а
+    ``write_bytes`` добавляет готовые байты без декодирования.
+    """
+
+    def __init__(self, track_bytes: bool = False, out: Optional[BinaryIO] = None) -> None:
+        self._parts: List[str] = []
+        self._out = out
+        self._base = out.tell() if out is not None else 0
+        # Сколько '\\n' (не больше двух) стоит в конце уже записанного текста
+        self._trailing = 0
+        self._track_bytes = track_bytes or out is not None
+        self.byte_length = 0
+        self._section_start = 0
+        self._section_hash: Optional[Any] = None
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        text = _NEWLINE_RUN.sub("\n\n", text)
+        leading = _LEADING_NEWLINES.match(text).end()
+        if leading == len(text):
+            # Часть целиком из переводов строк
+            text = text[: max(0, 2 - self._trailing)]
+            self._trailing += len(text)
+            if not text:
+                return
+        else:
+            excess = self._trailing + leading - 2
+            if excess > 0:
+                text = text[excess:]
+            if text.endswith("\n\n"):
+                self._trailing = 2
+            else:
+                self._trailing = 1 if text.endswith("\n") else 0
+        if self._out is None:
+            self._parts.append(text)
+            if not self._track_bytes:
+                return
+        self._append(text.encode("utf-8"))
+
+    def write_bytes(self, data: bytes, trailing: int) -> None:
+        """
+        Записывает байты UTF-8 как есть; только вместе с ``out``.
+
+        Вызывающий код сам гарантирует, что серий из трёх '\\n' не
+        получится, и передаёт число '\\n' в конце ``data`` (не больше двух).
+        """
+        if data:
+            self._append(data)
+            self._trailing = trailing
+
+    def _append(self, data: bytes) -> None:
+        if self._out is not None:
+            self._out.write(data)
+        self.byte_length += len(data)
+        if self._section_hash is not None:
+            self._section_hash.update(data)
+
+    def checkpoint(self) -> Tuple[int, int, Any]:
+        """Состояние, к которому можно вернуться ``rollback``; только с ``out``."""
+        section_hash = (
+            self._section_hash.copy() if self._section_hash is not None else None
+        )
+        return self.byte_length, self._trailing, section_hash
+
+    def rollback(self, checkpoint: Tuple[int, int, Any]) -> None:
+        """Отменяет всё, что записано в ``out`` после ``checkpoint``."""
+        self.byte_length, self._trailing, self._section_hash = checkpoint
+        self._out.seek(self._base + self.byte_length)
+        self._out.truncate()
+
+    def begin_section(self) -> None:
+        if self._track_bytes:
+            self._section_start = self.byte_length
+            self._section_hash = hashlib.sha256()
 
-        # Убираем тройные и более переходы на новую строку
-        combined_text = "".join(all_content)
-        while "\n\n\n" in combined_text:
-            combined_text = combined_text.replace("\n\n\n", "\n\n")
+    def end_section(self) -> Tuple[int, int, str]:
+        """Возвращает смещение, длину и SHA-256 раздела, начатого ``begin_section``."""
+        digest = self._section_hash.hexdigest()
+        self._section_hash = None
+        return self._section_start, self.byte_length - self._section_start, digest
 
-        return combined_text
+    def getvalue(self) -> str:
+        return "".join(self._parts)
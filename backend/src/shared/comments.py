@@ -0,0 +1,333 @@
+"""
+Удаление комментариев из исходного кода с сохранением строковых литералов.
+
+Язык определяется по расширению файла. Python разбирается модулем
+``tokenize``: удаляются комментарии и докстринги (кроме докстрингов, без
+которых тело блока осталось бы пустым). Для C-подобных языков используется
+лёгкий конечный автомат: регулярное выражение находит начало следующего
+комментария или литерала, а код между ними копируется целиком.
+
+``mark_comments`` ставит на месте удалённого комментария ``COMMENT_MARK``;
+строки, где после этого не осталось ничего, кроме пробелов, выбрасываются
+при очистке (``clean_marked_line``). Конвейер предобработки делает эту
+очистку в том же проходе по строкам, что и остальные построчные этапы.
+"""
+
+import io
+import os
+import re
+import tokenize
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Символ, которого не бывает в тексте: файлы с NUL не обрабатываются
+COMMENT_MARK = "\x00"
+
+
+class _CSyntax(NamedTuple):
+    """Лексические правила C-подобного языка."""
+
+    line_comments: bool = True
+    # В обратных кавычках: шаблонная строка JS (с экранированием) или сырая
+    # строка Go (без экранирования)
+    backtick_escapes: Optional[bool] = None
+    # Литералы регулярных выражений /.../ в JavaScript и TypeScript
+    regex_literals: bool = False
+
+
+_C = _CSyntax()
+_GO = _CSyntax(backtick_escapes=False)
+_JS = _CSyntax(backtick_escapes=True, regex_literals=True)
+_CSS = _CSyntax(line_comments=False)
+
+_PYTHON = "python"
+
+LANGUAGES: Dict[str, object] = {
+    ".py": _PYTHON,
+    ".pyi": _PYTHON,
+    ".pyw": _PYTHON,
+    ".c": _C,
+    ".h": _C,
+    ".cc": _C,
+    ".cpp": _C,
+    ".cxx": _C,
+    ".hh": _C,
+    ".hpp": _C,
+    ".hxx": _C,
+    ".java": _C,
+    ".kt": _C,
+    ".kts": _C,
+    ".scala": _C,
+    ".swift": _C,
+    ".dart": _C,
+    ".go": _GO,
+    ".js": _JS,
+    ".jsx": _JS,
+    ".mjs": _JS,
+    ".cjs": _JS,
+    ".ts": _JS,
+    ".tsx": _JS,
+    ".mts": _JS,
+    ".cts": _JS,
+    ".css": _CSS,
+    ".scss": _C,
+    ".less": _C,
+}
+
+# После этих символов '/' начинает регулярное выражение, а не деление
+_REGEX_PRECEDERS = frozenset("(,=:[!&|?{};+-*%<>~^") | {""}
+_CODING_COMMENT = re.compile(r"^[ \t\f]*#.*?coding[:=]")
+
+
+def supports(filename: str) -> bool:
+    """Можно ли удалять комментарии из файла с таким именем."""
+    return os.path.splitext(filename)[1].lower() in LANGUAGES
+
+
+def strip_comments(content: str, filename: str) -> str:
+    """
+    Удаляет комментарии из ``content`` по правилам языка файла ``filename``.
+
+    Строки, в которых был только комментарий, удаляются целиком, пробелы
+    перед комментарием в конце строки тоже. Текст файлов неизвестного языка
+    и файлов, которые не удалось разобрать, возвращается без изменений.
+    """
+    marked = mark_comments(content, filename)
+    if marked is content:
+        return content
+    lines: List[str] = []
+    for line in marked.split("\n"):
+        if COMMENT_MARK in line:
+            line = clean_marked_line(line)
+            if line is None:
+                continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def clean_marked_line(line: str) -> Optional[str]:
+    """Убирает метки из строки; None, если строку нужно выбросить."""
+    line = line.replace(COMMENT_MARK, "")
+    return None if not line.strip() else line
+
+
+def mark_comments(content: str, filename: str) -> str:
+    """
+    Заменяет комментарии на ``COMMENT_MARK``.
+
+    Возвращает сам ``content``, если язык не поддерживается, в тексте есть
+    NUL или код не удалось разобрать.
+    """
+    syntax = LANGUAGES.get(os.path.splitext(filename)[1].lower())
+    if syntax is None or COMMENT_MARK in content:
+        return content
+    if syntax is _PYTHON:
+        return _mark_python(content)
+    return _mark_c_family(content, syntax)
+
+
+# --- Python ---
+
+
+def _mark_python(content: str) -> str:
+    lines = io.StringIO(content).readlines()
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(content).readline))
+    except (tokenize.TokenError, SyntaxError):
+        return content
+
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    def offset(position: Tuple[int, int]) -> int:
+        row, column = position
+        return offsets[row - 1] + column if row <= len(lines) else len(content)
+
+    spans = [
+        (offset(token.start), offset(token.end)) for token in _python_removals(tokens)
+    ]
+    if not spans:
+        return content
+    parts: List[str] = []
+    position = 0
+    for start, end in spans:
+        parts.append(content[position:start].rstrip(" \t"))
+        parts.append(COMMENT_MARK)
+        position = end
+    parts.append(content[position:])
+    return "".join(parts)
+
+
+_SKIPPED = (tokenize.NL, tokenize.COMMENT)
+_STATEMENT_START = (
+    tokenize.NEWLINE,
+    tokenize.INDENT,
+    tokenize.DEDENT,
+    tokenize.ENCODING,
+)
+_BLOCK_END = (tokenize.DEDENT, tokenize.ENDMARKER)
+
+
+def _python_removals(tokens: List[tokenize.TokenInfo]) -> List[tokenize.TokenInfo]:
+    """Токены комментариев и докстрингов, которые можно удалить, по порядку."""
+    significant = [
+        index for index, token in enumerate(tokens) if token.type not in _SKIPPED
+    ]
+    removals: List[tokenize.TokenInfo] = []
+    for position, index in enumerate(significant):
+        token = tokens[index]
+        if token.type != tokenize.STRING:
+            continue
+        previous = tokens[significant[position - 1]] if position else None
+        following = significant[position + 1 : position + 3]
+        # Отдельная строка-выражение: перед ней начало оператора, после -
+        # конец оператора, и за ним в блоке есть ещё операторы
+        if (
+            (previous is None or previous.type in _STATEMENT_START)
+            and len(following) == 2
+            and tokens[following[0]].type == tokenize.NEWLINE
+            and tokens[following[1]].type not in _BLOCK_END
+        ):
+            removals.append(token)
+
+    for token in tokens:
+        if token.type != tokenize.COMMENT:
+            continue
+        row = token.start[0]
+        if row == 1 and token.string.startswith("#!"):
+            continue
+        if row <= 2 and _CODING_COMMENT.match(token.line):
+            continue
+        removals.append(token)
+    removals.sort(key=lambda token: token.start)
+    return removals
+
+
+# --- C-подобные языки ---
+
+_LINE_COMMENT_END = re.compile(r"[\r\n]")
+_REGEX_LITERAL = re.compile(r"/(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/")
+_NEWLINE = re.compile(r"\r\n|\r|\n")
+# После этих слов '/' тоже начинает регулярное выражение
+_REGEX_KEYWORDS = frozenset(
+    (
+        "return",
+        "typeof",
+        "instanceof",
+        "in",
+        "of",
+        "new",
+        "delete",
+        "void",
+        "throw",
+        "case",
+        "do",
+        "else",
+        "yield",
+        "await",
+    )
+)
+
+
+def _string_end(quote: str, escapes: bool) -> "re.Pattern[str]":
+    # Обычная строка не переходит на следующую строку: незакрытая кавычка
+    # (например, апостроф в тексте) не должна поглотить остаток файла
+    stop = "" if quote == "`" else r"\n"
+    if escapes:
+        body = rf"(?:\\.|[^{quote}\\{stop}])*"
+    else:
+        body = rf"[^{quote}{stop}]*"
+    return re.compile(body + f"(?:{quote}|(?=\\n)|\\Z)", re.DOTALL)
+
+
+_STRING_ENDS = {
+    ('"', True): _string_end('"', True),
+    ("'", True): _string_end("'", True),
+    ("`", True): _string_end("`", True),
+    ("`", False): _string_end("`", False),
+}
+
+
+def _start_pattern(syntax: _CSyntax) -> "re.Pattern[str]":
+    """Начало следующего комментария или литерала."""
+    starts = ["/" if syntax.regex_literals else "/\\*"]
+    if syntax.line_comments and not syntax.regex_literals:
+        starts.append("//")
+    starts.append("[\"'`]" if syntax.backtick_escapes is not None else "[\"']")
+    return re.compile("|".join(starts))
+
+
+_START_PATTERNS = {syntax: _start_pattern(syntax) for syntax in (_C, _GO, _JS, _CSS)}
+
+
+def _mark_c_family(content: str, syntax: _CSyntax) -> str:
+    start_pattern = _START_PATTERNS[syntax]
+    parts: List[str] = []
+    found = False
+    position = 0
+    length = len(content)
+    while position < length:
+        match = start_pattern.search(content, position)
+        if match is None:
+            break
+        start = match.start()
+        char = content[start]
+        following = content[start + 1 : start + 2]
+
+        if char == "/" and following == "/" and syntax.line_comments:
+            parts.append(content[position:start].rstrip(" \t"))
+            parts.append(COMMENT_MARK)
+            found = True
+            end_match = _LINE_COMMENT_END.search(content, start)
+            position = end_match.start() if end_match else length
+        elif char == "/" and following == "*":
+            end = content.find("*/", start + 2)
+            end = length if end == -1 else end + 2
+            parts.append(content[position:start].rstrip(" \t"))
+            parts.append(COMMENT_MARK)
+            found = True
+            newline = _NEWLINE.search(content, start, end)
+            if newline is not None:
+                # Многострочный комментарий остаётся переводом строки, чтобы
+                # не склеивать строки (в Go это ещё и конец оператора)
+                parts.append(newline.group())
+                parts.append(COMMENT_MARK)
+            position = end
+        elif char == "/":
+            # Только в JS/TS: деление или литерал регулярного выражения
+            end = start + 1
+            if _previous_significant(content, start) in _REGEX_PRECEDERS:
+                regex = _REGEX_LITERAL.match(content, start)
+                if regex is not None:
+                    end = regex.end()
+            parts.append(content[position:end])
+            position = end
+        else:
+            escapes = syntax.backtick_escapes if char == "`" else True
+            end = _STRING_ENDS[(char, escapes)].match(content, start + 1).end()
+            parts.append(content[position:end])
+            position = end
+    if not found:
+        return content
+    parts.append(content[position:])
+    return "".join(parts)
+
+
+def _previous_significant(content: str, index: int) -> str:
+    """Последний непробельный символ перед ``index`` ('' в начале текста)."""
+    index -= 1
+    while index >= 0 and content[index] in " \t\r\n":
+        index -= 1
+    if index < 0:
+        return ""
+    char = content[index]
+    # После ключевых слов вроде return тоже идёт выражение
+    if char.isalnum() or char in "_$":
+        word_start = index
+        while word_start > 0 and (
+            content[word_start - 1].isalnum() or content[word_start - 1] in "_$"
+        ):
+            word_start -= 1
+        if content[word_start : index + 1] in _REGEX_KEYWORDS:
+            return ""
+    return char
@@ -0,0 +1,155 @@
+"""
+Отбор файлов по содержимому при сканировании папки.
+
+``ContentFilter`` оставляет файлы, в которых есть ``pattern``, и отбрасывает
+файлы, в которых есть ``exclude_pattern``. Проверка идёт по сырым байтам до
+декодирования: литерал ищется через ``bytes.find`` (memchr-подобный поиск в C),
+для регулярного выражения так же ищутся его обязательные литералы, и только
+прошедшие этот отбор файлы декодируются и проверяются выражением целиком.
+Файл читается блоками, и файл с исключающим литералом бросается на первом
+блоке, где он встретился.
+"""
+
+import os
+import re
+import time
+from typing import List, Optional
+
+from .scan_logic import FileText, decode_text
+from .search_index import required_literals
+from .stats import CombineStats
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class _Pattern:
+    """Шаблон с байтовыми литералами для предварительного отбора."""
+
+    def __init__(self, pattern: str, regex: bool) -> None:
+        self.source = pattern
+        self.regex = re.compile(pattern, re.MULTILINE) if regex else None
+        literals = required_literals(pattern) if regex else [pattern]
+        if self.regex is not None and self.regex.flags & re.IGNORECASE:
+            # Литералы разобраны с учётом регистра, а (?i) его игнорирует
+            literals = []
+        # Окончания строк в сырых байтах могут быть '\r\n', а в тексте - '\n',
+        # поэтому литералы с переводом строки проверяются только по тексту
+        self.needles: List[bytes] = [
+            literal.encode("utf-8") for literal in literals if "\n" not in literal
+        ]
+        # Подстрока, найденная в байтах, - окончательный ответ
+        self.exact = self.regex is None and len(self.needles) == 1
+
+    def may_match(self, data: bytes) -> bool:
+        """Ложь означает, что совпадения точно нет."""
+        return all(data.find(needle) != -1 for needle in self.needles)
+
+    def matches(self, data: bytes, text: str) -> bool:
+        if not self.may_match(data):
+            return False
+        if self.exact:
+            return True
+        if self.regex is not None:
+            return self.regex.search(text) is not None
+        return self.source in text
+
+
+class ContentFilter:
+    """
+    Фильтр файлов по содержимому: подстрока или регулярное выражение.
+
+    Args:
+        pattern: Оставлять только файлы, где есть совпадение с этим шаблоном.
+        exclude_pattern: Отбрасывать файлы, где есть совпадение с этим шаблоном.
+        regex: Считать шаблоны регулярными выражениями, иначе - подстроками.
+
+    Raises:
+        re.error: Если шаблон - некорректное регулярное выражение.
+    """
+
+    def __init__(
+        self,
+        pattern: Optional[str] = None,
+        exclude_pattern: Optional[str] = None,
+        regex: bool = False,
+    ) -> None:
+        self.include = _Pattern(pattern, regex) if pattern else None
+        self.exclude = _Pattern(exclude_pattern, regex) if exclude_pattern else None
+
+    def matches_text(self, text: str) -> bool:
+        """Проверяет уже прочитанный текст."""
+        return self._accepts(text.encode("utf-8"), text)
+
+    def _accepts(self, data: bytes, text: str) -> bool:
+        if self.include is not None and not self.include.matches(data, text):
+            return False
+        if self.exclude is not None and self.exclude.matches(data, text):
+            return False
+        return True
+
+    def _rejected_by_bytes(self, data: bytes) -> bool:
+        if self.include is not None and not self.include.may_match(data):
+            return True
+        return self._excluded_by_bytes(data)
+
+    def _excluded_by_bytes(self, data: bytes) -> bool:
+        return (
+            self.exclude is not None
+            and self.exclude.exact
+            and data.find(self.exclude.needles[0]) != -1
+        )
+
+    def read(self, path: str, stats: Optional[CombineStats] = None) -> Optional[FileText]:
+        """
+        Читает файл, если он проходит фильтр, иначе возвращает None.
+
+        Длительности чтения и декодирования учитываются в ``stats`` так же,
+        как в ``read_text_file``; отброшенные файлы считаются в счётчике
+        'files_filtered_out'.
+        """
+        if stats is not None:
+            start = time.perf_counter()
+        chunks: List[bytes] = []
+        abandoned = False
+        # Перекрытие блоков, чтобы не пропустить литерал на их стыке
+        overlap = len(self.exclude.needles[0]) - 1 if self._exact_exclude() else 0
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            tail = b""
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if self._excluded_by_bytes(chunk) or (
+                    tail and self._excluded_by_bytes(tail + chunk[:overlap])
+                ):
+                    abandoned = True
+                    break
+                chunks.append(chunk)
+                tail = chunk[-overlap:] if overlap else b""
+        if stats is not None:
+            decode_start = time.perf_counter()
+            stats.add_time("read", decode_start - start)
+
+        data = b"" if abandoned else b"".join(chunks)
+        del chunks
+        if abandoned or self._rejected_by_bytes(data):
+            return self._filtered_out(stats)
+        content = decode_text(data)
+        if not self._accepts(data, content):
+            return self._filtered_out(stats)
+
+        if stats is not None:
+            stats.add_time("decode", time.perf_counter() - decode_start)
+            stats.count("bytes_read", stat.st_size)
+            stats.count("files_read")
+        return FileText(content, stat.st_mtime, stat.st_size)
+
+    def _exact_exclude(self) -> bool:
+        return self.exclude is not None and self.exclude.exact
+
+    @staticmethod
+    def _filtered_out(stats: Optional[CombineStats]) -> None:
+        if stats is not None:
+            stats.count("files_filtered_out")
+        return None
@@ -0,0 +1,180 @@
+"""
+Чтение только части файла: первых строк, последних строк или первых байт.
+
+Начало файла читается блоками до нужного числа строк или байт, конец - блоками
+в обратном направлении от конца файла, так что середина большого файла не
+читается совсем. На месте пропущенной части в текст вставляется маркер
+``[... N bytes omitted ...]``.
+"""
+
+import io
+import os
+import time
+from typing import BinaryIO, List, Optional, Tuple
+
+from .scan_logic import FileText, decode_text
+from .stats import CombineStats
+
+BLOCK_SIZE = 64 * 1024
+
+
+def omission_marker(omitted_bytes: int) -> str:
+    """Строка, которой в тексте заменяется пропущенная часть файла."""
+    return f"[... {omitted_bytes} bytes omitted ...]"
+
+
+def _nth_newline_end(block: bytes, n: int) -> int:
+    """Позиция сразу после ``n``-го перевода строки в ``block``."""
+    index = -1
+    for _ in range(n):
+        index = block.find(b"\n", index + 1)
+    return index + 1
+
+
+def _trim_partial_utf8_end(data: bytes) -> bytes:
+    """Отрезает незаконченный многобайтовый символ UTF-8 в конце."""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 != 0x80:
+            # Ведущий байт: 110xxxxx - 2 байта, 1110xxxx - 3, 11110xxx - 4
+            length = 1 if byte < 0x80 else 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return data if back >= length else data[:-back]
+    return data
+
+
+def _trim_partial_utf8_start(data: bytes) -> bytes:
+    """Отрезает продолжение многобайтового символа UTF-8 в начале."""
+    start = 0
+    while start < min(3, len(data)) and data[start] & 0xC0 == 0x80:
+        start += 1
+    return data[start:]
+
+
+class Excerpt:
+    """
+    Какую часть каждого файла читать.
+
+    Args:
+        head_lines: Сколько первых строк взять (0 - не брать начало по строкам).
+        tail_lines: Сколько последних строк взять (0 - не брать конец).
+        max_bytes: Ограничение в байтах для начала и для конца файла по
+            отдельности; без ``head_lines`` и ``tail_lines`` берутся первые
+            ``max_bytes`` байт.
+
+    Raises:
+        ValueError: Если какое-то значение отрицательное.
+    """
+
+    def __init__(
+        self, head_lines: int = 0, tail_lines: int = 0, max_bytes: int = 0
+    ) -> None:
+        if min(head_lines, tail_lines, max_bytes) < 0:
+            raise ValueError("head_lines, tail_lines and max_bytes must not be negative")
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.max_bytes = max_bytes
+
+    @property
+    def active(self) -> bool:
+        return bool(self.head_lines or self.tail_lines or self.max_bytes)
+
+    def read(self, path: str, stats: Optional[CombineStats] = None) -> FileText:
+        """Читает выбранную часть файла; аналог ``read_text_file``."""
+        if stats is not None:
+            start = time.perf_counter()
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            head, tail = self._read_parts(f, stat.st_size)
+        if stats is not None:
+            decode_start = time.perf_counter()
+            stats.add_time("read", decode_start - start)
+
+        content, truncated = self._compose(head, tail, stat.st_size)
+
+        if stats is not None:
+            stats.add_time("decode", time.perf_counter() - decode_start)
+            stats.count("bytes_read", len(head) + len(tail))
+            stats.count("files_read")
+            if truncated:
+                stats.count("files_truncated")
+        return FileText(content, stat.st_mtime, stat.st_size, truncated)
+
+    def apply(self, file_text: FileText) -> FileText:
+        """Выбирает часть уже прочитанного текста (например, из ``ScanCache``)."""
+        data = file_text.content.encode("utf-8")
+        head, tail = self._read_parts(io.BytesIO(data), len(data))
+        content, truncated = self._compose(head, tail, len(data))
+        return file_text._replace(content=content, truncated=truncated)
+
+    def _read_parts(self, f: BinaryIO, size: int) -> Tuple[bytes, bytes]:
+        if not self.head_lines and not self.tail_lines:
+            return self._read_head(f, 0), b""
+        head = self._read_head(f, self.head_lines) if self.head_lines else b""
+        tail = self._read_tail(f, size, len(head)) if self.tail_lines else b""
+        return head, tail
+
+    def _read_head(self, f: BinaryIO, lines: int) -> bytes:
+        chunks: List[bytes] = []
+        total = 0
+        newlines = 0
+        while True:
+            want = BLOCK_SIZE
+            if self.max_bytes:
+                want = min(want, self.max_bytes - total)
+                if want <= 0:
+                    break
+            block = f.read(want)
+            if not block:
+                break
+            if lines:
+                count = block.count(b"\n")
+                if newlines + count >= lines:
+                    chunks.append(block[: _nth_newline_end(block, lines - newlines)])
+                    break
+                newlines += count
+            chunks.append(block)
+            total += len(block)
+        data = b"".join(chunks)
+        return _trim_partial_utf8_end(data) if self.max_bytes else data
+
+    def _read_tail(self, f: BinaryIO, size: int, lower: int) -> bytes:
+        """Последние ``tail_lines`` строк, не заходя левее смещения ``lower``."""
+        floor = lower
+        if self.max_bytes:
+            floor = max(lower, size - self.max_bytes)
+        chunks: List[bytes] = []
+        newlines = 0
+        position = size
+        while position > floor:
+            block_start = max(floor, position - BLOCK_SIZE)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+            # Перевод строки в самом конце файла завершает последнюю строку
+            end = len(block)
+            if position == size and block.endswith(b"\n"):
+                end -= 1
+            count = block.count(b"\n", 0, end)
+            if newlines + count >= self.tail_lines:
+                index = end
+                for _ in range(self.tail_lines - newlines):
+                    index = block.rfind(b"\n", 0, index)
+                chunks.append(block[index + 1 :])
+                break
+            newlines += count
+            chunks.append(block)
+            position = block_start
+        else:
+            if floor > lower:
+                # Обрезано по max_bytes, а не по границе строки
+                return _trim_partial_utf8_start(b"".join(reversed(chunks)))
+        return b"".join(reversed(chunks))
+
+    @staticmethod
+    def _compose(head: bytes, tail: bytes, size: int) -> Tuple[str, bool]:
+        omitted = size - len(head) - len(tail)
+        if omitted <= 0:
+            return decode_text(head + tail), False
+        head_text = decode_text(head)
+        if head_text and not head_text.endswith("\n"):
+            head_text += "\n"
+        return head_text + omission_marker(omitted) + "\n" + decode_text(tail), True
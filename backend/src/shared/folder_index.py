@@ -0,0 +1,504 @@
+"""
+Постоянный индекс папок в SQLite.
+
+Для каждого файла хранятся размер, время изменения, inode, SHA-256
+содержимого, число строк и признак двоичного файла, для каждой директории -
+время изменения и её элементы. Повторное обновление (``refresh``) листит
+заново только директории с изменившимся временем изменения; у файлов
+остальных директорий проверяется ``lstat`` - файл, дописанный или
+переписанный на месте, не меняет время изменения своей директории.
+Содержимое читается заново лишь у новых файлов и файлов с другими размером,
+временем изменения или inode; ``refresh`` с ``full=True`` перечитывает все
+директории.
+
+Обход, оглавление и отпечаток папки берутся из индекса: ``list_directory``
+подходит как функция листинга для ``scan_directory``, ``manifest`` совпадает
+с ``directory_manifest`` для той же папки, ``files`` отвечает на запросы по
+метаданным без обхода дерева. База открывается в режиме WAL, так что
+читатели из других процессов не ждут записи.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .cancellation import CancellationToken, check_cancelled
+from .scan_logic import (
+    DirectoryManifest,
+    DirEntryInfo,
+    manifest_from_records,
+    matches_extensions,
+)
+
+BLOCK_SIZE = 1024 * 1024
+# Файл с NUL в начале считается двоичным (та же эвристика, что у git)
+BINARY_SNIFF_BYTES = 8000
+
+# Индекс - кэш, поэтому база другой версии просто создаётся заново
+SCHEMA_VERSION = 2
+_SCHEMA = """
+DROP TABLE IF EXISTS dirs;
+DROP TABLE IF EXISTS entries;
+CREATE TABLE dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE entries (
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    is_link INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT,
+    line_count INTEGER,
+    binary INTEGER,
+    PRIMARY KEY (parent, name)
+);
+CREATE INDEX entries_file ON entries (device, inode);
+"""
+
+
+class IndexedFile(NamedTuple):
+    """Файл в индексе."""
+
+    path: str
+    relative_path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    sha256: str
+    line_count: int
+    binary: bool
+
+
+class IndexRefresh(NamedTuple):
+    """Итог обновления индекса для одной папки."""
+
+    dirs_listed: int
+    files_hashed: int
+    # Удалённые из индекса файлы и директории
+    removed: int
+
+
+class _Content(NamedTuple):
+    sha256: str
+    line_count: int
+    binary: bool
+
+
+def describe_content(path: str) -> _Content:
+    """SHA-256, число строк и признак двоичного файла; файл читается блоками."""
+    digest = hashlib.sha256()
+    lines = 0
+    binary = False
+    last = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(BLOCK_SIZE)
+            if not block:
+                break
+            if not lines and not last:
+                binary = b"\0" in block[:BINARY_SNIFF_BYTES]
+            digest.update(block)
+            lines += block.count(b"\n")
+            last = block[-1:]
+    # Последняя строка без перевода строки тоже считается
+    if last and last != b"\n":
+        lines += 1
+    return _Content(digest.hexdigest(), lines, binary)
+
+
+def _descendants(path: str) -> Tuple[str, str]:
+    """Границы диапазона путей строго внутри ``path`` (для запроса по индексу)."""
+    prefix = os.path.join(path, "")
+    # Следующий за разделителем символ: все пути с префиксом меньше этой строки
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class FolderIndex:
+    """Потокобезопасный индекс папок в файле SQLite ``db_path``."""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            self._db.executescript(_SCHEMA)
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def refresh(
+        self,
+        folder_path: str,
+        full: bool = False,
+        cancel: Optional[CancellationToken] = None,
+    ) -> IndexRefresh:
+        """
+        Приводит индекс папки в соответствие с диском.
+
+        Директории с прежним временем изменения не перечитываются (с
+        ``full=True`` перечитываются все): у их файлов из индекса только
+        проверяются ``lstat``, и файлы с другими размером, временем изменения
+        или inode хэшируются заново. Пропавшие директории и файлы удаляются из
+        индекса вместе со всем содержимым.
+
+        Символические ссылки индексируются как обычные пути (обход и выдача
+        индекса сами пропускают повторы), кроме циклов: директория, которая
+        (по ``st_dev`` и ``st_ino``) уже есть среди её предков, не листится.
+        Содержимое файла, уже известного под другим путём, не читается.
+
+        Блокировка берётся только на время запросов к базе: листинг,
+        ``stat`` и хэширование не задерживают другие запросы к индексу.
+        """
+        root = os.path.abspath(folder_path)
+        listed = hashed = removed = 0
+        # Директории и (st_dev, st_ino) их предков
+        pending: List[Tuple[str, Tuple[Tuple[int, int], ...]]] = [(root, ())]
+        while pending:
+            path, ancestors = pending.pop()
+            check_cancelled(cancel, "index")
+            try:
+                stat = os.stat(path)
+            except OSError:
+                removed += self._write(self._forget_dir, path)
+                continue
+            if (stat.st_dev, stat.st_ino) in ancestors:
+                removed += self._write(self._forget_dir, path)
+                continue
+            ancestors += ((stat.st_dev, stat.st_ino),)
+            with self._lock:
+                known = self._db.execute(
+                    "SELECT mtime_ns FROM dirs WHERE path = ?", (path,)
+                ).fetchone()
+                old: Dict[str, tuple] = {
+                    row[0]: row[1:]
+                    for row in self._db.execute(
+                        "SELECT name, is_dir, is_link, device, inode, size, mtime_ns,"
+                        " sha256, line_count, binary FROM entries WHERE parent = ?",
+                        (path,),
+                    )
+                }
+            if not full and known is not None and known[0] == stat.st_mtime_ns:
+                rows, gone, new_hashed = self._check_files(path, old, cancel)
+                subdirs = [os.path.join(path, n) for n, row in old.items() if row[0]]
+                mtime_ns = None
+            else:
+                try:
+                    rows, gone, subdirs, new_hashed = self._list(path, old, cancel)
+                except PermissionError:
+                    removed += self._write(self._forget_dir, path)
+                    continue
+                listed += 1
+                mtime_ns = stat.st_mtime_ns
+            hashed += new_hashed
+            if rows or gone or mtime_ns is not None:
+                removed += self._write(self._store, path, rows, gone, mtime_ns)
+            pending.extend((subdir, ancestors) for subdir in subdirs)
+        return IndexRefresh(listed, hashed, removed)
+
+    def _write(self, action: Callable[..., int], *args: Any) -> int:
+        """Выполняет ``action`` под блокировкой в одной транзакции."""
+        with self._lock, self._db:
+            return action(*args)
+
+    def _store(
+        self,
+        path: str,
+        rows: List[tuple],
+        gone: Dict[str, tuple],
+        mtime_ns: Optional[int],
+    ) -> int:
+        """Записывает изменения одной директории; возвращает число удалённых."""
+        removed = 0
+        for name, previous in gone.items():
+            self._db.execute(
+                "DELETE FROM entries WHERE parent = ? AND name = ?", (path, name)
+            )
+            removed += 1
+            if previous[0]:
+                removed += self._forget_dir(os.path.join(path, name))
+        self._db.executemany(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        if mtime_ns is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)",
+                (path, mtime_ns),
+            )
+        return removed
+
+    def _list(
+        self, path: str, old: Dict[str, tuple], cancel: Optional[CancellationToken]
+    ) -> Tuple[List[tuple], Dict[str, tuple], List[str], int]:
+        """
+        Перечитывает одну директорию с диска, без записи в базу.
+
+        Возвращает строки элементов, пропавшие элементы, поддиректории и число
+        захэшированных файлов.
+        """
+        old = dict(old)
+        # Директории, на месте которых теперь файлы
+        replaced: Dict[str, tuple] = {}
+        subdirs: List[str] = []
+        rows = []
+        hashed = 0
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_link = int(entry.is_symlink())
+                    if entry.is_file():
+                        previous = old.pop(entry.name, None)
+                        if previous is not None and previous[0]:
+                            replaced[entry.name] = previous
+                            previous = None
+                        row, new_hash = self._file_row(
+                            path, entry.name, entry.stat(), is_link, previous, cancel
+                        )
+                        rows.append(row)
+                        hashed += new_hash
+                    elif entry.is_dir():
+                        stat = entry.stat()
+                        old.pop(entry.name, None)
+                        rows.append(
+                            (path, entry.name, 1, is_link, stat.st_dev, stat.st_ino)
+                            + (None,) * 5
+                        )
+                        subdirs.append(entry.path)
+                except OSError:
+                    continue
+        old.update(replaced)
+        return rows, old, subdirs, hashed
+
+    def _check_files(
+        self, path: str, old: Dict[str, tuple], cancel: Optional[CancellationToken]
+    ) -> Tuple[List[tuple], Dict[str, tuple], int]:
+        """
+        Проверяет файлы неизменной директории по ``lstat`` (у ссылок - ``stat``
+        цели): файл, дописанный или переписанный на месте, не меняет время
+        изменения директории. Возвращает изменившиеся строки, пропавшие файлы и
+        число захэшированных файлов.
+        """
+        rows = []
+        gone: Dict[str, tuple] = {}
+        hashed = 0
+        for name, previous in old.items():
+            if previous[0]:
+                continue
+            file_path = os.path.join(path, name)
+            try:
+                stat = os.stat(file_path) if previous[1] else os.lstat(file_path)
+                row, new_hash = self._file_row(
+                    path, name, stat, previous[1], previous, cancel
+                )
+            except OSError:
+                gone[name] = previous
+                continue
+            if new_hash or row[2:] != previous:
+                rows.append(row)
+                hashed += new_hash
+        return rows, gone, hashed
+
+    def _file_row(
+        self,
+        path: str,
+        name: str,
+        stat: os.stat_result,
+        is_link: int,
+        previous: Optional[tuple],
+        cancel: Optional[CancellationToken],
+    ) -> Tuple[tuple, bool]:
+        """Строка файла для ``entries``; True, если содержимое пришлось прочитать."""
+        identity = (0, is_link, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if previous is not None and previous[:6] == identity:
+            return (path, name) + tuple(previous), False
+        content = self._known_content(stat)
+        read = content is None
+        if content is None:
+            check_cancelled(cancel, "index")
+            content = describe_content(os.path.join(path, name))
+        row = (path, name) + identity + (content.sha256, content.line_count)
+        return row + (int(content.binary),), read
+
+    def _known_content(self, stat: os.stat_result) -> Optional[_Content]:
+        """Данные о содержимом того же файла под другим путём (жёсткая ссылка)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha256, line_count, binary FROM entries"
+                " WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?"
+                " AND is_dir = 0 LIMIT 1",
+                (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        return _Content(*row) if row is not None else None
+
+    def _forget_dir(self, path: str) -> int:
+        """Удаляет всё, что под директорией; возвращает число удалённых элементов."""
+        low, high = _descendants(path)
+        removed = self._db.execute(
+            "DELETE FROM entries WHERE parent = ? OR (parent >= ? AND parent < ?)",
+            (path, low, high),
+        ).rowcount
+        self._db.execute(
+            "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (path, low, high),
+        )
+        return removed
+
+    def list_directory(self, path: str) -> List[DirEntryInfo]:
+        """
+        Элементы директории из индекса, в формате ``scan_logic.list_directory``.
+
+        Raises:
+            PermissionError: Если директории нет в индексе (не обновлялась
+                или недоступна) - так ``scan_directory`` её пропускает.
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            if (
+                self._db.execute("SELECT 1 FROM dirs WHERE path = ?", (key,)).fetchone()
+                is None
+            ):
+                raise PermissionError(path)
+            rows = self._db.execute(
+                "SELECT name, is_dir, is_link, device, inode FROM entries"
+                " WHERE parent = ? ORDER BY name",
+                (key,),
+            ).fetchall()
+        return [
+            DirEntryInfo(
+                name,
+                os.path.join(path, name),
+                not is_dir,
+                bool(is_dir),
+                bool(is_link),
+                (device, inode),
+            )
+            for name, is_dir, is_link, device, inode in rows
+        ]
+
+    def files(
+        self,
+        folder_path: str,
+        max_depth: int = 0,
+        extensions: Optional[List[str]] = None,
+        sort_mode: str = "name",
+        follow_symlinks: bool = True,
+    ) -> List[IndexedFile]:
+        """
+        Файлы папки из индекса, без обращения к диску.
+
+        ``max_depth``, ``extensions`` и ``follow_symlinks`` значат то же, что
+        у ``scan_directory``; из жёстких ссылок на один файл, как и там,
+        остаётся первая в порядке обхода. ``sort_mode`` - 'name',
+        'date_asc', 'date_desc' или 'size' (по убыванию размера).
+        """
+        root = os.path.abspath(folder_path)
+        result = list(self._iter_files(root, max_depth, extensions, follow_symlinks))
+        if sort_mode == "name":
+            result.sort(key=lambda f: f.relative_path.lower())
+        elif sort_mode == "date_asc":
+            result.sort(key=lambda f: f.mtime_ns)
+        elif sort_mode == "date_desc":
+            result.sort(key=lambda f: f.mtime_ns, reverse=True)
+        elif sort_mode == "size":
+            result.sort(key=lambda f: f.size, reverse=True)
+        return result
+
+    def _iter_files(
+        self,
+        root: str,
+        max_depth: int,
+        extensions: Optional[List[str]],
+        follow_symlinks: bool,
+    ) -> Iterator[IndexedFile]:
+        low, high = _descendants(root)
+        within = "(parent = ? OR (parent >= ? AND parent < ?))"
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT parent, name, is_link, device, inode, size, mtime_ns, sha256,"
+                " line_count, binary FROM entries WHERE is_dir = 0 AND " + within,
+                (root, low, high),
+            ).fetchall()
+            links: Set[str] = set()
+            if not follow_symlinks:
+                links = {
+                    os.path.join(parent, name)
+                    for parent, name in self._db.execute(
+                        "SELECT parent, name FROM entries"
+                        " WHERE is_dir = 1 AND is_link = 1 AND " + within,
+                        (root, low, high),
+                    )
+                }
+        found = []
+        # Пути в индексе абсолютные, поэтому относительный путь - это суффикс
+        for parent, name, is_link, device, inode, *metadata in rows:
+            if not matches_extensions(name, extensions):
+                continue
+            if not follow_symlinks and (is_link or _inside(parent, root, links)):
+                continue
+            path = os.path.join(parent, name)
+            relative_path = path[len(low) :]
+            parts = relative_path.split(os.sep)
+            if max_depth > 0 and len(parts) - 1 > max_depth:
+                continue
+            size, mtime_ns, sha256, lines, binary = metadata
+            indexed = IndexedFile(
+                path, relative_path, size, mtime_ns, inode, sha256, lines, bool(binary)
+            )
+            found.append((parts, (device, inode), indexed))
+        # Порядок обхода ``scan_directory`` по листингам индекса: директории
+        # по именам, вглубь
+        found.sort(key=lambda item: item[0])
+        seen: Set[Tuple[int, int]] = set()
+        for _, file_id, indexed in found:
+            if file_id not in seen:
+                seen.add(file_id)
+                yield indexed
+
+    def manifest(
+        self,
+        folder_path: str,
+        max_depth: int = 0,
+        extensions: Optional[List[str]] = None,
+        follow_symlinks: bool = True,
+    ) -> DirectoryManifest:
+        """
+        Манифест папки по индексу; совпадает с ``directory_manifest``, пока к
+        каждому файлу ведёт один путь (иначе обходы могут оставить разные).
+        """
+        root = os.path.abspath(folder_path)
+        return manifest_from_records(
+            (f.relative_path, f.size, f.mtime_ns)
+            for f in self._iter_files(root, max_depth, extensions, follow_symlinks)
+        )
+
+
+def _inside(path: str, root: str, links: AbstractSet[str]) -> bool:
+    """Лежит ли ``path`` (внутри ``root``) в одной из директорий ``links``."""
+    while links and path != root:
+        if path in links:
+            return True
+        path = os.path.dirname(path)
+    return False
@@ -0,0 +1,225 @@
+"""
+Объединение папки в markdown без декодирования содержимого файлов.
+
+Без предобработки документ состоит из заголовков, оглавления и байтов
+файлов. Если файл - валидный UTF-8 без '\\r', его текст после декодирования
+совпадает с байтами, поэтому файл копируется в вывод блоками через один
+переиспользуемый буфер (``readinto``): UTF-8 только проверяется, строки
+Python не создаются и не кодируются обратно. Серии переводов строк
+схлопываются так же, как в ``combine_files_content``, в том числе на
+границах блоков. Файл, который не прошёл проверку, дописывается заново
+через обычное чтение с декодированием, поэтому результат всегда совпадает
+с текстовым путём байт в байт. Файл без прав на чтение текстовый путь
+пропускает вместе со строкой оглавления, поэтому здесь документ в таком
+случае записывается заново без этого файла.
+
+Этапы 'read' (чтение) и 'decode' (здесь - проверка UTF-8) выполняются
+внутри 'render' и учитываются в обоих.
+"""
+
+import codecs
+import re
+import time
+from typing import AbstractSet, Any, BinaryIO, Callable, Dict, List, Optional
+
+from .cancellation import CancellationToken
+from .combine_logic import render_markdown_file
+from .pipeline import build_pipeline
+from .progress import ProgressTracker
+from .scan_logic import DirEntryInfo, list_folder_files, read_text_file
+from .stats import CombineStats
+
+CHUNK_SIZE = 1024 * 1024
+
+_NEWLINE_RUN = re.compile(rb"\n{3,}")
+_LEADING_NEWLINES = re.compile(rb"\n*")
+_NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+
+def can_pass_through(
+    preprocessing_options: Optional[Dict[str, bool]], output_format: str
+) -> bool:
+    """Можно ли построить документ с этими настройками без декодирования файлов."""
+    return output_format == "markdown" and not build_pipeline(preprocessing_options)
+
+
+def write_folder_markdown(
+    out: BinaryIO,
+    folder_path: str,
+    max_depth: int = 0,
+    extensions: Optional[List[str]] = None,
+    sort_mode: str = "name",
+    progress: Optional[ProgressTracker] = None,
+    stats: Optional[CombineStats] = None,
+    cancel: Optional[CancellationToken] = None,
+    only_paths: Optional[AbstractSet[str]] = None,
+    section_index: Optional[List[Dict[str, Any]]] = None,
+    lister: Optional[Callable[[str], List[DirEntryInfo]]] = None,
+    follow_symlinks: bool = True,
+) -> None:
+    """
+    Записывает в ``out`` markdown-документ по файлам папки.
+
+    Результат тот же, что у ``scan_directory`` и ``combine_files_content``
+    без предобработки, в байтах UTF-8. ``out`` должен поддерживать ``seek``
+    и ``truncate``: раздел файла, который не удалось скопировать как есть,
+    обрезается и записывается заново.
+    """
+    files = list_folder_files(
+        folder_path,
+        max_depth,
+        extensions,
+        progress,
+        stats,
+        cancel,
+        only_paths,
+        lister,
+        follow_symlinks,
+    )
+    write_files_markdown(out, files, sort_mode, progress, stats, cancel, section_index)
+
+
+def write_files_markdown(
+    out: BinaryIO,
+    files: List[Dict[str, Any]],
+    sort_mode: str = "name",
+    progress: Optional[ProgressTracker] = None,
+    stats: Optional[CombineStats] = None,
+    cancel: Optional[CancellationToken] = None,
+    section_index: Optional[List[Dict[str, Any]]] = None,
+) -> None:
+    """
+    Записывает в ``out`` markdown-документ по файлам из ``list_folder_files``.
+
+    Списки нескольких папок можно объединить, переименовав файлы ('name').
+    Если файл не удалось открыть из-за прав, всё записанное обрезается и
+    документ строится заново без него (счётчики прогресса и статистики
+    первой попытки при этом остаются).
+    """
+    start = out.tell()
+    while True:
+        try:
+            render_markdown_file(
+                files,
+                out,
+                _FileCopier(progress, stats),
+                sort_mode,
+                progress=progress,
+                stats=stats,
+                cancel=cancel,
+                section_index=section_index,
+            )
+            return
+        except _Unreadable as e:
+            files = [f for f in files if f["path"] != e.path]
+            out.seek(start)
+            out.truncate()
+            if section_index is not None:
+                section_index.clear()
+
+
+class _Unreadable(Exception):
+    """Файл нельзя прочитать; текстовый путь его пропускает."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.path = path
+
+
+class _FileCopier:
+    """Записывает содержимое файлов в документ через один буфер."""
+
+    def __init__(
+        self, progress: Optional[ProgressTracker], stats: Optional[CombineStats]
+    ) -> None:
+        # Растёт до размера самого большого файла, но не больше CHUNK_SIZE
+        self.buffer = bytearray()
+        self.progress = progress
+        self.stats = stats
+
+    def __call__(self, writer: Any, file_data: Dict[str, Any]) -> None:
+        needed = min(CHUNK_SIZE, file_data["size"] + 1)
+        if len(self.buffer) < needed:
+            self.buffer = bytearray(needed)
+        checkpoint = writer.checkpoint()
+        try:
+            copied = self._copy(writer, file_data["path"])
+            if copied is None:
+                writer.rollback(checkpoint)
+                file_text = read_text_file(file_data["path"], self.stats)
+        except PermissionError:
+            raise _Unreadable(file_data["path"]) from None
+        if copied is None:
+            writer.write(file_text.content)
+            size = file_text.size
+        else:
+            size = copied
+            if self.stats is not None:
+                self.stats.count("bytes_read", size)
+                self.stats.count("files_read")
+                self.stats.count("files_passed_through")
+        if self.progress is not None:
+            self.progress.file_read(size)
+
+    def _copy(self, writer: Any, path: str) -> Optional[int]:
+        """
+        Копирует файл; возвращает его размер или None, если файл не валидный
+        UTF-8 или содержит '\\r' (тогда часть уже может быть записана).
+        """
+        buffer = self.buffer
+        stats = self.stats
+        view = memoryview(buffer)
+        decoder = None
+        # Переводы строк в конце прочитанного, ещё не записанные
+        pending = 0
+        started = False
+        size = 0
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                # Буфер не копируется: все проверки ограничены первыми n байтами
+                started_at = time.perf_counter()
+                n = f.readinto(buffer)
+                checked_at = time.perf_counter()
+                if stats is not None:
+                    stats.add_time("read", checked_at - started_at)
+                if not n:
+                    break
+                size += n
+                valid = buffer.find(b"\r", 0, n) == -1
+                if valid and decoder is None and _NON_ASCII.search(buffer, 0, n):
+                    decoder = codecs.getincrementaldecoder("utf-8")()
+                if valid and decoder is not None:
+                    try:
+                        decoder.decode(view[:n])
+                    except UnicodeDecodeError:
+                        valid = False
+                if stats is not None:
+                    stats.add_time("decode", time.perf_counter() - checked_at)
+                if not valid:
+                    return None
+                leading = _LEADING_NEWLINES.match(buffer, 0, n).end()
+                if leading == n:
+                    pending += n
+                    continue
+                end = n
+                while buffer[end - 1] == 0x0A:
+                    end -= 1
+                # Переводы строк в начале файла отбрасываются, как и в
+                # текстовом пути (перед содержимым уже стоит пустая строка)
+                newlines = min(pending + leading, 2) if started else 0
+                if newlines:
+                    writer.write_bytes(b"\n" * newlines, newlines)
+                body: Any = view[leading:end]
+                if buffer.find(b"\n\n\n", leading, end) != -1:
+                    body = _NEWLINE_RUN.sub(b"\n\n", body)
+                writer.write_bytes(body, 0)
+                started = True
+                pending = n - end
+        if decoder is not None:
+            try:
+                decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                return None
+        if started and pending:
+            writer.write("\n" * min(pending, 2))
+        return size
@@ -0,0 +1,359 @@
+"""
+Конвейер предварительной обработки содержимого файлов.
+
+Каждое преобразование - этап (``Stage``), который включается опцией
+предобработки с тем же именем. Построчные этапы объявляют себя сливаемыми
+(``fusable = True``): подряд идущие сливаемые этапы выполняются за один
+проход по строкам файла, строка проходит через все их преобразования сразу.
+Остальные этапы обрабатывают текст целиком.
+
+Кроме встроенных этапов, можно регистрировать свои: вызовом
+``register_stage`` или через entry points группы ``ENTRY_POINT_GROUP``
+(имя entry point - имя опции, значение - подкласс ``Stage`` или его
+экземпляр). Entry points просматриваются только при первом запросе
+незнакомой опции, а модуль плагина импортируется, только когда его опция
+включена.
+"""
+
+import threading
+from importlib import metadata
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Union
+
+from .comments import COMMENT_MARK, clean_marked_line, mark_comments
+from .redaction import Redactor
+
+ENTRY_POINT_GROUP = "file_combiner.preprocessors"
+
+# Преобразование одной строки; None выбрасывает строку. У объекта может быть
+# метод ``finish()``, возвращающий строки, которые нужно добавить в конец.
+LineTransform = Callable[[str], Optional[str]]
+
+
+class FileContext:
+    """
+    Обрабатываемый файл; общий для всех этапов одного прохода конвейера.
+
+    Attributes:
+        filename: Имя файла (по нему этапы выбирают язык и т. п.), может быть None.
+        state: Данные, которые этап передаёт своим же следующим шагам.
+        metadata: Сведения о файле для вывода (например, 'redactions' -
+            число замен по правилам); попадают в данные файла в
+            ``combine_files_content``.
+    """
+
+    def __init__(self, filename: Optional[str] = None) -> None:
+        self.filename = filename
+        self.state: Dict[str, Any] = {}
+        self.metadata: Dict[str, Any] = {}
+
+
+class Stage:
+    """
+    Этап предварительной обработки.
+
+    Attributes:
+        name: Имя этапа.
+        option: Опция, которая включает этап (по умолчанию - ``name``).
+        order: Этапы выполняются по возрастанию ``order``.
+        fusable: Построчный этап: реализует ``line_transform`` и выполняется
+            в общем проходе по строкам с соседними построчными этапами.
+            Иначе этап реализует ``process``.
+    """
+
+    name: str = ""
+    option: Optional[str] = None
+    order: int = 100
+    fusable: bool = False
+
+    @property
+    def option_name(self) -> str:
+        return self.option or self.name
+
+    def process(self, content: str, context: FileContext) -> str:
+        """Преобразует текст файла целиком."""
+        return content
+
+    def line_transform(self, context: FileContext) -> Optional[LineTransform]:
+        """Преобразование строк файла или None, если этап к файлу не применяется."""
+        return None
+
+
+# --- Встроенные этапы ---
+
+
+class NormalizeLineEndings(Stage):
+    """Заменяет CRLF и CR на LF."""
+
+    name = "normalize_line_endings"
+    order = 0
+
+    def process(self, content: str, context: FileContext) -> str:
+        return content.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class RedactSecrets(Stage):
+    """Заменяет ключи, токены и e-mail метками (см. ``shared.redaction``)."""
+
+    name = "redact_secrets"
+    order = 5
+
+    def __init__(self, redactor: Optional[Redactor] = None) -> None:
+        self.redactor = redactor or Redactor()
+
+    def process(self, content: str, context: FileContext) -> str:
+        content, counts = self.redactor.redact(content)
+        if counts:
+            context.metadata["redactions"] = counts
+        return content
+
+
+class StripComments(Stage):
+    """Помечает комментарии в исходном коде (см. ``shared.comments``)."""
+
+    name = "strip_comments"
+    order = 10
+
+    def process(self, content: str, context: FileContext) -> str:
+        if not context.filename:
+            return content
+        marked = mark_comments(content, context.filename)
+        if marked is not content:
+            context.state[self.name] = True
+        return marked
+
+
+class _CommentMarkCleanup(Stage):
+    """Убирает метки комментариев и опустевшие после этого строки."""
+
+    name = "strip_comments_cleanup"
+    option = "strip_comments"
+    order = 20
+    fusable = True
+
+    def line_transform(self, context: FileContext) -> Optional[LineTransform]:
+        if not context.state.get(StripComments.name):
+            return None
+        return _clean_line
+
+
+def _clean_line(line: str) -> Optional[str]:
+    return clean_marked_line(line) if COMMENT_MARK in line else line
+
+
+class RemoveTrailingWhitespace(Stage):
+    """Удаляет пробельные символы в конце строк."""
+
+    name = "remove_trailing_whitespace"
+    order = 30
+    fusable = True
+
+    def line_transform(self, context: FileContext) -> Optional[LineTransform]:
+        return str.rstrip
+
+
+class RemoveExtraEmptyLines(Stage):
+    """Оставляет не больше одной пустой строки подряд и убирает их в начале."""
+
+    name = "remove_extra_empty_lines"
+    order = 40
+    fusable = True
+
+    def line_transform(self, context: FileContext) -> Optional[LineTransform]:
+        return _EmptyLineCollapser()
+
+
+class _EmptyLineCollapser:
+    def __init__(self) -> None:
+        self.emitted = False
+        self.run = 0
+
+    def __call__(self, line: str) -> Optional[str]:
+        if line:
+            self.emitted = True
+            self.run = 0
+            return line
+        if not self.emitted:
+            return None
+        self.run += 1
+        return line if self.run == 1 else None
+
+    def finish(self) -> List[str]:
+        # В конце текста остаётся до двух переводов строки подряд
+        return [""] if self.run >= 2 else []
+
+
+_BUILTIN_STAGES: List[Stage] = [
+    NormalizeLineEndings(),
+    RedactSecrets(),
+    StripComments(),
+    _CommentMarkCleanup(),
+    RemoveTrailingWhitespace(),
+    RemoveExtraEmptyLines(),
+]
+
+
+# --- Конвейер ---
+
+
+class Pipeline:
+    """Упорядоченные этапы; подряд идущие сливаемые этапы объединены в один проход."""
+
+    def __init__(self, stages: List[Stage]) -> None:
+        self.stages = sorted(stages, key=lambda stage: (stage.order, stage.name))
+        self._steps: List[Union[Stage, List[Stage]]] = []
+        for stage in self.stages:
+            if stage.fusable and self._steps and isinstance(self._steps[-1], list):
+                self._steps[-1].append(stage)
+            else:
+                self._steps.append([stage] if stage.fusable else stage)
+
+    def __bool__(self) -> bool:
+        return bool(self.stages)
+
+    @property
+    def passes(self) -> int:
+        """Сколько раз текст файла обходится целиком."""
+        return len(self._steps)
+
+    def run(
+        self,
+        content: str,
+        filename: Optional[str] = None,
+        context: Optional[FileContext] = None,
+    ) -> str:
+        """Обрабатывает один файл; ``context`` можно передать, чтобы получить ``metadata``."""
+        if context is None:
+            context = FileContext(filename)
+        for step in self._steps:
+            if isinstance(step, list):
+                content = _run_fused(step, content, context)
+            else:
+                content = step.process(content, context)
+        return content
+
+
+def _run_fused(stages: List[Stage], content: str, context: FileContext) -> str:
+    transforms = [
+        transform
+        for transform in (stage.line_transform(context) for stage in stages)
+        if transform is not None
+    ]
+    if not transforms:
+        return content
+    # Связанный метод вызывается быстрее, чем экземпляр с __call__
+    calls = [
+        transform.__call__ if hasattr(transform, "finish") else transform
+        for transform in transforms
+    ]
+    composed = _compose(calls)
+    lines = [line for line in map(composed, content.split("\n")) if line is not None]
+    for index, transform in enumerate(transforms):
+        finish = getattr(transform, "finish", None)
+        if finish is None:
+            continue
+        # Добавленные в конце строки проходят через следующие преобразования
+        rest = _compose(calls[index + 1 :])
+        lines.extend(line for line in map(rest, finish()) if line is not None)
+    return "\n".join(lines)
+
+
+def _identity(line: str) -> str:
+    return line
+
+
+def _compose(calls: List[LineTransform]) -> LineTransform:
+    """Одна функция, которая пропускает строку через все преобразования по порядку."""
+    if not calls:
+        return _identity
+    composed = calls[-1]
+    for call in reversed(calls[:-1]):
+        composed = _chain(call, composed)
+    return composed
+
+
+def _chain(first: LineTransform, then: LineTransform) -> LineTransform:
+    def chained(line: str) -> Optional[str]:
+        line = first(line)
+        return None if line is None else then(line)
+
+    return chained
+
+
+# --- Реестр этапов ---
+
+_lock = threading.Lock()
+_stages: Dict[str, List[Stage]] = {}
+_entry_points: Optional[Dict[str, metadata.EntryPoint]] = None
+_pipelines: Dict[FrozenSet[str], Pipeline] = {}
+
+for _stage in _BUILTIN_STAGES:
+    _stages.setdefault(_stage.option_name, []).append(_stage)
+
+
+def register_stage(stage: Stage) -> None:
+    """Добавляет этап; он включается опцией ``stage.option_name``."""
+    with _lock:
+        _stages.setdefault(stage.option_name, []).append(stage)
+        _pipelines.clear()
+
+
+def _discover_entry_points() -> Dict[str, metadata.EntryPoint]:
+    global _entry_points
+    if _entry_points is None:
+        found = metadata.entry_points()
+        if hasattr(found, "select"):
+            group = found.select(group=ENTRY_POINT_GROUP)
+        else:  # pragma: no cover - Python < 3.10
+            group = found.get(ENTRY_POINT_GROUP, [])
+        _entry_points = {entry_point.name: entry_point for entry_point in group}
+    return _entry_points
+
+
+def _stages_for(option: str) -> List[Stage]:
+    stages = _stages.get(option)
+    if stages is not None:
+        return stages
+    entry_point = _discover_entry_points().get(option)
+    if entry_point is None:
+        raise ValueError(f"Unknown preprocessing option: {option}")
+    loaded = entry_point.load()
+    stage = loaded() if isinstance(loaded, type) else loaded
+    if not isinstance(stage, Stage):
+        raise TypeError(f"Entry point {entry_point.value} is not a preprocessing stage")
+    return _stages.setdefault(option, [stage])
+
+
+def available_options() -> List[str]:
+    """Имена всех опций: встроенных, зарегистрированных и из entry points."""
+    with _lock:
+        return sorted(set(_stages) | set(_discover_entry_points()))
+
+
+def check_options(options: List[str]) -> None:
+    """
+    Проверяет, что опции известны, загружая нужные плагины.
+
+    Raises:
+        ValueError: Если опция неизвестна.
+    """
+    with _lock:
+        for option in options:
+            _stages_for(option)
+
+
+def build_pipeline(options: Optional[Dict[str, bool]]) -> Pipeline:
+    """
+    Конвейер из этапов включённых опций.
+
+    Raises:
+        ValueError: Если включена неизвестная опция.
+    """
+    enabled = frozenset(name for name, value in (options or {}).items() if value)
+    with _lock:
+        pipeline = _pipelines.get(enabled)
+        if pipeline is None:
+            stages: List[Stage] = []
+            for option in enabled:
+                stages.extend(_stages_for(option))
+            pipeline = _pipelines[enabled] = Pipeline(stages)
+        return pipeline
@@ -0,0 +1,128 @@
+"""
+Отслеживание прогресса объединения файлов.
+
+``ProgressTracker`` передаётся в ``scan_directory`` и ``combine_files_content``
+и накапливает счётчики по этапам (обход, чтение, рендеринг). Подписчики
+получают снимки состояния не чаще, чем раз в ``min_interval`` секунд. Если
+подписчиков нет, хуки сводятся к увеличению счётчиков.
+
+Оценка оставшегося времени появляется только на этапе рендеринга: время
+рендеринга по данным обхода не предсказать (YAML рендерится на порядки дольше
+чтения), поэтому при обходе показывается лишь доля прочитанного из ``expect``.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+ProgressListener = Callable[[Dict[str, Any]], None]
+
+
+class ProgressTracker:
+    """Счётчики прогресса одной операции объединения."""
+
+    def __init__(self, min_interval: float = 0.1) -> None:
+        self.min_interval = min_interval
+        self.stage = "scan"
+        self.directories_walked = 0
+        self.files_matched = 0
+        self.bytes_read = 0
+        self.files_rendered = 0
+        self.files_total: Optional[int] = None
+        self.files_expected: Optional[int] = None
+        self.bytes_expected: Optional[int] = None
+        self.finished = False
+        self._started = time.monotonic()
+        self._render_started: Optional[float] = None
+        self._last_emit = 0.0
+        self._listeners: List[ProgressListener] = []
+
+    # --- Подписка ---
+
+    def subscribe(self, listener: ProgressListener) -> Callable[[], None]:
+        """Добавляет подписчика и возвращает функцию для отписки."""
+        self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return unsubscribe
+
+    # --- Хуки этапов ---
+
+    def expect(self, file_count: int, total_bytes: int) -> None:
+        """Сообщает, сколько файлов и байт прочитает обход (по манифесту папки)."""
+        self.files_expected = file_count
+        self.bytes_expected = total_bytes
+        if self._listeners:
+            self._notify(force=True)
+
+    def directory_walked(self) -> None:
+        self.directories_walked += 1
+        if self._listeners:
+            self._notify()
+
+    def file_read(self, size: int) -> None:
+        self.files_matched += 1
+        self.bytes_read += size
+        if self._listeners:
+            self._notify()
+
+    def start_render(self, files_total: int) -> None:
+        self.stage = "render"
+        self.files_total = files_total
+        self._render_started = time.monotonic()
+        if self._listeners:
+            self._notify(force=True)
+
+    def file_rendered(self, count: int = 1) -> None:
+        self.files_rendered += count
+        if self._listeners:
+            self._notify()
+
+    def finish(self) -> None:
+        self.stage = "done"
+        self.finished = True
+        if self._listeners:
+            self._notify(force=True)
+
+    # --- Состояние ---
+
+    def eta_seconds(self) -> Optional[float]:
+        """
+        Оценка оставшегося времени; известна только на этапе рендеринга.
+
+        JSON и YAML отмечают файлы сразу после сериализации всего документа,
+        поэтому для них оценки нет до конца.
+        """
+        if self.finished:
+            return 0.0
+        if not self.files_total or not self.files_rendered or not self._render_started:
+            return None
+        elapsed = time.monotonic() - self._render_started
+        remaining = self.files_total - self.files_rendered
+        return elapsed / self.files_rendered * remaining
+
+    def snapshot(self) -> Dict[str, Any]:
+        eta = self.eta_seconds()
+        return {
+            "stage": self.stage,
+            "directories_walked": self.directories_walked,
+            "files_matched": self.files_matched,
+            "bytes_read": self.bytes_read,
+            "files_rendered": self.files_rendered,
+            "files_total": self.files_total,
+            "files_expected": self.files_expected,
+            "bytes_expected": self.bytes_expected,
+            "elapsed_seconds": round(time.monotonic() - self._started, 3),
+            "eta_seconds": round(eta, 3) if eta is not None else None,
+        }
+
+    def _notify(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_emit < self.min_interval:
+            return
+        self._last_emit = now
+        snapshot = self.snapshot()
+        for listener in list(self._listeners):
+            listener(snapshot)
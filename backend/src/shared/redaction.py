@@ -0,0 +1,145 @@
+"""
+Замена секретов и персональных данных в тексте на метки ``[REDACTED:<правило>]``.
+
+У каждого правила есть литералы, с которых начинается (или, как у e-mail,
+которые содержит) любое его совпадение: ``AKIA``, ``ghp_``, ``-----BEGIN``,
+``@``. Все литералы всех правил ищутся за один проход по тексту одним
+скомпилированным выражением-альтернативой, и только в найденных местах
+совпадение подтверждается полным регулярным выражением правила. Так текст
+не просматривается отдельно для каждого правила.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class RedactionRule:
+    """
+    Правило поиска секрета.
+
+    Args:
+        name: Имя правила, попадает в метку и в счётчики.
+        literals: Литералы, один из которых есть в каждом совпадении.
+        pattern: Полное выражение; проверяется с начала совпадения.
+        extends_left: Символы, которые совпадение может содержать левее
+            литерала (для e-mail - символы локальной части). Без них
+            совпадение начинается с литерала.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        literals: Iterable[str],
+        pattern: str,
+        extends_left: Optional[str] = None,
+        flags: int = 0,
+    ) -> None:
+        self.name = name
+        self.literals = tuple(literals)
+        self.pattern = re.compile(pattern, flags)
+        self.extends_left = frozenset(extends_left) if extends_left else None
+
+    def confirm(self, text: str, hit: int, lower: int) -> Optional["re.Match[str]"]:
+        """Совпадение правила, содержащее литерал на позиции ``hit``, не левее ``lower``."""
+        start = hit
+        if self.extends_left is not None:
+            while start > lower and text[start - 1] in self.extends_left:
+                start -= 1
+        match = self.pattern.match(text, start)
+        if match is None or match.end() <= hit:
+            return None
+        return match
+
+
+_EMAIL_LOCAL = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-"
+
+DEFAULT_RULES: Tuple[RedactionRule, ...] = (
+    RedactionRule(
+        "aws_access_key", ("AKIA", "ASIA"), r"A(?:KI|SI)A[0-9A-Z]{16}(?![0-9A-Za-z])"
+    ),
+    RedactionRule(
+        "github_token",
+        ("ghp_", "gho_", "ghu_", "ghs_", "ghr_", "github_pat_"),
+        r"gh[pousr]_[A-Za-z0-9]{36,}|github_pat_[A-Za-z0-9_]{22,}",
+    ),
+    RedactionRule("gitlab_token", ("glpat-",), r"glpat-[A-Za-z0-9_-]{20,}"),
+    RedactionRule(
+        "slack_token",
+        ("xoxa-", "xoxb-", "xoxp-", "xoxr-", "xoxs-"),
+        r"xox[abprs]-[A-Za-z0-9-]{10,}",
+    ),
+    RedactionRule(
+        "stripe_key",
+        ("sk_live_", "rk_live_", "sk_test_", "rk_test_"),
+        r"[rs]k_(?:live|test)_[0-9A-Za-z]{16,}",
+    ),
+    RedactionRule("google_api_key", ("AIza",), r"AIza[0-9A-Za-z_-]{35}"),
+    RedactionRule(
+        "jwt",
+        ("eyJ",),
+        r"eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}",
+    ),
+    # Ключ без строки END закрывается концом текста
+    RedactionRule(
+        "private_key",
+        ("-----BEGIN",),
+        r"-----BEGIN[A-Z ]*PRIVATE KEY-----(?:.*?-----END[A-Z ]*PRIVATE KEY-----|.*)",
+        flags=re.DOTALL,
+    ),
+    RedactionRule(
+        "email",
+        ("@",),
+        r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}",
+        extends_left=_EMAIL_LOCAL,
+    ),
+)
+
+
+def redaction_marker(rule_name: str) -> str:
+    return f"[REDACTED:{rule_name}]"
+
+
+class Redactor:
+    """Заменяет совпадения набора правил за один проход поиска литералов."""
+
+    def __init__(self, rules: Iterable[RedactionRule] = DEFAULT_RULES) -> None:
+        self.rules = tuple(rules)
+        self._rules_by_literal: Dict[str, List[RedactionRule]] = {}
+        for rule in self.rules:
+            for literal in rule.literals:
+                self._rules_by_literal.setdefault(literal, []).append(rule)
+        # Более длинные литералы раньше, чтобы 'github_pat_' не терялся за
+        # более коротким литералом с тем же началом
+        literals = sorted(self._rules_by_literal, key=len, reverse=True)
+        self._scanner = re.compile("|".join(map(re.escape, literals)))
+
+    def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Возвращает текст с замененными совпадениями и их число по правилам.
+
+        Если ничего не найдено, возвращается тот же объект строки.
+        """
+        parts: List[str] = []
+        counts: Dict[str, int] = {}
+        # Текст до ``copied`` уже перенесён в ``parts``
+        copied = 0
+        search = self._scanner.search
+        hit = search(text)
+        while hit is not None:
+            position = hit.start()
+            for rule in self._rules_by_literal[hit.group()]:
+                match = rule.confirm(text, position, copied)
+                if match is not None:
+                    break
+            else:
+                hit = search(text, position + 1)
+                continue
+            parts.append(text[copied : match.start()])
+            parts.append(redaction_marker(rule.name))
+            counts[rule.name] = counts.get(rule.name, 0) + 1
+            copied = match.end()
+            hit = search(text, copied)
+        if not counts:
+            return text, counts
+        parts.append(text[copied:])
+        return "".join(parts), counts
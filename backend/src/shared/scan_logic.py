@@ -0,0 +1,644 @@
+"""
+Логика обхода папок и чтения файлов для объединения.
+
+Модуль используется эндпоинтами бэкенда и пакетной обработкой. Кэш ``ScanCache``
+позволяет нескольким сканированиям (например, в одном пакетном запросе) повторно
+использовать уже полученные листинги директорий и прочитанные файлы.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .cancellation import CancellationToken, check_cancelled
+from .progress import ProgressTracker
+from .stats import CombineStats
+
+if TYPE_CHECKING:
+    from .content_filter import ContentFilter
+    from .excerpt import Excerpt
+
+
+class DirEntryInfo(NamedTuple):
+    """Снимок элемента директории, достаточный для обхода дерева."""
+
+    name: str
+    path: str
+    is_file: bool
+    is_dir: bool
+    # Элемент - символическая ссылка; is_file и is_dir описывают её цель
+    is_symlink: bool = False
+    # (st_dev, st_ino) элемента или цели ссылки; None, если неизвестно
+    file_id: Optional[Tuple[int, int]] = None
+
+
+def list_directory(path: str) -> List[DirEntryInfo]:
+    """Возвращает содержимое директории в виде списка ``DirEntryInfo``."""
+    device = os.stat(path).st_dev
+    with os.scandir(path) as entries:
+        return [_entry_info(entry, device) for entry in entries]
+
+
+def _entry_info(entry: os.DirEntry, device: int) -> DirEntryInfo:
+    is_file = entry.is_file()
+    is_dir = entry.is_dir()
+    is_symlink = entry.is_symlink()
+    file_id = None
+    try:
+        if is_symlink or is_dir:
+            # Цель ссылки и точка монтирования могут быть на другом устройстве
+            stat = entry.stat()
+            file_id = (stat.st_dev, stat.st_ino)
+        elif is_file:
+            file_id = (device, entry.inode())
+    except OSError:
+        pass
+    return DirEntryInfo(entry.name, entry.path, is_file, is_dir, is_symlink, file_id)
+
+
+class FileText(NamedTuple):
+    """Прочитанный файл: текст, время изменения и размер на диске."""
+
+    content: str
+    mtime: float
+    size: int
+    # Текст - только часть файла (см. ``shared.excerpt``)
+    truncated: bool = False
+
+
+def decode_text(data: bytes) -> str:
+    """Декодирует UTF-8 (с заменой ошибок) и приводит окончания строк к '\\n'."""
+    try:
+        content = data.decode("utf-8")
+    except UnicodeDecodeError:
+        content = data.decode("utf-8", errors="replace")
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+
+def read_text_file(path: str, stats: Optional[CombineStats] = None) -> FileText:
+    """
+    Читает файл как UTF-8 текст.
+
+    Невалидные последовательности заменяются символом замены, а окончания строк
+    приводятся к '\\n', как при чтении в текстовом режиме (так файлы читались
+    раньше в эндпоинте ``/combine-folder/``). Чтение и декодирование разделены,
+    чтобы их длительности учитывались в ``stats`` как отдельные этапы.
+    """
+    if stats is not None:
+        start = time.perf_counter()
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        data = f.read()
+    if stats is not None:
+        decode_start = time.perf_counter()
+        stats.add_time("read", decode_start - start)
+
+    content = decode_text(data)
+
+    if stats is not None:
+        stats.add_time("decode", time.perf_counter() - decode_start)
+        stats.count("bytes_read", stat.st_size)
+        stats.count("files_read")
+    return FileText(content, stat.st_mtime, stat.st_size)
+
+
+class ScanCache:
+    """
+    Потокобезопасный кэш листингов директорий и содержимого файлов.
+
+    Используется, когда несколько сканирований выполняются над пересекающимися
+    деревьями: каждая директория читается и каждый файл открывается один раз.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._listings: Dict[str, List[DirEntryInfo]] = {}
+        self._files: Dict[str, FileText] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def list_directory(self, path: str) -> List[DirEntryInfo]:
+        """
+        Листинг по реальному пути директории; пути элементов строятся от
+        ``path`` вызывающего кода, даже если директорию первым прочитал
+        обход, пришедший к ней через символическую ссылку.
+        """
+        key = os.path.realpath(path)
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is None:
+            listing = list_directory(path)
+            with self._lock:
+                cached = self._listings.setdefault(key, listing)
+        return [entry._replace(path=os.path.join(path, entry.name)) for entry in cached]
+
+    def read_text_file(self, path: str, stats: Optional[CombineStats] = None) -> FileText:
+        key = os.path.realpath(path)
+        with self._lock:
+            cached = self._files.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+        result = read_text_file(path, stats)
+        with self._lock:
+            return self._files.setdefault(key, result)
+
+
+def matches_extensions(name: str, extensions: Optional[List[str]]) -> bool:
+    """Проверяет, подходит ли имя файла под фильтр расширений."""
+    if not extensions:
+        return True
+    lowered = name.lower()
+    return any(lowered.endswith(ext) for ext in extensions)
+
+
+def walk_files(
+    folder_path: str,
+    max_depth: int = 0,
+    extensions: Optional[List[str]] = None,
+    follow_symlinks: bool = True,
+) -> Iterator[Tuple[DirEntryInfo, os.stat_result]]:
+    """
+    Перечисляет файлы, которые прочитает ``scan_directory``, вместе с их ``stat``.
+
+    Обход тот же, что у ``scan_directory`` (``_walk``): директории и файлы,
+    доступные по нескольким путям, выдаются под тем же путём, поэтому манифест
+    описывает ровно прочитанные файлы. Читаются только метаданные; недоступные
+    директории и файлы пропускаются.
+    """
+    for entry, _, _ in _walk(
+        folder_path,
+        max_depth,
+        extensions,
+        list_directory,
+        None,
+        None,
+        None,
+        None,
+        follow_symlinks,
+    ):
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            continue
+        yield entry, stat
+
+
+def _root_ids(folder_path: str) -> Set[Tuple[int, int]]:
+    """Множество посещённых (st_dev, st_ino) с корнем обхода."""
+    try:
+        stat = os.stat(folder_path)
+    except OSError:
+        return set()
+    return {(stat.st_dev, stat.st_ino)}
+
+
+def _first_visit(seen: Set[Tuple[int, int]], file_id: Optional[Tuple[int, int]]) -> bool:
+    """
+    Отмечает элемент посещённым; False, если он уже встречался.
+
+    Повторно встречаются жёсткие ссылки на один файл, директории и файлы,
+    доступные через несколько символических ссылок, и циклы из ссылок.
+    Элементы без ``file_id`` не отслеживаются.
+    """
+    if file_id is None:
+        return True
+    if file_id in seen:
+        return False
+    seen.add(file_id)
+    return True
+
+
+class DirectoryManifest(NamedTuple):
+    """Сводка по файлам, которые прочитает ``scan_directory``."""
+
+    file_count: int
+    total_bytes: int
+    # Хэш от относительных путей, размеров и времени изменения файлов
+    fingerprint: str
+
+
+def directory_manifest(
+    folder_path: str,
+    max_depth: int = 0,
+    extensions: Optional[List[str]] = None,
+    follow_symlinks: bool = True,
+) -> DirectoryManifest:
+    """
+    Строит манифест файлов, которые прочитает ``scan_directory``.
+
+    Обходит дерево с теми же ограничениями глубины и фильтром расширений, но
+    читает только метаданные. Отпечаток совпадает у двух манифестов, только
+    если набор файлов, их размеры и время изменения одинаковы, поэтому его
+    можно использовать для распознавания повторных запросов к неизменной папке.
+
+    Args:
+        folder_path: Путь к папке.
+        max_depth: Максимальная глубина (0 - без ограничения).
+        extensions: Список расширений для фильтрации.
+        follow_symlinks: Учитывать ли символические ссылки.
+
+    Returns:
+        DirectoryManifest: Количество и суммарный размер файлов и их отпечаток.
+    """
+    return manifest_from_records(
+        (os.path.relpath(entry.path, folder_path), stat.st_size, stat.st_mtime_ns)
+        for entry, stat in walk_files(folder_path, max_depth, extensions, follow_symlinks)
+    )
+
+
+def manifest_from_records(files: Iterable[Tuple[str, int, int]]) -> DirectoryManifest:
+    """
+    Строит манифест по тройкам (относительный путь, размер, время изменения в
+    наносекундах); порядок троек не важен.
+    """
+    records = []
+    total = 0
+    for relative_path, size, mtime_ns in files:
+        total += size
+        records.append(f"{relative_path}\0{size}\0{mtime_ns}")
+
+    digest = hashlib.sha1()
+    for record in sorted(records):
+        digest.update(record.encode("utf-8", "surrogateescape"))
+        digest.update(b"\n")
+    return DirectoryManifest(len(records), total, digest.hexdigest())
+
+
+def estimate_directory_size(
+    folder_path: str,
+    max_depth: int = 0,
+    extensions: Optional[List[str]] = None,
+) -> int:
+    """
+    Оценивает суммарный размер файлов, которые прочитает ``scan_directory``.
+
+    Читает только метаданные (см. ``directory_manifest``), поэтому подходит
+    для предварительной оценки нагрузки перед объединением.
+
+    Returns:
+        int: Сумма размеров подходящих файлов в байтах.
+    """
+    return directory_manifest(folder_path, max_depth, extensions).total_bytes
+
+
+def scan_directory(
+    folder_path: str,
+    max_depth: int = 0,
+    extensions: Optional[List[str]] = None,
+    cache: Optional[ScanCache] = None,
+    progress: Optional[ProgressTracker] = None,
+    stats: Optional[CombineStats] = None,
+    cancel: Optional[CancellationToken] = None,
+    only_paths: Optional[AbstractSet[str]] = None,
+    content_filter: Optional["ContentFilter"] = None,
+    excerpt: Optional["Excerpt"] = None,
+    workers: int = 1,
+    lister: Optional[Callable[[str], List[DirEntryInfo]]] = None,
+    follow_symlinks: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Рекурсивно обходит папку и читает подходящие файлы.
+
+    Каждая директория и каждый файл читаются один раз, даже если к ним ведут
+    несколько путей: циклы из символических ссылок не зацикливают обход, а из
+    жёстких ссылок на один файл читается первая по порядку обхода.
+
+    Args:
+        folder_path: Корневая папка.
+        max_depth: Максимальная глубина обхода (0 - без ограничений).
+        extensions: Список расширений для фильтрации (например, ['.txt', '.md']).
+        cache: Необязательный общий кэш листингов и содержимого файлов.
+        progress: Необязательный трекер прогресса для обхода и чтения.
+        stats: Необязательный сборщик длительностей этапов 'scan', 'read', 'decode'.
+        cancel: Необязательный токен отмены; проверяется перед каждой директорией
+            и каждым файлом.
+        only_paths: Необязательное множество абсолютных путей; остальные файлы
+            пропускаются без чтения (например, результаты поиска по индексу).
+        content_filter: Необязательный отбор файлов по содержимому; без кэша
+            файлы проверяются по сырым байтам прямо во время чтения.
+        excerpt: Необязательная выборка части каждого файла (первые или
+            последние строки, первые байты); у обрезанных файлов в словаре
+            есть ключ 'truncated'.
+        workers: Сколько файлов читать одновременно. При значении больше 1
+            дерево сначала обходится целиком, затем файлы читаются пулом
+            потоков; порядок результата тот же.
+        lister: Необязательная функция листинга директорий вместо чтения с
+            диска (например, ``FolderIndex.list_directory``); важнее ``cache``.
+        follow_symlinks: Заходить ли в директории и читать ли файлы, на которые
+            указывают символические ссылки; без этого ссылки пропускаются.
+
+    Returns:
+        List[Dict[str, Any]]: Список словарей в формате, который ожидает
+        ``combine_files_content`` (с ключом 'relative_path').
+
+    Raises:
+        OperationCancelled: Если через ``cancel`` запрошена отмена.
+    """
+    file_data_list: List[Dict[str, Any]] = []
+    if lister is None:
+        lister = cache.list_directory if cache is not None else list_directory
+    reader = cache.read_text_file if cache is not None else read_text_file
+    if content_filter is not None:
+        if cache is None:
+            reader = content_filter.read
+        else:
+            reader = _filtered_reader(reader, content_filter)
+    if excerpt is not None and excerpt.active:
+        if reader is read_text_file:
+            reader = excerpt.read
+        else:
+            reader = _excerpt_reader(reader, excerpt)
+
+    walk = _walk(
+        folder_path,
+        max_depth,
+        extensions,
+        lister,
+        progress,
+        stats,
+        cancel,
+        only_paths,
+        follow_symlinks,
+    )
+    if workers > 1:
+        reads = _read_parallel(walk, reader, workers, stats, cancel)
+    else:
+        reads = _read_serial(walk, reader, stats, cancel)
+    for entry, relative_path, depth, file_text in reads:
+        if file_text is None:
+            # Не прошёл отбор по содержимому
+            continue
+        if progress is not None:
+            progress.file_read(file_text.size)
+        file_data = {
+            "name": relative_path if depth > 0 else entry.name,
+            "content": file_text.content,
+            "last_modified": datetime.fromtimestamp(file_text.mtime),
+            "relative_path": relative_path,
+        }
+        if file_text.truncated:
+            file_data["truncated"] = True
+        file_data_list.append(file_data)
+    return file_data_list
+
+
+_Found = Tuple[DirEntryInfo, str, int]
+
+
+def _read_serial(
+    walk: Iterator[_Found],
+    reader: Callable[..., Optional[FileText]],
+    stats: Optional[CombineStats],
+    cancel: Optional[CancellationToken],
+) -> Iterator[Tuple[DirEntryInfo, str, int, Optional[FileText]]]:
+    for entry, relative_path, depth in walk:
+        yield entry, relative_path, depth, _read_entry(reader, entry.path, stats, cancel)
+
+
+def _read_parallel(
+    walk: Iterator[_Found],
+    reader: Callable[..., Optional[FileText]],
+    workers: int,
+    stats: Optional[CombineStats],
+    cancel: Optional[CancellationToken],
+) -> Iterator[Tuple[DirEntryInfo, str, int, Optional[FileText]]]:
+    found = list(walk)
+
+    def read(path: str) -> Tuple[Optional[FileText], Optional[CombineStats]]:
+        # У каждого чтения свой сборщик: CombineStats не потокобезопасен
+        file_stats = CombineStats() if stats is not None else None
+        return _read_entry(reader, path, file_stats, cancel), file_stats
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(read, [entry.path for entry, _, _ in found])
+        for (entry, relative_path, depth), (file_text, file_stats) in zip(found, results):
+            if file_stats is not None:
+                stats.merge(file_stats)
+            yield entry, relative_path, depth, file_text
+
+
+def _read_entry(
+    reader: Callable[..., Optional[FileText]],
+    path: str,
+    stats: Optional[CombineStats],
+    cancel: Optional[CancellationToken],
+) -> Optional[FileText]:
+    check_cancelled(cancel, "read")
+    try:
+        return reader(path, stats)
+    except PermissionError:
+        return None
+
+
+def list_folder_files(
+    folder_path: str,
+    max_depth: int = 0,
+    extensions: Optional[List[str]] = None,
+    progress: Optional[ProgressTracker] = None,
+    stats: Optional[CombineStats] = None,
+    cancel: Optional[CancellationToken] = None,
+    only_paths: Optional[AbstractSet[str]] = None,
+    lister: Optional[Callable[[str], List[DirEntryInfo]]] = None,
+    follow_symlinks: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Перечисляет файлы, которые прочитал бы ``scan_directory``, не читая их.
+
+    Словари те же, что у ``scan_directory``, но вместо 'content' в них
+    'path' (путь к файлу) и 'size'; время изменения берётся из ``stat``.
+    Файлы, которые нельзя прочитать, пропускаются, как и при чтении.
+    ``lister`` и ``follow_symlinks`` значат то же, что у ``scan_directory``.
+    """
+    if lister is None:
+        lister = list_directory
+    file_data_list: List[Dict[str, Any]] = []
+    for entry, relative_path, depth in _walk(
+        folder_path,
+        max_depth,
+        extensions,
+        lister,
+        progress,
+        stats,
+        cancel,
+        only_paths,
+        follow_symlinks,
+    ):
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            continue
+        if not os.access(entry.path, os.R_OK):
+            continue
+        file_data_list.append(
+            {
+                "name": relative_path if depth > 0 else entry.name,
+                "path": entry.path,
+                "size": stat.st_size,
+                "last_modified": datetime.fromtimestamp(stat.st_mtime),
+                "relative_path": relative_path,
+            }
+        )
+    return file_data_list
+
+
+def _walk(
+    current_path: str,
+    max_depth: int,
+    extensions: Optional[List[str]],
+    lister: Callable[[str], List[DirEntryInfo]],
+    progress: Optional[ProgressTracker],
+    stats: Optional[CombineStats],
+    cancel: Optional[CancellationToken],
+    only_paths: Optional[AbstractSet[str]],
+    follow_symlinks: bool = True,
+    seen: Optional[Set[Tuple[int, int]]] = None,
+    directory_id: Optional[Tuple[int, int]] = None,
+    folder_path: Optional[str] = None,
+    current_depth: int = 0,
+) -> Iterator[Tuple[DirEntryInfo, str, int]]:
+    """
+    Обходит дерево в порядке листингов и выдаёт подходящие файлы.
+
+    Выдаёт (элемент, путь относительно корня, глубина). Генератор ленивый:
+    вложенная директория листится только после того, как вызывающий код
+    обработал файлы перед ней. В ``seen`` собираются (st_dev, st_ino) уже
+    пройденных директорий и выданных файлов (см. ``_first_visit``);
+    директория ``directory_id`` отмечается, только если её удалось прочитать.
+    """
+    # Останавливаем рекурсию, если достигнута максимальная глубина
+    if max_depth > 0 and current_depth > max_depth:
+        return
+    if folder_path is None:
+        folder_path = current_path
+    if seen is None:
+        seen = _root_ids(current_path)
+    check_cancelled(cancel, "scan")
+
+    if stats is not None:
+        start = time.perf_counter()
+    try:
+        entries = lister(current_path)
+    except PermissionError:
+        # Пропускаем директории без доступа
+        return
+    finally:
+        if stats is not None:
+            stats.add_time("scan", time.perf_counter() - start)
+    if progress is not None:
+        progress.directory_walked()
+    if directory_id is not None:
+        seen.add(directory_id)
+
+    for entry in entries:
+        if entry.is_symlink and not follow_symlinks:
+            continue
+        relative_path = os.path.relpath(entry.path, folder_path)
+        if entry.is_file:
+            if not matches_extensions(entry.name, extensions):
+                continue
+            if only_paths is not None and os.path.abspath(entry.path) not in only_paths:
+                continue
+            if not _first_visit(seen, entry.file_id):
+                continue
+            yield entry, relative_path, current_depth
+        elif entry.is_dir:
+            if entry.file_id in seen:
+                continue
+            yield from _walk(
+                entry.path,
+                max_depth,
+                extensions,
+                lister,
+                progress,
+                stats,
+                cancel,
+                only_paths,
+                follow_symlinks,
+                seen,
+                entry.file_id,
+                folder_path,
+                current_depth + 1,
+            )
+
+
+def _filtered_reader(
+    reader: Callable[..., FileText], content_filter: "ContentFilter"
+) -> Callable[..., Optional[FileText]]:
+    def read(path: str, stats: Optional[CombineStats] = None) -> Optional[FileText]:
+        file_text = reader(path, stats)
+        return file_text if content_filter.matches_text(file_text.content) else None
+
+    return read
+
+
+def _excerpt_reader(
+    reader: Callable[..., Optional[FileText]], excerpt: "Excerpt"
+) -> Callable[..., Optional[FileText]]:
+    def read(path: str, stats: Optional[CombineStats] = None) -> Optional[FileText]:
+        file_text = reader(path, stats)
+        return excerpt.apply(file_text) if file_text is not None else None
+
+    return read
+
+
+def read_file_group(
+    file_paths: List[str],
+    cache: Optional[ScanCache] = None,
+    stats: Optional[CombineStats] = None,
+    cancel: Optional[CancellationToken] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Читает явно заданную группу файлов.
+
+    Имена файлов строятся относительно общего родительского каталога группы,
+    чтобы файлы с одинаковыми именами из разных папок не сливались.
+    """
+    if not file_paths:
+        return []
+    reader = cache.read_text_file if cache is not None else read_text_file
+    if len(file_paths) > 1:
+        base = os.path.commonpath([os.path.abspath(p) for p in file_paths])
+    else:
+        base = os.path.dirname(os.path.abspath(file_paths[0]))
+    if os.path.isfile(base):
+        base = os.path.dirname(base)
+
+    file_data_list: List[Dict[str, Any]] = []
+    for path in file_paths:
+        check_cancelled(cancel, "read")
+        file_text = reader(path, stats)
+        relative_path = os.path.relpath(os.path.abspath(path), base)
+        file_data_list.append(
+            {
+                "name": relative_path,
+                "content": file_text.content,
+                "last_modified": datetime.fromtimestamp(file_text.mtime),
+                "relative_path": relative_path,
+            }
+        )
+    return file_data_list
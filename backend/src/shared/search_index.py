@@ -0,0 +1,403 @@
+"""
+Триграммный индекс для поиска по содержимому файлов.
+
+Для каждого файла хранится множество триграмм его текста в нижнем регистре, а
+для каждой триграммы — множество файлов, где она встречается. Запрос сначала
+сужается до файлов, содержащих все триграммы искомой строки (или обязательных
+литералов регулярного выражения), и только эти файлы читаются и проверяются
+построчно. Индекс обновляется инкрементально: файл переиндексируется, только
+если изменились его время изменения или размер.
+
+Размер индекса ограничивается числом файлов: файлы учитываются по корням (папкам,
+переданным в ``update``), и при превышении предела целиком вытесняются давно не
+использованные корни. Корень, который сам не помещается в предел, не
+индексируется; поиск в нём читает все файлы области обхода.
+"""
+
+import os
+import re
+import sys
+import threading
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .cancellation import CancellationToken, check_cancelled
+from .scan_logic import DirEntryInfo, matches_extensions, read_text_file, walk_files
+
+try:  # Python 3.11+
+    import re._parser as _sre_parse
+    from re._constants import LITERAL as _LITERAL
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse as _sre_parse
+    from sre_constants import LITERAL as _LITERAL
+
+SNIPPET_LENGTH = 200
+
+
+class _IndexedFile(NamedTuple):
+    mtime_ns: int
+    size: int
+    trigrams: FrozenSet[str]
+
+
+class LineMatch(NamedTuple):
+    line: int
+    text: str
+
+
+class FileMatches(NamedTuple):
+    path: str
+    relative_path: str
+    matches: List[LineMatch]
+
+
+class IndexUpdate(NamedTuple):
+    """Итог обновления индекса для одной папки."""
+
+    indexed: int
+    updated: int
+    removed: int
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Множество триграмм строки в нижнем регистре."""
+    text = text.lower()
+    return frozenset(text[i : i + 3] for i in range(len(text) - 2))
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """
+    Литералы, которые обязательно входят в любое совпадение регулярного выражения.
+
+    Рассматривается только верхний уровень выражения: подряд идущие символы
+    собираются в строки, любой другой элемент (класс, группа, повтор,
+    альтернатива) разрывает строку. Результат пригоден только для
+    предварительного отбора: пустой список означает «проверять все файлы».
+    """
+    runs: List[str] = []
+    current: List[str] = []
+    for op, value in _sre_parse.parse(pattern, flags):
+        if op is _LITERAL:
+            current.append(chr(value))
+            continue
+        if current:
+            runs.append("".join(current))
+            current = []
+    if current:
+        runs.append("".join(current))
+    return [run for run in runs if len(run) >= 3]
+
+
+def _file_depth(relative_path: str) -> int:
+    return relative_path.count(os.sep)
+
+
+class SearchIndex:
+    """
+    Потокобезопасный триграммный индекс файлов с поиском по подстроке и regex.
+
+    Args:
+        max_files: Сколько файлов хранить в индексе не больше (0 - без
+            ограничения); лишние файлы вытесняются по корням в порядке LRU.
+    """
+
+    def __init__(self, max_files: int = 0) -> None:
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._files: Dict[str, _IndexedFile] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        # Корень -> файлы, внесённые его обновлениями; от давно использованных к свежим
+        self._roots: OrderedDict[str, Set[str]] = OrderedDict()
+        # Корни, которые сейчас обновляются; их файлы не вытесняются
+        self._updating: Counter = Counter()
+        # Корни, не поместившиеся в max_files
+        self._unindexed: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def update(
+        self,
+        folder_path: str,
+        max_depth: int = 0,
+        extensions: Optional[List[str]] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> IndexUpdate:
+        """
+        Приводит индекс в соответствие с папкой.
+
+        Читаются только новые файлы и файлы с изменившимися временем изменения
+        или размером; файлы из той же области обхода, которых больше нет,
+        удаляются из индекса. Если файлов в области обхода больше ``max_files``,
+        корень убирается из индекса и ``indexed`` равно 0.
+        """
+        root = os.path.abspath(folder_path)
+        with self._lock:
+            owned = self._roots.pop(root, set())
+            self._roots[root] = owned
+            self._updating[root] += 1
+        try:
+            return self._update(root, owned, max_depth, extensions, cancel)
+        finally:
+            with self._lock:
+                self._updating[root] -= 1
+                if not self._updating[root]:
+                    del self._updating[root]
+
+    def _update(
+        self,
+        root: str,
+        owned: Set[str],
+        max_depth: int,
+        extensions: Optional[List[str]],
+        cancel: Optional[CancellationToken],
+    ) -> IndexUpdate:
+        walk: Iterable[Tuple[DirEntryInfo, os.stat_result]] = walk_files(
+            root, max_depth, extensions
+        )
+        if self.max_files:
+            # Метаданные читаются до содержимого, чтобы не индексировать зря
+            walk = list(islice(walk, self.max_files + 1))
+            if len(walk) > self.max_files:
+                with self._lock:
+                    self._unindexed.add(root)
+                    removed = self._evict(root)
+                return IndexUpdate(0, 0, removed)
+        seen: Set[str] = set()
+        updated = 0
+        for entry, stat in walk:
+            path = entry.path
+            seen.add(path)
+            with self._lock:
+                owned.add(path)
+                known = self._files.get(path)
+            if known is not None and (known.mtime_ns, known.size) == (
+                stat.st_mtime_ns,
+                stat.st_size,
+            ):
+                continue
+            check_cancelled(cancel, "index")
+            try:
+                content = read_text_file(path).content
+            except OSError:
+                continue
+            self._store(
+                path, _IndexedFile(stat.st_mtime_ns, stat.st_size, trigrams(content))
+            )
+            updated += 1
+            with self._lock:
+                self._shrink()
+
+        stale = [
+            path
+            for path in self._paths_in_scope(root, max_depth, extensions)
+            if path not in seen
+        ]
+        for path in stale:
+            self._store(path, None)
+        with self._lock:
+            owned.difference_update(stale)
+            self._unindexed.discard(root)
+        return IndexUpdate(len(seen), updated, len(stale))
+
+    def _store(self, path: str, indexed: Optional[_IndexedFile]) -> None:
+        with self._lock:
+            self._discard(path)
+            if indexed is not None:
+                self._files[path] = indexed
+                for gram in indexed.trigrams:
+                    self._postings.setdefault(gram, set()).add(path)
+
+    def _discard(self, path: str) -> bool:
+        """Убирает файл из индекса; вызывается под ``_lock``."""
+        old = self._files.pop(path, None)
+        if old is None:
+            return False
+        for gram in old.trigrams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(path)
+                if not posting:
+                    del self._postings[gram]
+        return True
+
+    def _shrink(self) -> None:
+        """Вытесняет давно использованные корни, пока индекс больше ``max_files``."""
+        if not self.max_files:
+            return
+        for root in list(self._roots):
+            if len(self._files) <= self.max_files:
+                break
+            if root not in self._updating:
+                self._evict(root)
+
+    def _evict(self, root: str) -> int:
+        """
+        Убирает корень и его файлы, не принадлежащие другим корням.
+
+        Вызывается под ``_lock``; возвращает число убранных файлов.
+        """
+        owned = self._roots.pop(root, set())
+        others = list(self._roots.values())
+        removed = 0
+        for path in owned:
+            if not any(path in paths for paths in others) and self._discard(path):
+                removed += 1
+        return removed
+
+    def _paths_in_scope(
+        self, root: str, max_depth: int, extensions: Optional[List[str]]
+    ) -> List[str]:
+        prefix = os.path.join(root, "")
+        with self._lock:
+            paths = [path for path in self._files if path.startswith(prefix)]
+        return [
+            path
+            for path in paths
+            if matches_extensions(os.path.basename(path), extensions)
+            and (max_depth <= 0 or _file_depth(path[len(prefix) :]) <= max_depth)
+        ]
+
+    def candidates(
+        self,
+        folder_path: str,
+        literals: List[str],
+        max_depth: int = 0,
+        extensions: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Файлы папки, содержащие все триграммы всех ``literals``, по порядку путей.
+
+        Для корня, не поместившегося в индекс, кандидаты - все файлы области обхода.
+        """
+        root = os.path.abspath(folder_path)
+        with self._lock:
+            unindexed = root in self._unindexed
+            if root in self._roots:
+                self._roots.move_to_end(root)
+        if unindexed:
+            return sorted(
+                entry.path for entry, _ in walk_files(root, max_depth, extensions)
+            )
+        grams: Set[str] = set()
+        for literal in literals:
+            grams |= trigrams(literal)
+        in_scope = self._paths_in_scope(root, max_depth, extensions)
+        if not grams:
+            return sorted(in_scope)
+        with self._lock:
+            # Начинаем с самого редкого списка, чтобы пересечения были короткими
+            postings = sorted(
+                (self._postings.get(gram, set()) for gram in grams), key=len
+            )
+            matching = set(postings[0])
+            for posting in postings[1:]:
+                matching &= posting
+                if not matching:
+                    break
+        return sorted(path for path in in_scope if path in matching)
+
+    def search(
+        self,
+        folder_path: str,
+        query: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        max_depth: int = 0,
+        extensions: Optional[List[str]] = None,
+        max_files: int = 100,
+        max_matches_per_file: int = 5,
+        cancel: Optional[CancellationToken] = None,
+    ) -> Tuple[List[FileMatches], int]:
+        """
+        Ищет ``query`` в файлах папки, уже внесённых в индекс (см. ``update``).
+
+        Args:
+            folder_path: Папка поиска.
+            query: Подстрока или регулярное выражение.
+            regex: Считать ``query`` регулярным выражением.
+            ignore_case: Искать без учёта регистра.
+            max_depth: Максимальная глубина (0 - без ограничения).
+            extensions: Список расширений для фильтрации.
+            max_files: Сколько файлов с совпадениями вернуть не больше.
+            max_matches_per_file: Сколько строк-фрагментов вернуть на файл.
+            cancel: Необязательный токен отмены; проверяется перед каждым файлом.
+
+        Returns:
+            Файлы с совпадениями (номер строки и её текст, обрезанный до
+            ``SNIPPET_LENGTH`` символов) и число кандидатов после отбора по
+            триграммам.
+
+        Raises:
+            re.error: Если ``query`` - некорректное регулярное выражение.
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        if regex:
+            pattern = re.compile(query, flags | re.MULTILINE)
+            literals = required_literals(query, flags)
+        else:
+            pattern = re.compile(re.escape(query), flags | re.MULTILINE)
+            literals = [query]
+        root = os.path.abspath(folder_path)
+        paths = self.candidates(root, literals, max_depth, extensions)
+
+        results: List[FileMatches] = []
+        for path in paths:
+            if len(results) >= max_files:
+                break
+            check_cancelled(cancel, "search")
+            try:
+                content = read_text_file(path).content
+            except OSError:
+                continue
+            matches = _line_matches(pattern, content, max_matches_per_file)
+            if matches:
+                results.append(FileMatches(path, os.path.relpath(path, root), matches))
+        return results, len(paths)
+
+    def matching_paths(
+        self,
+        folder_path: str,
+        query: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        max_depth: int = 0,
+        extensions: Optional[List[str]] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> Set[str]:
+        """Абсолютные пути всех файлов папки, в которых есть совпадение с ``query``."""
+        results, _ = self.search(
+            folder_path,
+            query,
+            regex,
+            ignore_case,
+            max_depth,
+            extensions,
+            max_files=sys.maxsize,
+            max_matches_per_file=1,
+            cancel=cancel,
+        )
+        return {result.path for result in results}
+
+
+def _line_matches(
+    pattern: "re.Pattern[str]", content: str, limit: int
+) -> List[LineMatch]:
+    matches: List[LineMatch] = []
+    line_number = 1
+    position = 0
+    last_line_start = -1
+    for match in pattern.finditer(content):
+        line_start = content.rfind("\n", 0, match.start()) + 1
+        if line_start == last_line_start:
+            continue
+        line_number += content.count("\n", position, line_start)
+        position = line_start
+        last_line_start = line_start
+        line_end = content.find("\n", match.start())
+        line = content[line_start : line_end if line_end != -1 else len(content)]
+        matches.append(LineMatch(line_number, line[:SNIPPET_LENGTH]))
+        if len(matches) >= limit:
+            break
+    return matches
@@ -0,0 +1,51 @@
+"""
+Сбор длительностей этапов и счётчиков одной операции объединения.
+
+``CombineStats`` передаётся в ``scan_directory`` и ``combine_files_content``.
+Этапы: 'scan' (листинг директорий), 'read' (чтение с диска), 'decode'
+(декодирование UTF-8), 'preprocess', 'sort' и 'render'. Бэкенд переносит
+собранные значения в метрики.
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator, Optional
+
+STAGES = ("scan", "read", "decode", "preprocess", "sort", "render")
+
+
+class CombineStats:
+    """Накопленные длительности этапов (в секундах) и счётчики."""
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other: "CombineStats") -> None:
+        """Добавляет длительности и счётчики ``other`` (например, другого потока)."""
+        for stage, seconds in other.durations.items():
+            self.add_time(stage, seconds)
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Контекстный менеджер, добавляющий длительность блока к этапу."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+
+def measure_stage(stats: Optional[CombineStats], stage: str) -> ContextManager[None]:
+    """``stats.measure(stage)`` или пустой контекст, если сбор статистики выключен."""
+    if stats is None:
+        return nullcontext()
+    return stats.measure(stage)
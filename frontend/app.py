@@ -175,13 +175,17 @@ extensions_input = st.text_input(
 
 # --- Новые параметры для предварительной обработки и формата ---
 st.subheader("Preprocessing Options")
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4, col5 = st.columns(5)
 with col1:
     remove_extra_empty_lines = st.checkbox("Remove extra empty lines", value=False)
 with col2:
     normalize_line_endings = st.checkbox("Normalize line endings (to LF)", value=False)
 with col3:
     remove_trailing_whitespace = st.checkbox("Remove trailing whitespace", value=False)
+with col4:
+    strip_comments = st.checkbox("Strip code comments", value=False)
+with col5:
+    redact_secrets = st.checkbox("Redact secrets and e-mails", value=False)
 
 st.subheader("Output Format")
 output_format = st.selectbox(
@@ -219,6 +223,8 @@ if st.button("🚀 Combine Files", type="primary"):
                         "remove_trailing_whitespace": str(
                             remove_trailing_whitespace
                         ).lower(),
+                        "strip_comments": str(strip_comments).lower(),
+                        "redact_secrets": str(redact_secrets).lower(),
                     }
                     if extensions_input.strip():
                         data["extensions"] = extensions_input.strip()
@@ -242,6 +248,8 @@ if st.button("🚀 Combine Files", type="primary"):
                         "remove_trailing_whitespace": str(
                             remove_trailing_whitespace
                         ).lower(),
+                        "strip_comments": str(strip_comments).lower(),
+                        "redact_secrets": str(redact_secrets).lower(),
                         "max_depth": str(max_depth),  # Добавляем параметр глубины
                     }
                     if extensions_pattern.strip():
@@ -0,0 +1,165 @@
+"""
+Helpers shared by the benchmark and load-test scripts.
+
+Provides percentile summaries, run metadata (commit, interpreter, platform) and
+starting a local uvicorn backend on a free port.
+"""
+
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+BACKEND_SRC = REPO_ROOT / "backend" / "src"
+
+# Repeated requests would otherwise be answered from the output store or
+# joined to an identical request in flight, which times cache hits
+COLD_BACKEND_ENV = {
+    "FILE_COMBINER_OUTPUT_STORE_MAX_BYTES": "0",
+    "FILE_COMBINER_COALESCE_FOLDER_REQUESTS": "false",
+}
+
+
+def add_backend_to_path() -> None:
+    """Make ``shared`` and ``backend`` importable from the scripts."""
+    if str(BACKEND_SRC) not in sys.path:
+        sys.path.insert(0, str(BACKEND_SRC))
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Percentile ``q`` (0-100) with linear interpolation between ranks."""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[int(rank)]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of latencies, in milliseconds."""
+    if not seconds:
+        return {}
+    return {
+        "p50": round(percentile(seconds, 50) * 1000, 3),
+        "p95": round(percentile(seconds, 95) * 1000, 3),
+        "p99": round(percentile(seconds, 99) * 1000, 3),
+        "mean": round(sum(seconds) / len(seconds) * 1000, 3),
+        "max": round(max(seconds) * 1000, 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata() -> Dict[str, object]:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalBackend:
+    """
+    Context manager running the FastAPI backend under uvicorn on a free port.
+
+    Result caching is off (``COLD_BACKEND_ENV``) so every request does the full
+    work; ``env`` entries override it.
+    """
+
+    def __init__(self, port: Optional[int] = None, env: Optional[Dict[str, str]] = None):
+        self.port = port or free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.env = dict(COLD_BACKEND_ENV, **(env or {}))
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "LocalBackend":
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join(
+            [str(BACKEND_SRC), env.get("PYTHONPATH", "")]
+        ).rstrip(os.pathsep)
+        env.update(self.env)
+        cmd = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "backend.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(self.port),
+            "--log-level",
+            "warning",
+        ]
+        self.process = subprocess.Popen(cmd, cwd=BACKEND_SRC, env=env)
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process is not None and self.process.poll() is not None:
+                raise RuntimeError("Backend exited before becoming ready.")
+            try:
+                with urllib.request.urlopen(self.base_url + "/", timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"Backend did not start within {timeout} seconds.")
+
+    def __exit__(self, *exc_info) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Current resident set size of a process (Linux ``/proc``), if available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def format_table(rows: List[List[str]]) -> str:
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows
+    )
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files produced by ``run_benchmarks.py``.
+
+Cases are matched by (target, output_format, preprocessing). The script prints
+the change of p50 latency, throughput and peak memory and exits with status 1
+if any case regressed by more than ``--threshold`` percent.
+
+Usage:
+    python scripts/benchmarks/compare.py BASELINE.json CANDIDATE.json [options]
+
+Examples:
+    python scripts/benchmarks/compare.py main.json branch.json
+    python scripts/benchmarks/compare.py main.json branch.json --threshold 5
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import format_table  # noqa: E402
+
+CaseKey = Tuple[str, str, str]
+
+
+def load_results(path: str) -> Dict[CaseKey, Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {
+        (r["target"], r["output_format"], r["preprocessing"]): r
+        for r in report["results"]
+    }
+
+
+def change_percent(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:+.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Regression threshold in percent for p50 latency and peak memory",
+    )
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+
+    rows = [["target", "format", "preprocessing", "p50", "MB/s", "peak mem"]]
+    regressions = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key], candidate[key]
+        latency = change_percent(
+            old["latency_ms"].get("p50"), new["latency_ms"].get("p50")
+        )
+        throughput = change_percent(old["throughput_mb_s"], new["throughput_mb_s"])
+        memory = change_percent(old["peak_memory_bytes"], new["peak_memory_bytes"])
+        rows.append([*key, _fmt(latency), _fmt(throughput), _fmt(memory)])
+        if (latency or 0) > args.threshold or (memory or 0) > args.threshold:
+            regressions.append(key)
+
+    print(format_table(rows))
+    missing = baseline.keys() ^ candidate.keys()
+    if missing:
+        print(f"\n{len(missing)} case(s) present in only one of the files.")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%:")
+        for key in regressions:
+            print("  " + " / ".join(key))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
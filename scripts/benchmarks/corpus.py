@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic corpus generator for File Combiner benchmarks.
+
+The same ``CorpusSpec`` (including the seed) always produces byte-identical
+trees, so results from different commits can be compared.
+
+Usage:
+    python scripts/benchmarks/corpus.py OUTPUT_DIR [options]
+
+Examples:
+    python scripts/benchmarks/corpus.py /tmp/corpus --files 2000 --median-size 4096
+    python scripts/benchmarks/corpus.py /tmp/corpus --crlf-ratio 0.5 --depth 4
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+EXTENSIONS = (".py", ".md", ".txt", ".js", ".yaml")
+WORDS = (
+    "alpha beta gamma delta epsilon combine folder file content render scan "
+    "index value result return import class def self data stream buffer"
+).split()
+
+
+@dataclass
+class CorpusSpec:
+    """Shape of a synthetic corpus."""
+
+    file_count: int = 200
+    # File sizes follow a log-normal distribution around ``median_size`` bytes
+    median_size: int = 4096
+    size_sigma: float = 1.0
+    max_size: int = 1024 * 1024
+    # Share of lines that are empty
+    blank_line_density: float = 0.15
+    # Share of files written with CRLF line endings
+    crlf_ratio: float = 0.2
+    # Maximum directory nesting below the root
+    depth: int = 3
+    seed: int = 42
+
+    @classmethod
+    def preset(cls, name: str) -> "CorpusSpec":
+        presets: Dict[str, CorpusSpec] = {
+            "small": cls(file_count=50, median_size=1024),
+            "medium": cls(file_count=500, median_size=4096),
+            "large": cls(file_count=5000, median_size=8192, depth=5),
+        }
+        return presets[name]
+
+
+@dataclass
+class CorpusInfo:
+    """What was generated."""
+
+    root: str
+    file_count: int
+    total_bytes: int
+    paths: List[str]
+
+
+def _file_size(rng: random.Random, spec: CorpusSpec) -> int:
+    size = int(rng.lognormvariate(math.log(spec.median_size), spec.size_sigma))
+    return max(1, min(size, spec.max_size))
+
+
+def _file_body(rng: random.Random, size: int, spec: CorpusSpec, crlf: bool) -> bytes:
+    newline = "\r\n" if crlf else "\n"
+    lines: List[str] = []
+    written = 0
+    while written < size:
+        if rng.random() < spec.blank_line_density:
+            line = ""
+        else:
+            indent = " " * (4 * rng.randint(0, 3))
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+            trailing = " " * rng.randint(0, 2)
+            line = f"{indent}{words}{trailing}"
+        lines.append(line)
+        written += len(line) + len(newline)
+    return (newline.join(lines) + newline).encode("utf-8")[:size]
+
+
+def generate_corpus(root: str, spec: CorpusSpec) -> CorpusInfo:
+    """Write the corpus described by ``spec`` under ``root``."""
+    rng = random.Random(spec.seed)
+    os.makedirs(root, exist_ok=True)
+    directories = [root]
+    for index in range(max(1, spec.file_count // 20)):
+        parent = rng.choice(directories)
+        depth = os.path.relpath(parent, root).count(os.sep) + (parent != root)
+        if depth >= spec.depth:
+            parent = root
+        directory = os.path.join(parent, f"dir_{index:04d}")
+        os.makedirs(directory, exist_ok=True)
+        directories.append(directory)
+
+    paths: List[str] = []
+    total_bytes = 0
+    for index in range(spec.file_count):
+        directory = rng.choice(directories)
+        extension = rng.choice(EXTENSIONS)
+        path = os.path.join(directory, f"file_{index:05d}{extension}")
+        crlf = rng.random() < spec.crlf_ratio
+        body = _file_body(rng, _file_size(rng, spec), spec, crlf)
+        with open(path, "wb") as f:
+            f.write(body)
+        total_bytes += len(body)
+        paths.append(path)
+    return CorpusInfo(root, len(paths), total_bytes, paths)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus.")
+    parser.add_argument("output_dir", help="Directory to create the corpus in")
+    parser.add_argument("--preset", choices=["small", "medium", "large"])
+    parser.add_argument("--files", type=int, help="Number of files")
+    parser.add_argument("--median-size", type=int, help="Median file size in bytes")
+    parser.add_argument("--blank-line-density", type=float)
+    parser.add_argument("--crlf-ratio", type=float)
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    spec = CorpusSpec.preset(args.preset) if args.preset else CorpusSpec()
+    overrides = {
+        "file_count": args.files,
+        "median_size": args.median_size,
+        "blank_line_density": args.blank_line_density,
+        "crlf_ratio": args.crlf_ratio,
+        "depth": args.depth,
+        "seed": args.seed,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            setattr(spec, key, value)
+
+    info = generate_corpus(args.output_dir, spec)
+    print(
+        json.dumps(
+            {
+                "spec": asdict(spec),
+                "files": info.file_count,
+                "total_bytes": info.total_bytes,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
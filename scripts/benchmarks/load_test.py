@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Concurrent HTTP load test for ``/combine/`` and ``/combine-folder/``.
+
+Starts a local backend (or targets ``--url``), then ramps the number of
+concurrent clients through ``--concurrency`` levels. At each level clients send
+a seeded mix of folder combines of different corpus sizes and uploads of
+different sizes for ``--stage-seconds``. For every level the report gives
+throughput, p50/p95/p99 latency and error rate, and server RSS is sampled over
+the whole run.
+
+The saturation point is the last level that still meets the SLO
+(``--slo-p99-ms`` and ``--max-error-rate``) while adding at least
+``--min-gain`` percent throughput over the previous level. Capacity planning
+should use the throughput at that level.
+
+Usage:
+    python scripts/benchmarks/load_test.py [options]
+
+Examples:
+    python scripts/benchmarks/load_test.py --concurrency 1 2 4 8 16 32
+    python scripts/benchmarks/load_test.py --url http://localhost:8000 --stage-seconds 30
+    python scripts/benchmarks/load_test.py --slo-p99-ms 500 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (  # noqa: E402
+    LocalBackend,
+    format_table,
+    latency_summary,
+    rss_bytes,
+    run_metadata,
+)
+from corpus import CorpusSpec, generate_corpus  # noqa: E402
+
+# (name, corpus file count, median file size, weight)
+FOLDER_SCENARIOS = [
+    ("folder_small", 20, 1024, 5),
+    ("folder_medium", 200, 4096, 3),
+    ("folder_large", 1000, 8192, 1),
+]
+# (name, number of uploaded files, size of each file, weight)
+UPLOAD_SCENARIOS = [
+    ("upload_small", 5, 2 * 1024, 5),
+    ("upload_medium", 20, 32 * 1024, 2),
+    ("upload_large", 10, 512 * 1024, 1),
+]
+OUTPUT_FORMATS = ("markdown", "json")
+
+
+@dataclass
+class Scenario:
+    name: str
+    weight: int
+    folder_path: Optional[str] = None
+    uploads: List[Tuple[str, bytes]] = field(default_factory=list)
+
+
+@dataclass
+class StageResult:
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    by_scenario: Dict[str, int] = field(default_factory=dict)
+    duration: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        total = len(self.latencies) + self.errors
+        return {
+            "concurrency": self.concurrency,
+            "requests": total,
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "throughput_rps": round(len(self.latencies) / self.duration, 2)
+            if self.duration
+            else 0.0,
+            "latency_ms": latency_summary(self.latencies),
+            "by_scenario": self.by_scenario,
+        }
+
+
+def build_scenarios(root: str, seed: int) -> List[Scenario]:
+    scenarios = []
+    for index, (name, files, size, weight) in enumerate(FOLDER_SCENARIOS):
+        spec = CorpusSpec(file_count=files, median_size=size, seed=seed + index)
+        info = generate_corpus(os.path.join(root, name), spec)
+        scenarios.append(Scenario(name, weight, folder_path=info.root))
+    rng = random.Random(seed)
+    for name, count, size, weight in UPLOAD_SCENARIOS:
+        uploads = [
+            (f"{name}_{i}.txt", rng.randbytes(size // 2).hex().encode()[:size])
+            for i in range(count)
+        ]
+        scenarios.append(Scenario(name, weight, uploads=uploads))
+    return scenarios
+
+
+async def _send(client, base_url: str, scenario: Scenario, output_format: str) -> None:
+    data = {"output_format": output_format}
+    if scenario.folder_path is not None:
+        data["folder_path"] = scenario.folder_path
+        response = await client.post(base_url + "/combine-folder/", data=data)
+    else:
+        files = [("files", (name, body, "text/plain")) for name, body in scenario.uploads]
+        response = await client.post(base_url + "/combine/", data=data, files=files)
+    response.raise_for_status()
+
+
+async def run_stage(
+    client,
+    base_url: str,
+    scenarios: List[Scenario],
+    concurrency: int,
+    seconds: float,
+    seed: int,
+) -> StageResult:
+    result = StageResult(concurrency)
+    deadline = time.monotonic() + seconds
+    weights = [s.weight for s in scenarios]
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.monotonic() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            output_format = rng.choice(OUTPUT_FORMATS)
+            start = time.perf_counter()
+            try:
+                await _send(client, base_url, scenario, output_format)
+            except Exception:  # noqa: BLE001 - any failure counts as an error
+                result.errors += 1
+            else:
+                result.latencies.append(time.perf_counter() - start)
+            result.by_scenario[scenario.name] = (
+                result.by_scenario.get(scenario.name, 0) + 1
+            )
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    result.duration = time.monotonic() - started
+    return result
+
+
+async def sample_rss(pid: int, samples: List[Dict[str, float]], started: float) -> None:
+    while True:
+        rss = rss_bytes(pid)
+        if rss is not None:
+            samples.append({"t": round(time.monotonic() - started, 2), "rss_bytes": rss})
+        await asyncio.sleep(0.5)
+
+
+def find_saturation(
+    stages: List[Dict[str, Any]],
+    slo_p99_ms: float,
+    max_error_rate: float,
+    min_gain: float,
+) -> Optional[Dict[str, Any]]:
+    """Last level within the SLO that still adds ``min_gain`` percent throughput."""
+    best: Optional[Dict[str, Any]] = None
+    for stage in stages:
+        p99 = stage["latency_ms"].get("p99", float("inf"))
+        if p99 > slo_p99_ms or stage["error_rate"] > max_error_rate:
+            break
+        if best is not None:
+            gain = (stage["throughput_rps"] - best["throughput_rps"]) / max(
+                best["throughput_rps"], 1e-9
+            )
+            if gain * 100 < min_gain:
+                break
+        best = stage
+    return best
+
+
+async def run_load_test(args: argparse.Namespace, base_url: str, pid: Optional[int]):
+    import httpx
+
+    with tempfile.TemporaryDirectory(prefix="file-combiner-load-") as tmp:
+        scenarios = build_scenarios(tmp, args.seed)
+        rss_samples: List[Dict[str, float]] = []
+        started = time.monotonic()
+        sampler = (
+            asyncio.ensure_future(sample_rss(pid, rss_samples, started)) if pid else None
+        )
+        stages = []
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            for level in args.concurrency:
+                stage_start = time.monotonic() - started
+                stage = await run_stage(
+                    client, base_url, scenarios, level, args.stage_seconds, args.seed
+                )
+                summary = stage.summary()
+                stage_rss = [s["rss_bytes"] for s in rss_samples if s["t"] >= stage_start]
+                summary["peak_rss_bytes"] = max(stage_rss) if stage_rss else None
+                stages.append(summary)
+                print(
+                    f"concurrency={level:<4} rps={summary['throughput_rps']:<8} "
+                    f"p99={summary['latency_ms'].get('p99', '-')}ms "
+                    f"errors={summary['error_rate']:.2%}"
+                )
+        if sampler is not None:
+            sampler.cancel()
+    return stages, rss_samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the File Combiner API.")
+    parser.add_argument("--url", help="Target an already running backend")
+    parser.add_argument(
+        "--server-pid", type=int, help="PID to sample RSS from when using --url"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--stage-seconds", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--slo-p99-ms", type=float, default=1000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--min-gain",
+        type=float,
+        default=5.0,
+        help="Minimum throughput gain in percent for a level to count as scaling",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args()
+
+    if args.url:
+        stages, rss = asyncio.run(run_load_test(args, args.url, args.server_pid))
+    else:
+        with LocalBackend() as backend:
+            pid = backend.process.pid if backend.process else None
+            stages, rss = asyncio.run(run_load_test(args, backend.base_url, pid))
+
+    saturation = find_saturation(
+        stages, args.slo_p99_ms, args.max_error_rate, args.min_gain
+    )
+    report = {
+        "meta": run_metadata(),
+        "slo": {"p99_ms": args.slo_p99_ms, "max_error_rate": args.max_error_rate},
+        "stages": stages,
+        "saturation": saturation,
+        "server_rss": rss,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    rows = [["concurrency", "rps", "p50 ms", "p95 ms", "p99 ms", "errors", "RSS MB"]]
+    for stage in stages:
+        latency = stage["latency_ms"]
+        rows.append(
+            [
+                str(stage["concurrency"]),
+                str(stage["throughput_rps"]),
+                str(latency.get("p50", "-")),
+                str(latency.get("p95", "-")),
+                str(latency.get("p99", "-")),
+                f"{stage['error_rate']:.2%}",
+                f"{stage['peak_rss_bytes'] / 1e6:.1f}"
+                if stage["peak_rss_bytes"]
+                else "-",
+            ]
+        )
+    print()
+    print(format_table(rows))
+    if rss:
+        peak = max(sample["rss_bytes"] for sample in rss)
+        print(f"\nPeak server RSS: {peak / 1e6:.1f} MB")
+    if saturation:
+        print(
+            f"Saturation point: concurrency {saturation['concurrency']} at "
+            f"{saturation['throughput_rps']} req/s within the SLO"
+        )
+    else:
+        print("No concurrency level met the SLO.")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
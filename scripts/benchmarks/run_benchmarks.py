@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmarks for the combine engine and the HTTP endpoints.
+
+Generates a deterministic corpus (see ``corpus.py``) and measures, for every
+output format and preprocessing combination:
+
+- ``engine``: ``combine_files_content`` called directly on pre-read files;
+- ``scan``: ``scan_directory`` over the corpus;
+- ``endpoint:/combine-folder/`` and ``endpoint:/combine/`` through a local
+  uvicorn backend.
+
+Each result carries latency percentiles, throughput (MB/s, files/s) and peak
+traced memory. Results are written as JSON and can be compared across commits
+with ``compare.py``.
+
+Usage:
+    python scripts/benchmarks/run_benchmarks.py [options]
+
+Examples:
+    python scripts/benchmarks/run_benchmarks.py --preset small --output bench.json
+    python scripts/benchmarks/run_benchmarks.py --skip-endpoints --repeat 10
+    python scripts/benchmarks/run_benchmarks.py --formats markdown --preprocessing none
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (  # noqa: E402
+    LocalBackend,
+    add_backend_to_path,
+    format_table,
+    latency_summary,
+    percentile,
+    run_metadata,
+)
+from corpus import CorpusInfo, CorpusSpec, generate_corpus  # noqa: E402
+
+add_backend_to_path()
+
+from shared.combine_logic import combine_files_content  # noqa: E402
+from shared.scan_logic import scan_directory  # noqa: E402
+
+FORMATS = ("markdown", "json", "yaml")
+PREPROCESSING_KEYS = (
+    "remove_extra_empty_lines",
+    "normalize_line_endings",
+    "remove_trailing_whitespace",
+    "strip_comments",
+    "redact_secrets",
+)
+# Short names used in result labels
+PREPROCESSING_LABELS = {
+    "remove_extra_empty_lines": "empty_lines",
+    "normalize_line_endings": "line_endings",
+    "remove_trailing_whitespace": "trailing_ws",
+    "strip_comments": "comments",
+    "redact_secrets": "redact",
+}
+
+
+def preprocessing_combinations(mode: str) -> List[Dict[str, bool]]:
+    if mode == "none":
+        return [{key: False for key in PREPROCESSING_KEYS}]
+    if mode == "all-on":
+        return [{key: True for key in PREPROCESSING_KEYS}]
+    return [
+        dict(zip(PREPROCESSING_KEYS, flags))
+        for flags in itertools.product([False, True], repeat=len(PREPROCESSING_KEYS))
+    ]
+
+
+def preprocessing_label(options: Dict[str, bool]) -> str:
+    enabled = [
+        PREPROCESSING_LABELS[key] for key in PREPROCESSING_KEYS if options.get(key)
+    ]
+    return "+".join(enabled) if enabled else "none"
+
+
+def _result(
+    target: str,
+    output_format: str,
+    options: Dict[str, bool],
+    latencies: Sequence[float],
+    total_bytes: int,
+    file_count: int,
+    peak_memory: int = 0,
+) -> Dict[str, Any]:
+    median = percentile(latencies, 50)
+    return {
+        "target": target,
+        "output_format": output_format,
+        "preprocessing": preprocessing_label(options),
+        "runs": len(latencies),
+        "latency_ms": latency_summary(latencies),
+        "throughput_mb_s": round(total_bytes / median / 1e6, 3) if median else None,
+        "files_per_s": round(file_count / median, 1) if median else None,
+        "peak_memory_bytes": peak_memory,
+        "input_bytes": total_bytes,
+    }
+
+
+def _time_runs(func: Callable[[], Any], repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        func()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _peak_memory(func: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_engine(
+    info: CorpusInfo,
+    formats: Sequence[str],
+    combinations: List[Dict[str, bool]],
+    repeat: int,
+) -> List[Dict[str, Any]]:
+    files = scan_directory(info.root)
+    results = []
+    for output_format, options in itertools.product(formats, combinations):
+
+        def run(options=options, output_format=output_format) -> None:
+            combine_files_content(files, "name", None, options, output_format)
+
+        latencies = _time_runs(run, repeat)
+        results.append(
+            _result(
+                "engine",
+                output_format,
+                options,
+                latencies,
+                info.total_bytes,
+                info.file_count,
+                _peak_memory(run),
+            )
+        )
+    return results
+
+
+def bench_scan(info: CorpusInfo, repeat: int) -> List[Dict[str, Any]]:
+    def run() -> None:
+        scan_directory(info.root)
+
+    latencies = _time_runs(run, repeat)
+    return [
+        _result(
+            "scan",
+            "-",
+            {},
+            latencies,
+            info.total_bytes,
+            info.file_count,
+            _peak_memory(run),
+        )
+    ]
+
+
+def bench_endpoints(
+    info: CorpusInfo,
+    formats: Sequence[str],
+    combinations: List[Dict[str, bool]],
+    repeat: int,
+    upload_limit: int,
+) -> List[Dict[str, Any]]:
+    import requests
+
+    uploads = []
+    upload_bytes = 0
+    for path in info.paths[:upload_limit]:
+        with open(path, "rb") as f:
+            data = f.read()
+        uploads.append((os.path.relpath(path, info.root), data))
+        upload_bytes += len(data)
+
+    results = []
+    with LocalBackend() as backend, requests.Session() as session:
+        for output_format, options in itertools.product(formats, combinations):
+            form = {"output_format": output_format}
+            form.update({key: str(value).lower() for key, value in options.items()})
+
+            def folder(form=form) -> None:
+                response = session.post(
+                    backend.base_url + "/combine-folder/",
+                    data=dict(form, folder_path=info.root),
+                )
+                response.raise_for_status()
+
+            def upload(form=form) -> None:
+                response = session.post(
+                    backend.base_url + "/combine/",
+                    data=form,
+                    files=[("files", (name, data)) for name, data in uploads],
+                )
+                response.raise_for_status()
+
+            results.append(
+                _result(
+                    "endpoint:/combine-folder/",
+                    output_format,
+                    options,
+                    _time_runs(folder, repeat),
+                    info.total_bytes,
+                    info.file_count,
+                )
+            )
+            results.append(
+                _result(
+                    "endpoint:/combine/",
+                    output_format,
+                    options,
+                    _time_runs(upload, repeat),
+                    upload_bytes,
+                    len(uploads),
+                )
+            )
+    return results
+
+
+def print_summary(results: List[Dict[str, Any]]) -> None:
+    rows = [["target", "format", "preprocessing", "p50 ms", "p99 ms", "MB/s", "peak MB"]]
+    for r in results:
+        rows.append(
+            [
+                r["target"],
+                r["output_format"],
+                r["preprocessing"],
+                str(r["latency_ms"].get("p50", "")),
+                str(r["latency_ms"].get("p99", "")),
+                str(r["throughput_mb_s"]),
+                f"{r['peak_memory_bytes'] / 1e6:.1f}" if r["peak_memory_bytes"] else "-",
+            ]
+        )
+    print(format_table(rows))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run File Combiner benchmarks.")
+    parser.add_argument("--preset", choices=["small", "medium", "large"], default="small")
+    parser.add_argument("--files", type=int, help="Override the preset file count")
+    parser.add_argument("--seed", type=int, help="Override the corpus seed")
+    parser.add_argument("--corpus-dir", help="Where to generate the corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument(
+        "--preprocessing",
+        choices=["all", "none", "all-on"],
+        default="all",
+        help=f"'all' runs every combination of the {len(PREPROCESSING_KEYS)} "
+        "preprocessing options",
+    )
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument(
+        "--upload-limit", type=int, default=200, help="Files uploaded to /combine/"
+    )
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    spec = CorpusSpec.preset(args.preset)
+    if args.files is not None:
+        spec.file_count = args.files
+    if args.seed is not None:
+        spec.seed = args.seed
+    combinations = preprocessing_combinations(args.preprocessing)
+
+    with tempfile.TemporaryDirectory(prefix="file-combiner-bench-") as tmp:
+        info = generate_corpus(args.corpus_dir or os.path.join(tmp, "corpus"), spec)
+        results = bench_scan(info, args.repeat)
+        results += bench_engine(info, args.formats, combinations, args.repeat)
+        if not args.skip_endpoints:
+            results += bench_endpoints(
+                info, args.formats, combinations, args.repeat, args.upload_limit
+            )
+
+    report = {
+        "meta": run_metadata(),
+        "corpus": dict(asdict(spec), files=info.file_count, total_bytes=info.total_bytes),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_summary(results)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import pytest
+
+from backend.src.backend import main
+from backend.src.backend.output_store import OutputStore
+
+
+def _empty_store(tmp_path_factory):
+    root = tmp_path_factory.mktemp("output-store")
+    return OutputStore(str(root), main.settings.output_store_max_bytes)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def session_output_store(tmp_path_factory):
+    """Module fixtures write to a temporary store, never the shared one in /tmp."""
+    with pytest.MonkeyPatch.context() as patch:
+        store = _empty_store(tmp_path_factory)
+        patch.setattr(main, "output_store", store)
+        yield store
+
+
+@pytest.fixture(autouse=True)
+def isolated_output_store(session_output_store, tmp_path_factory, monkeypatch):
+    """Each test starts with an empty output store of its own."""
+    store = _empty_store(tmp_path_factory)
+    monkeypatch.setattr(main, "output_store", store)
+    return store
@@ -0,0 +1,165 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.backend.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    folder_admission,
+)
+from backend.src.backend.main import app
+from backend.src.shared.scan_logic import estimate_directory_size
+
+client = TestClient(app)
+
+
+def _controller(**overrides):
+    options = dict(budget_bytes=100, queue_timeout=1.0, max_queue=2, retry_after=3)
+    options.update(overrides)
+    return AdmissionController("test", **options)
+
+
+def test_requests_over_budget_wait_until_bytes_are_released():
+    """A request that does not fit waits in line and runs once room frees up."""
+    controller = _controller()
+    order = []
+
+    async def request(name, size, hold):
+        async with controller.admit(size):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def scenario():
+        first = asyncio.ensure_future(request("first", 80, 0.05))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(request("second", 50, 0))
+        await asyncio.sleep(0.01)
+        assert (controller.in_flight_bytes, controller.queue_length) == (80, 1)
+        await asyncio.gather(first, second)
+
+    asyncio.run(scenario())
+
+    assert order == ["first", "second"]
+    assert (controller.in_flight_bytes, controller.queue_length) == (0, 0)
+
+
+def test_rejects_on_timeout_and_full_queue():
+    """Waiting too long or finding the queue full raises AdmissionRejected."""
+    controller = _controller(queue_timeout=0.01, max_queue=1)
+
+    async def scenario():
+        async with controller.admit(100):
+            waiting = asyncio.ensure_future(controller.admit(1).__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as full:
+                await controller.admit(1).__aenter__()
+            with pytest.raises(AdmissionRejected) as timeout:
+                await waiting
+        return full.value, timeout.value
+
+    full, timeout = asyncio.run(scenario())
+
+    assert full.retry_after == timeout.retry_after == 3
+    assert "waiting" in str(full)
+    assert controller.queue_length == 0
+
+
+def test_waiter_cancelled_after_being_admitted_releases_its_bytes():
+    """Bytes granted to a waiter that is cancelled before it resumes go back."""
+    controller = _controller()
+
+    async def scenario():
+        holder = controller.admit(80)
+        await holder.__aenter__()
+        waiting = asyncio.ensure_future(controller.admit(50).__aenter__())
+        await asyncio.sleep(0.01)
+        # Releasing the first request grants the waiter, which has not resumed yet
+        await holder.__aexit__(None, None, None)
+        assert controller.in_flight_bytes == 50
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        return controller.in_flight_bytes, controller.queue_length
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_oversized_request_runs_alone():
+    """A request larger than the whole budget is clamped instead of starving."""
+    controller = _controller()
+
+    async def scenario():
+        async with controller.admit(10_000):
+            return controller.in_flight_bytes
+
+    assert asyncio.run(scenario()) == 100
+
+
+def test_estimate_directory_size_respects_filters(tmp_path):
+    """The pre-scan sums only files the combine would read."""
+    (tmp_path / "a.txt").write_text("12345")
+    (tmp_path / "b.md").write_text("123")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.txt").write_text("12")
+    (tmp_path / "sub" / "deeper").mkdir()
+    (tmp_path / "sub" / "deeper" / "d.txt").write_text("1")
+
+    assert estimate_directory_size(str(tmp_path)) == 11
+    assert estimate_directory_size(str(tmp_path), extensions=[".txt"]) == 8
+    assert estimate_directory_size(str(tmp_path), max_depth=1) == 10
+
+
+def test_combine_folder_returns_429_when_budget_is_exhausted(tmp_path, monkeypatch):
+    """A request that cannot be admitted in time gets 429 with Retry-After."""
+    (tmp_path / "a.txt").write_text("A")
+    monkeypatch.setattr(folder_admission, "in_flight_bytes", folder_admission.budget_bytes)
+    monkeypatch.setattr(folder_admission, "queue_timeout", 0.01)
+
+    response = client.post("/combine-folder/", data={"folder_path": str(tmp_path)})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == str(folder_admission.retry_after)
+    metrics = client.get("/metrics").text
+    assert 'file_combiner_admission_queue_length{endpoint="combine_folder_endpoint"}' in metrics
+
+
+def test_folder_job_fails_when_budget_is_exhausted(tmp_path, monkeypatch):
+    """A background job is admitted like /combine-folder/ and fails if it cannot be."""
+    (tmp_path / "a.txt").write_text("A")
+    monkeypatch.setattr(folder_admission, "in_flight_bytes", folder_admission.budget_bytes)
+    monkeypatch.setattr(folder_admission, "queue_timeout", 0.01)
+
+    with TestClient(app) as job_client:
+        job = job_client.post(
+            "/combine-folder/jobs/", data={"folder_path": str(tmp_path)}
+        ).json()
+        events = job_client.get(job["events_url"]).text
+
+    assert "event: error" in events
+    assert "Not enough capacity" in events
+
+
+def test_batch_spec_fails_when_budget_is_exhausted(tmp_path, monkeypatch):
+    """Batch specs are admitted against the folder budget; rejections are per spec."""
+    (tmp_path / "a.txt").write_text("A")
+    monkeypatch.setattr(folder_admission, "in_flight_bytes", folder_admission.budget_bytes)
+    monkeypatch.setattr(folder_admission, "queue_timeout", 0.01)
+
+    response = client.post(
+        "/combine-batch/",
+        json={
+            "specs": [
+                {"folder_path": str(tmp_path)},
+                {"file_paths": [str(tmp_path / "a.txt")]},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+    assert [entry["status"] for entry in manifest["results"]] == ["error", "error"]
+    assert "Not enough capacity" in manifest["results"][0]["error"]
@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import threading
+import zipfile
+
+from fastapi.testclient import TestClient
+from backend.src.backend.executor import combine_executor
+from backend.src.backend.main import app
+
+client = TestClient(app)
+
+
+def _make_folder(root, name, files):
+    folder = os.path.join(root, name)
+    os.makedirs(folder)
+    for file_name, content in files.items():
+        with open(os.path.join(folder, file_name), "w") as f:
+            f.write(content)
+    return folder
+
+
+def test_combine_batch_returns_zip_with_manifest(tmp_path):
+    """Each spec becomes one archive entry and the manifest reports its status."""
+    first = _make_folder(str(tmp_path), "pkg_a", {"a.txt": "Alpha"})
+    second = _make_folder(str(tmp_path), "pkg_b", {"b.txt": "Beta"})
+
+    response = client.post(
+        "/combine-batch/",
+        json={
+            "specs": [
+                {"folder_path": first},
+                {"folder_path": second, "output_format": "json"},
+                {"file_paths": [os.path.join(first, "a.txt")], "name": "group"},
+            ],
+            "max_concurrency": 2,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert set(archive.namelist()) == {
+        "pkg_a.md",
+        "pkg_b.json",
+        "group.md",
+        "manifest.json",
+    }
+    assert "Alpha" in archive.read("pkg_a.md").decode()
+    assert json.loads(archive.read("pkg_b.json"))["files"][0]["content"] == "Beta"
+    manifest = json.loads(archive.read("manifest.json"))
+    assert [r["status"] for r in manifest["results"]] == ["ok", "ok", "ok"]
+    # a.txt is read by two specs but opened once.
+    assert manifest["cache"]["hits"] >= 1
+
+
+def test_combine_batch_waits_for_a_saturated_executor(tmp_path, monkeypatch):
+    """Specs wait for executor capacity instead of failing with a 503 error."""
+    folder = _make_folder(str(tmp_path), "pkg", {"a.txt": "Alpha"})
+    monkeypatch.setattr(combine_executor, "queued", combine_executor.capacity)
+    freed = threading.Timer(0.2, setattr, (combine_executor, "queued", 0))
+    freed.start()
+    try:
+        response = client.post(
+            "/combine-batch/", json={"specs": [{"folder_path": folder}] * 3}
+        )
+    finally:
+        freed.cancel()
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+    assert [entry["status"] for entry in manifest["results"]] == ["ok"] * 3
+
+
+def test_combine_batch_rejects_missing_folder(tmp_path):
+    """A spec pointing to a missing folder fails the whole request up front."""
+    response = client.post(
+        "/combine-batch/",
+        json={"specs": [{"folder_path": str(tmp_path / "missing")}]},
+    )
+
+    assert response.status_code == 400
+    assert "does not exist" in response.text
+
+
+def test_combine_batch_validates_spec_options(tmp_path):
+    """Invalid options are rejected by request validation."""
+    response = client.post(
+        "/combine-batch/",
+        json={"specs": [{"folder_path": str(tmp_path), "sort_mode": "size"}]},
+    )
+
+    assert response.status_code == 422
@@ -0,0 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi.testclient import TestClient
+from backend.src.backend import main
+from backend.src.backend.disconnect import cancel_on_disconnect
+from backend.src.backend.main import app
+
+client = TestClient(app)
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def test_token_is_cancelled_when_client_disconnects(monkeypatch):
+    """The watcher trips the token once the request reports a disconnect."""
+    monkeypatch.setattr(main.settings, "disconnect_poll_interval", 0.01)
+    request = FakeRequest()
+
+    async def scenario():
+        async with cancel_on_disconnect(request) as token:
+            await asyncio.sleep(0.03)
+            assert not token.cancelled
+            request.disconnected = True
+            await asyncio.sleep(0.03)
+            return token.cancelled
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_cancelled_folder_combine_returns_499_and_is_counted(tmp_path, monkeypatch):
+    """A combine abandoned by its client is answered with 499 and counted."""
+    (tmp_path / "a.txt").write_text("A")
+
+    @asynccontextmanager
+    async def already_disconnected(request):
+        token = main.CancellationToken()
+        token.cancel()
+        yield token
+
+    monkeypatch.setattr(main, "cancel_on_disconnect", already_disconnected)
+
+    response = client.post("/combine-folder/", data={"folder_path": str(tmp_path)})
+
+    assert response.status_code == 499
+    metrics = client.get("/metrics").text
+    assert (
+        'file_combiner_cancellations_total{endpoint="combine_folder_endpoint",'
+        'stage="admission"} 1' in metrics
+    )
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.backend.executor import CombineExecutor, ExecutorSaturated, combine_executor
+from backend.src.backend.main import app
+
+client = TestClient(app)
+
+
+def test_executor_rejects_calls_beyond_its_queue():
+    """One worker plus one queue slot admits two calls and rejects the third."""
+    executor = CombineExecutor(workers=1, queue_size=1, name="test")
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert (executor.active, executor.queued) == (1, 1)
+        assert executor.saturation == 1.0
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: "rejected")
+        release.set()
+        return await running, await queued
+
+    try:
+        assert asyncio.run(scenario()) == (True, "queued")
+    finally:
+        release.set()
+        executor.shutdown()
+    assert (executor.active, executor.queued) == (0, 0)
+
+
+def test_run_when_free_waits_for_a_slot():
+    """Batch work waits while the executor is full instead of being rejected."""
+    executor = CombineExecutor(workers=1, queue_size=0, name="test")
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        waiting = asyncio.ensure_future(executor.run_when_free(lambda: "waited"))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        assert (executor.active, executor.queued) == (1, 0)
+        release.set()
+        return await running, await waiting
+
+    try:
+        assert asyncio.run(scenario()) == (True, "waited")
+    finally:
+        release.set()
+        executor.shutdown()
+    assert (executor.active, executor.queued) == (0, 0)
+
+
+def test_event_loop_keeps_running_during_blocking_work():
+    """Blocking work on the executor does not stall other coroutines."""
+    executor = CombineExecutor(workers=1, queue_size=0, name="test")
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        release.set()
+        return await blocked
+
+    try:
+        assert asyncio.run(scenario()) is True
+    finally:
+        executor.shutdown()
+
+
+def test_combine_folder_returns_503_when_executor_is_saturated(tmp_path, monkeypatch):
+    """A full executor queue is reported as 503 and counted in /metrics."""
+    (tmp_path / "a.txt").write_text("A")
+    monkeypatch.setattr(combine_executor, "queued", combine_executor.capacity)
+
+    response = client.post("/combine-folder/", data={"folder_path": str(tmp_path)})
+
+    assert response.status_code == 503
+    metrics = client.get("/metrics").text
+    assert 'file_combiner_executor_rejected_total{executor="combine"}' in metrics
+    assert 'file_combiner_executor_saturation{executor="combine"} 1' in metrics
@@ -0,0 +1,50 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+from backend.src.backend.main import app
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_combine_folder_job_streams_progress_and_result(tmp_path):
+    """A folder job reports progress over SSE and exposes its result."""
+    (tmp_path / "file1.txt").write_text("Content of file 1.")
+    (tmp_path / "file2.txt").write_text("Content of file 2.")
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/combine-folder/jobs/", data={"folder_path": str(tmp_path)}
+        )
+        assert response.status_code == 202
+        job = response.json()
+
+        events = _parse_sse(client.get(job["events_url"]).text)
+        assert events[0][0] == "progress"
+        assert events[-1][0] == "done"
+        final = events[-1][1]["progress"]
+        assert final["files_matched"] == 2
+        assert final["files_rendered"] == 2
+        assert (final["files_expected"], final["bytes_expected"]) == (2, 36)
+
+        for _ in range(50):
+            result = client.get(job["result_url"])
+            if result.status_code == 200:
+                break
+            time.sleep(0.01)
+        assert result.status_code == 200
+        assert "Content of file 1." in result.text
+
+
+def test_job_endpoints_unknown_job():
+    """Unknown job ids return 404."""
+    with TestClient(app) as client:
+        assert client.get("/jobs/missing/events").status_code == 404
+        assert client.get("/jobs/missing/result").status_code == 404
@@ -1,5 +1,14 @@
+import io
+import json
+import os
+import zipfile
+
+import pytest
 from fastapi.testclient import TestClient
+from backend.src.backend import main
 from backend.src.backend.main import app
+from backend.src.backend.output_store import OutputStore
+from backend.src.shared.folder_index import FolderIndex
 
 client = TestClient(app)
 
@@ -127,4 +136,139 @@ def test_combine_folder_endpoint_invalid_path():
     )
     
     assert response.status_code == 400
-    assert "does not exist or is not a directory" in response.text
\ No newline at end of file
+    assert "does not exist or is not a directory" in response.text
+
+
+def test_combine_folder_endpoint_excerpt(tmp_path):
+    """head_lines and tail_lines keep both ends of each file around a marker."""
+    lines = "".join(f"line {i}\n" for i in range(1, 101))
+    (tmp_path / "long.txt").write_text(lines)
+    data = {"folder_path": str(tmp_path), "head_lines": "2", "tail_lines": "1"}
+
+    response = client.post("/combine-folder/", data=data)
+
+    assert response.status_code == 200
+    omitted = len(lines) - len("line 1\nline 2\n") - len("line 100\n")
+    assert f"line 1\nline 2\n[... {omitted} bytes omitted ...]\nline 100\n" in response.text
+    assert "line 50" not in response.text
+
+    invalid = client.post("/combine-folder/", data=dict(data, tail_lines="-1"))
+    assert invalid.status_code == 400
+
+
+def test_combine_folder_endpoint_unknown_preprocessor(tmp_path):
+    """Unknown preprocessing stage names are rejected before any work starts."""
+    (tmp_path / "a.txt").write_text("a")
+
+    response = client.post(
+        "/combine-folder/",
+        data={"folder_path": str(tmp_path), "preprocessors": "no_such_stage"},
+    )
+
+    assert response.status_code == 400
+    assert "no_such_stage" in response.text
+
+
+def test_combine_folder_endpoint_several_formats(tmp_path):
+    """Several output formats come back as one zip rendered from a single read."""
+    (tmp_path / "a.txt").write_text("alpha  \n")
+    (tmp_path / "b.md").write_text("beta")
+    data = {
+        "folder_path": str(tmp_path),
+        "output_format": "markdown, json",
+        "remove_trailing_whitespace": "true",
+    }
+
+    response = client.post("/combine-folder/", data=data)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert 'filename="combined.zip"' in response.headers["content-disposition"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["combined.md", "combined.json"]
+        markdown = archive.read("combined.md").decode("utf-8")
+        files = json.loads(archive.read("combined.json"))["files"]
+    single = client.post("/combine-folder/", data=dict(data, output_format="markdown"))
+    assert markdown == single.text
+    assert [f["content"] for f in files] == ["alpha\n", "beta"]
+
+    invalid = client.post("/combine-folder/", data=dict(data, output_format="markdown pdf"))
+    assert invalid.status_code == 400
+
+
+def test_folder_preview_endpoint_uses_folder_index(tmp_path, monkeypatch):
+    """The preview and folder combines are answered from the folder index."""
+    folder = tmp_path / "folder"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "a.txt").write_text("one\ntwo\n")
+    (folder / "sub" / "b.md").write_text("beta")
+    data = {"folder_path": str(folder)}
+
+    monkeypatch.setattr(main, "folder_index", None)
+    assert client.post("/folder-preview/", data=data).status_code == 403
+    without_index = client.post("/combine-folder/", data=data).text
+
+    index = FolderIndex(str(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(main, "folder_index", index)
+    try:
+        response = client.post("/folder-preview/", data=data)
+        assert response.status_code == 200
+        preview = response.json()
+        assert preview["file_count"] == 2
+        assert preview["total_bytes"] == 12
+        assert preview["total_lines"] == 3
+        assert [f["name"] for f in preview["files"]] == ["a.txt", "sub/b.md"]
+        assert not preview["files"][0]["binary"]
+
+        assert client.post("/combine-folder/", data=data).text == without_index
+        assert index.refresh(str(folder)).dirs_listed == 0
+    finally:
+        index.close()
+
+
+def test_combine_folder_endpoint_symlinks(tmp_path):
+    """Link loops are walked once and follow_symlinks=false skips links."""
+    folder = tmp_path / "folder"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "a.txt").write_text("alpha")
+    (tmp_path / "outside.txt").write_text("outside")
+    try:
+        os.symlink(str(folder), str(folder / "sub" / "loop"))
+        os.symlink(str(tmp_path / "outside.txt"), str(folder / "linked.txt"))
+    except (OSError, NotImplementedError):
+        pytest.skip("symbolic links are not supported here")
+
+    followed = client.post("/combine-folder/", data={"folder_path": str(folder)})
+    skipped = client.post(
+        "/combine-folder/",
+        data={"folder_path": str(folder), "follow_symlinks": "false"},
+    )
+
+    assert followed.status_code == 200
+    assert followed.text.count("alpha") == 1
+    assert "outside" in followed.text
+    assert skipped.status_code == 200
+    assert "alpha" in skipped.text
+    assert "outside" not in skipped.text
+
+
+def test_folder_index_sees_files_edited_in_place(tmp_path, monkeypatch):
+    """An append that leaves the directory mtime alone still misses the store."""
+    folder = tmp_path / "folder"
+    folder.mkdir()
+    (folder / "a.txt").write_text("original\n")
+    index = FolderIndex(str(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(main, "folder_index", index)
+    monkeypatch.setattr(main, "output_store", OutputStore(str(tmp_path / "store"), 2**20))
+    data = {"folder_path": str(folder)}
+    try:
+        first = client.post("/combine-folder/", data=data)
+        with open(folder / "a.txt", "a") as f:
+            f.write("appended v2\n")
+        second = client.post("/combine-folder/", data=data)
+    finally:
+        index.close()
+
+    assert first.status_code == second.status_code == 200
+    assert "X-Combine-Cache" not in second.headers
+    assert "appended v2" in second.text
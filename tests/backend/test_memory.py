@@ -0,0 +1,58 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.backend.main import app
+from tests.memory_helpers import assert_peak_within, generate_corpus, measure_peak
+
+client = TestClient(app)
+
+# Peak allocations relative to the input size, for the whole request as seen
+# through the test client: reading or receiving the files, combining, encoding
+# the response and the client's copy of the body.
+FOLDER_PEAK_LIMITS = {"markdown": 4.0, "json": 4.25, "yaml": 8.5}
+UPLOAD_PEAK_LIMITS = {"markdown": 6.5, "json": 6.75, "yaml": 11.0}
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    root = tmp_path_factory.mktemp("corpus")
+    size = generate_corpus(root)
+    # First requests import and initialise lazily loaded modules
+    warmup = tmp_path_factory.mktemp("warmup")
+    (warmup / "a.txt").write_text("a")
+    for output_format in FOLDER_PEAK_LIMITS:
+        data = {"output_format": output_format}
+        client.post("/combine-folder/", data=dict(data, folder_path=str(warmup)))
+        client.post("/combine/", data=data, files=[("files", ("a.txt", b"a"))])
+    return root, size
+
+
+@pytest.mark.parametrize("output_format", ["markdown", "json", "yaml"])
+def test_combine_folder_peak_memory_is_bounded(corpus, output_format):
+    """The folder endpoint stays within its peak-allocation budget."""
+    root, size = corpus
+    data = {"folder_path": str(root), "output_format": output_format}
+
+    measurement = measure_peak(lambda: client.post("/combine-folder/", data=data))
+
+    assert measurement.result.status_code == 200
+    assert_peak_within(
+        measurement, size, FOLDER_PEAK_LIMITS[output_format], output_format
+    )
+
+
+@pytest.mark.parametrize("output_format", ["markdown", "json", "yaml"])
+def test_combine_upload_peak_memory_is_bounded(corpus, output_format):
+    """The upload endpoint stays within its peak-allocation budget."""
+    root, size = corpus
+    files = [
+        ("files", (path.name, path.read_bytes(), "text/plain"))
+        for path in sorted(root.rglob("*.txt"))
+    ]
+    data = {"output_format": output_format}
+
+    measurement = measure_peak(lambda: client.post("/combine/", data=data, files=files))
+
+    assert measurement.result.status_code == 200
+    assert_peak_within(
+        measurement, size, UPLOAD_PEAK_LIMITS[output_format], output_format
+    )
@@ -0,0 +1,54 @@
+from fastapi.testclient import TestClient
+from backend.src.backend.main import app
+from backend.src.backend.metrics import Counter, Histogram, MetricsRegistry
+
+client = TestClient(app)
+
+
+def test_registry_renders_text_exposition_format():
+    """Counters and histograms render in the Prometheus text format."""
+    registry = MetricsRegistry()
+    counter = Counter("demo_total", "Demo counter.", ["kind"], registry=registry)
+    histogram = Histogram(
+        "demo_seconds", "Demo histogram.", buckets=(0.1, 1.0), registry=registry
+    )
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = registry.render()
+
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{kind="a"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+    assert "demo_seconds_sum 5.55" in text
+
+
+def test_metrics_endpoint_exposes_request_and_stage_metrics(tmp_path):
+    """A folder combine shows up in request, stage and byte metrics."""
+    (tmp_path / "file1.txt").write_text("Content of file 1.")
+
+    response = client.post(
+        "/combine-folder/",
+        data={"folder_path": str(tmp_path), "output_format": "json"},
+    )
+    assert response.status_code == 200
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = metrics.text
+    assert (
+        'file_combiner_requests_total{endpoint="combine_folder_endpoint",'
+        'output_format="json",status="200"}'
+    ) in text
+    for stage in ("scan", "read", "decode", "sort", "render"):
+        assert f'file_combiner_stage_duration_seconds_count{{stage="{stage}"}}' in text
+    assert 'file_combiner_bytes_in_total{endpoint="combine_folder_endpoint"}' in text
+    assert 'file_combiner_bytes_out_total{endpoint="combine_folder_endpoint"}' in text
+    assert "file_combiner_requests_in_flight 1" in text
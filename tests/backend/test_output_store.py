@@ -0,0 +1,222 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.backend import main
+from backend.src.backend.output_store import OutputStore, parse_range
+from tests.memory_helpers import generate_corpus, measure_peak
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = OutputStore(str(tmp_path / "store"), 1024 * 1024)
+    monkeypatch.setattr(main, "output_store", store)
+    return store
+
+
+def _stored_files(store):
+    return sorted(name for name in os.listdir(store.root) if name.endswith(".out"))
+
+
+def test_least_recently_used_output_is_evicted(tmp_path):
+    """Going over the cap deletes the output that was used longest ago."""
+    store = OutputStore(str(tmp_path), max_bytes=10)
+    store.put("a", b"aaaa")
+    store.put("b", b"bbbb")
+    store.open("a").file.close()
+    store.put("c", b"cccc")
+
+    assert store.open("b") is None
+    assert store.total_bytes == 8
+    assert len(_stored_files(store)) == 2
+    stored = store.open("a")
+    with stored.file:
+        assert stored.file.read() == b"aaaa"
+    # Outputs larger than the whole store are not written at all
+    assert store.put("d", b"d" * 11) is False
+
+
+def test_outputs_survive_restart(tmp_path):
+    """A new store over the same directory adopts the files already there."""
+    OutputStore(str(tmp_path), 100).put("key", b"content")
+
+    reopened = OutputStore(str(tmp_path), 100)
+
+    stored = reopened.open("key")
+    with stored.file:
+        assert (stored.size, stored.file.read()) == (7, b"content")
+
+
+def test_outputs_of_other_code_are_discarded(tmp_path):
+    """After an upgrade the store neither serves nor keeps old outputs."""
+    OutputStore(str(tmp_path), 100, version="old").put("key", b"content")
+
+    upgraded = OutputStore(str(tmp_path), 100, version="new")
+
+    assert upgraded.open("key") is None
+    assert upgraded.total_bytes == 0
+    assert _stored_files(upgraded) == []
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-3", (0, 3)),
+        ("bytes=5-", (5, 9)),
+        ("bytes=-4", (6, 9)),
+        ("bytes=2-100", (2, 9)),
+        ("bytes=0-1,4-5", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_range(header, expected):
+    """Single byte ranges are parsed; anything else means the whole file."""
+    assert parse_range(header, 10) == expected
+
+
+def test_parse_range_rejects_unsatisfiable_ranges():
+    with pytest.raises(ValueError):
+        parse_range("bytes=10-", 10)
+
+
+def test_repeated_folder_request_is_served_from_store(tmp_path, store):
+    """The second identical request is a store hit with the same body."""
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "a.txt").write_text("hello")
+    data = {"folder_path": str(folder)}
+
+    first = client.post("/combine-folder/", data=data)
+    second = client.post("/combine-folder/", data=data)
+
+    assert first.status_code == second.status_code == 200
+    assert "x-combine-cache" not in first.headers
+    assert second.headers["x-combine-cache"] == "hit"
+    assert second.text == first.text
+    assert second.headers["etag"] == first.headers["etag"]
+    assert len(_stored_files(store)) == 1
+
+    # Changing a file in the folder produces a new output
+    (folder / "a.txt").write_text("hello again")
+    third = client.post("/combine-folder/", data=data)
+    assert "x-combine-cache" not in third.headers
+    assert "hello again" in third.text
+
+
+def test_range_requests_resume_stored_output(tmp_path, store):
+    """Stored outputs answer Range requests with 206 and the requested bytes."""
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "a.txt").write_text("x" * 1000)
+    data = {"folder_path": str(folder)}
+    full = client.post("/combine-folder/", data=data).content
+
+    partial = client.post("/combine-folder/", data=data, headers={"Range": "bytes=100-"})
+    assert partial.status_code == 206
+    assert partial.content == full[100:]
+    assert partial.headers["content-range"] == f"bytes 100-{len(full) - 1}/{len(full)}"
+
+    stale = client.post(
+        "/combine-folder/", data=data, headers={"Range": "bytes=0-9", "If-Range": '"x"'}
+    )
+    assert (stale.status_code, stale.content) == (200, full)
+
+    outside = client.post(
+        "/combine-folder/", data=data, headers={"Range": f"bytes={len(full)}-"}
+    )
+    assert outside.status_code == 416
+    assert outside.headers["content-range"] == f"bytes */{len(full)}"
+
+
+def test_store_hit_does_not_hold_output_in_memory(tmp_path, store):
+    """Serving from the store allocates little beyond the client's copy of the body."""
+    generate_corpus(tmp_path / "corpus", file_count=40, median_size=16384)
+    data = {"folder_path": str(tmp_path / "corpus")}
+    output_size = len(client.post("/combine-folder/", data=data).content)
+
+    measurement = measure_peak(lambda: client.post("/combine-folder/", data=data))
+
+    assert measurement.result.headers["x-combine-cache"] == "hit"
+    # The test client buffers the whole body once; the server adds only chunks
+    assert measurement.peak_bytes <= 1.5 * output_size + 512 * 1024
+
+
+def test_markdown_section_is_served_through_the_index(tmp_path, store):
+    """A single file's section is read from the stored output via its index."""
+    folder = tmp_path / "docs"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "a.md").write_text("first file")
+    (folder / "sub" / "b.md").write_text("второй файл")
+    combined = client.post("/combine-folder/", data={"folder_path": str(folder)})
+    output_id = combined.headers["x-combine-output-id"]
+
+    listing = client.get(f"/outputs/{output_id}/sections")
+    assert listing.status_code == 200
+    sections = {s["name"]: s for s in listing.json()["sections"]}
+    assert set(sections) == {"a.md", os.path.join("sub", "b.md")}
+
+    section = client.get(f"/outputs/{output_id}/sections/sub/b.md")
+    assert section.status_code == 200
+    entry = sections[os.path.join("sub", "b.md")]
+    document = combined.content
+    assert section.content == document[entry["offset"] : entry["offset"] + entry["length"]]
+    assert section.text.startswith("## sub/b.md\n")
+    assert section.text.endswith("второй файл")
+    assert section.headers["etag"] == f'"{entry["sha256"]}"'
+
+    partial = client.get(
+        f"/outputs/{output_id}/sections/a.md", headers={"Range": "bytes=0-1"}
+    )
+    assert (partial.status_code, partial.content) == (206, b"##")
+
+
+def test_unknown_outputs_and_sections_are_404(tmp_path, store):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "a.md").write_text("a")
+    data = {"folder_path": str(folder), "output_format": "json"}
+    output_id = client.post("/combine-folder/", data=data).headers["x-combine-output-id"]
+
+    # JSON outputs have no section index
+    assert client.get(f"/outputs/{output_id}/sections").status_code == 404
+    assert client.get("/outputs/../sections").status_code == 404
+    assert client.get(f"/outputs/{'0' * 64}/sections/a.md").status_code == 404
+
+
+def test_markdown_is_copied_into_store_without_decoding(tmp_path, store, monkeypatch):
+    """Plain markdown is written straight into the store and matches the text path."""
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "a.txt").write_bytes("привет\n\n\n\nмир\n".encode("utf-8"))
+    (folder / "b.txt").write_bytes(b"crlf\r\nline\r\n")
+    data = {"folder_path": str(folder)}
+
+    response = client.post("/combine-folder/", data=data)
+    # The same combine with the store disabled goes through the text path
+    monkeypatch.setattr(main, "output_store", OutputStore(str(tmp_path / "off"), 0))
+    expected = client.post("/combine-folder/", data=data)
+
+    assert response.status_code == expected.status_code == 200
+    assert "x-combine-output-id" in response.headers
+    assert response.content == expected.content
+    index = store.section_index(response.headers["x-combine-output-id"])
+    assert sorted(index) == ["a.txt", "b.txt"]
+
+
+def test_output_larger_than_store_falls_back_to_memory(tmp_path, monkeypatch):
+    """A streamed output that cannot fit is dropped and served from memory."""
+    store = OutputStore(str(tmp_path / "store"), 64)
+    monkeypatch.setattr(main, "output_store", store)
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "a.txt").write_text("x" * 200)
+
+    response = client.post("/combine-folder/", data={"folder_path": str(folder)})
+
+    assert response.status_code == 200
+    assert "x" * 200 in response.text
+    assert "x-combine-output-id" not in response.headers
+    assert _stored_files(store) == []
@@ -0,0 +1,78 @@
+from fastapi.testclient import TestClient
+from backend.src.backend import profiling
+from backend.src.backend.config import settings
+from backend.src.backend.main import app
+
+client = TestClient(app)
+
+
+def _folder(tmp_path):
+    (tmp_path / "file1.txt").write_text("Content of file 1.")
+    return str(tmp_path)
+
+
+def test_combine_folder_returns_server_timing_header(tmp_path):
+    """Stage durations are reported in the Server-Timing header."""
+    response = client.post("/combine-folder/", data={"folder_path": _folder(tmp_path)})
+
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    for stage in ("scan", "read", "decode", "sort", "render", "total"):
+        assert f"{stage};dur=" in timing
+
+
+def test_combine_files_returns_server_timing_header():
+    """The upload endpoint reports its stages too."""
+    response = client.post(
+        "/combine/", files=[("files", ("a.txt", "A", "text/plain"))]
+    )
+
+    assert response.status_code == 200
+    assert "decode;dur=" in response.headers["server-timing"]
+
+
+def test_debug_profile_is_rejected_when_disabled(tmp_path, monkeypatch):
+    """Profiling is opt-in through configuration."""
+    monkeypatch.setattr(settings, "enable_debug_profile", False)
+
+    response = client.post(
+        "/combine-folder/",
+        data={"folder_path": _folder(tmp_path), "debug_profile": "true"},
+    )
+
+    assert response.status_code == 403
+
+
+def test_debug_profile_returns_hottest_functions(tmp_path, monkeypatch):
+    """With profiling enabled the endpoint returns a JSON profile report."""
+    monkeypatch.setattr(settings, "enable_debug_profile", True)
+    monkeypatch.setattr(settings, "debug_profile_top", 5)
+
+    response = client.post(
+        "/combine-folder/",
+        data={"folder_path": _folder(tmp_path), "debug_profile": "true"},
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert "Content of file 1." in report["result"]
+    assert set(report["server_timing_ms"]) >= {"scan", "read", "render"}
+    assert 0 < len(report["profile"]) <= 5
+    assert {"function", "calls", "own_ms", "cumulative_ms"} <= set(report["profile"][0])
+
+
+def test_debug_profile_is_skipped_while_another_profile_runs(tmp_path, monkeypatch):
+    """A request arriving during another profile is served without a report."""
+    monkeypatch.setattr(settings, "enable_debug_profile", True)
+
+    with profiling._profile_lock:
+        response = client.post(
+            "/combine-folder/",
+            data={"folder_path": _folder(tmp_path), "debug_profile": "true"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["x-debug-profile"] == "skipped"
+    report = response.json()
+    assert report["profile"] is None
+    assert "Content of file 1." in report["result"]
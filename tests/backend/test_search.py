@@ -0,0 +1,79 @@
+import os
+
+from fastapi.testclient import TestClient
+from backend.src.backend.main import app
+
+client = TestClient(app)
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_search_endpoint_returns_files_and_snippets(tmp_path):
+    """The search endpoint lists matching files with their matching lines."""
+    _write(str(tmp_path / "a.py"), "x = 1\ndef target():\n    pass\n")
+    _write(str(tmp_path / "b.py"), "y = 2\n")
+
+    response = client.post(
+        "/search/", data={"folder_path": str(tmp_path), "query": "def target"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["indexed_files"] == 2
+    assert body["files"] == [
+        {"name": "a.py", "matches": [{"line": 2, "text": "def target():"}]}
+    ]
+
+
+def test_search_endpoint_rejects_invalid_regex(tmp_path):
+    response = client.post(
+        "/search/", data={"folder_path": str(tmp_path), "query": "(", "regex": "true"}
+    )
+    assert response.status_code == 400
+
+
+def test_combine_folder_restricted_to_search_matches(tmp_path):
+    """A combine with search_query only includes the files matching it."""
+    _write(str(tmp_path / "a.txt"), "keep this one")
+    _write(str(tmp_path / "sub" / "b.txt"), "KEEP this too")
+    _write(str(tmp_path / "c.txt"), "drop")
+    data = {"folder_path": str(tmp_path), "search_query": "keep"}
+
+    response = client.post("/combine-folder/", data=data)
+    assert response.status_code == 200
+    assert "## a.txt" in response.text
+    assert "## c.txt" not in response.text
+    assert "b.txt" not in response.text
+
+    response = client.post(
+        "/combine-folder/", data=dict(data, search_ignore_case="true")
+    )
+    assert "## sub/b.txt" in response.text.replace(os.sep, "/")
+    assert "## c.txt" not in response.text
+
+
+def test_combine_folder_content_patterns(tmp_path):
+    """content_pattern and content_exclude_pattern select files by content."""
+    _write(str(tmp_path / "a.txt"), "alpha beta")
+    _write(str(tmp_path / "b.txt"), "alpha gamma")
+    _write(str(tmp_path / "c.txt"), "delta")
+    data = {
+        "folder_path": str(tmp_path),
+        "content_pattern": "alpha",
+        "content_exclude_pattern": "gam+a",
+        "content_regex": "true",
+    }
+
+    response = client.post("/combine-folder/", data=data)
+
+    assert response.status_code == 200
+    assert "## a.txt" in response.text
+    assert "## b.txt" not in response.text
+    assert "## c.txt" not in response.text
+
+    invalid = client.post("/combine-folder/", data=dict(data, content_pattern="("))
+    assert invalid.status_code == 400
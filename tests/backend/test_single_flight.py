@@ -0,0 +1,165 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.backend import main, single_flight
+from backend.src.backend.single_flight import SingleFlight
+from backend.src.shared.scan_logic import directory_manifest
+
+CancellationToken = single_flight.CancellationToken
+OperationCancelled = single_flight.OperationCancelled
+
+
+def test_identical_concurrent_calls_share_one_computation():
+    """Only the first caller computes; the others get the same result object."""
+    flights = SingleFlight("test", poll_interval=0.01)
+    calls = []
+
+    async def compute(token):
+        calls.append(token)
+        await asyncio.sleep(0.05)
+        return bytearray(b"result")
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("key", compute) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True]
+    assert all(result is results[0][0] for result, _ in results)
+    assert flights.in_progress == 0
+
+
+def test_cancelled_waiter_does_not_cancel_shared_computation():
+    """A waiter whose client left stops waiting while the others get the result."""
+    flights = SingleFlight("test", poll_interval=0.01)
+    leaving = CancellationToken()
+    tokens = []
+
+    async def compute(token):
+        tokens.append(token)
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def scenario():
+        staying = asyncio.ensure_future(flights.run("key", compute))
+        left = asyncio.ensure_future(flights.run("key", compute, leaving))
+        await asyncio.sleep(0.02)
+        leaving.cancel()
+        with pytest.raises(OperationCancelled) as exc_info:
+            await left
+        return await staying, exc_info.value
+
+    (result, shared), error = asyncio.run(scenario())
+
+    assert (result, shared) == ("done", False)
+    assert error.stage == "coalesced"
+    assert not tokens[0].cancelled
+
+
+def test_computation_is_cancelled_when_every_waiter_leaves():
+    """The shared token trips only once nobody waits for the result."""
+    flights = SingleFlight("test", poll_interval=0.01)
+    first, second = CancellationToken(), CancellationToken()
+    tokens = []
+
+    async def compute(token):
+        tokens.append(token)
+        while not token.cancelled:
+            await asyncio.sleep(0.01)
+        token.raise_if_cancelled("render")
+
+    async def scenario():
+        waiters = [
+            asyncio.ensure_future(flights.run("key", compute, token))
+            for token in (first, second)
+        ]
+        await asyncio.sleep(0.02)
+        first.cancel()
+        await asyncio.sleep(0.03)
+        assert not tokens[0].cancelled
+        second.cancel()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0.03)
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, OperationCancelled) for r in results)
+    assert tokens[0].cancelled
+    assert flights.in_progress == 0
+
+
+def test_late_caller_does_not_join_a_cancelled_computation():
+    """A caller arriving after everyone left gets a fresh computation."""
+    flights = SingleFlight("test", poll_interval=0.01)
+    leaving = CancellationToken()
+    tokens = []
+
+    async def compute(token):
+        tokens.append(token)
+        # Like a render step that checks the token only between files
+        await asyncio.sleep(0.1)
+        token.raise_if_cancelled("render")
+        return "done"
+
+    async def scenario():
+        left = asyncio.ensure_future(flights.run("key", compute, leaving))
+        await asyncio.sleep(0.02)
+        leaving.cancel()
+        with pytest.raises(OperationCancelled):
+            await left
+        return await flights.run("key", compute, CancellationToken())
+
+    assert asyncio.run(scenario()) == ("done", False)
+    assert len(tokens) == 2
+    assert tokens[0].cancelled and not tokens[1].cancelled
+    assert flights.in_progress == 0
+
+
+def test_manifest_fingerprint_tracks_file_changes(tmp_path):
+    """Changing a file's mtime changes the fingerprint; rescans do not."""
+    path = tmp_path / "a.txt"
+    path.write_text("one")
+    (tmp_path / "b.md").write_text("two")
+
+    before = directory_manifest(str(tmp_path))
+    assert before == directory_manifest(str(tmp_path))
+    assert (before.file_count, before.total_bytes) == (2, 6)
+    assert directory_manifest(str(tmp_path), extensions=[".md"]).file_count == 1
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert directory_manifest(str(tmp_path)).fingerprint != before.fingerprint
+
+
+def test_endpoint_coalesces_identical_folder_requests(tmp_path, monkeypatch):
+    """Two identical concurrent requests trigger a single combine."""
+    (tmp_path / "a.txt").write_text("hello")
+    calls = []
+    original = main._combine_folder
+
+    def slow_combine(*args, **kwargs):
+        calls.append(args)
+        time.sleep(0.3)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(main, "_combine_folder", slow_combine)
+    with TestClient(main.app) as client:
+
+        def post(_):
+            return client.post("/combine-folder/", data={"folder_path": str(tmp_path)})
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            responses = list(pool.map(post, range(2)))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert "hello" in responses[0].text
+    assert responses[0].text == responses[1].text
+    assert len(calls) == 1
+    coalesced = [r.headers.get("x-combine-coalesced") for r in responses]
+    assert sorted(coalesced, key=str) == ["1", None]
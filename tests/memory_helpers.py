@@ -0,0 +1,96 @@
+"""
+Helpers for the peak-memory regression tests.
+
+``measure_peak`` runs a callable under ``tracemalloc`` and reports the peak of
+memory allocated during the call, excluding whatever was already allocated
+before it. ``assert_peak_within`` compares that peak with a multiple of the
+input size and, when the bound is exceeded, fails with the top allocation sites
+so the regression can be located without re-running under a profiler.
+"""
+
+import random
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, List
+
+WORDS = "alpha beta gamma delta combine folder render scan index value result".split()
+
+
+@dataclass
+class PeakMeasurement:
+    result: Any
+    peak_bytes: int
+    top_sites: List[str]
+
+
+def generate_corpus(
+    root: Path,
+    file_count: int = 30,
+    median_size: int = 4096,
+    blank_line_density: float = 0.15,
+    seed: int = 42,
+) -> int:
+    """Writes a deterministic ASCII corpus under ``root`` and returns its size in bytes.
+
+    Files contain indented lines, trailing spaces, blank lines (runs of them
+    unless ``blank_line_density`` is 0) and, for every fifth file, CRLF line
+    endings, so all preprocessing paths do work.
+    """
+    rng = random.Random(seed)
+    total = 0
+    for index in range(file_count):
+        directory = root / f"dir_{index % 4}" if index % 3 else root
+        directory.mkdir(parents=True, exist_ok=True)
+        newline = "\r\n" if index % 5 == 0 else "\n"
+        size = int(rng.lognormvariate(0, 0.5) * median_size)
+        lines = []
+        written = 0
+        while written < size:
+            if rng.random() < blank_line_density:
+                line = ""
+            else:
+                words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+                line = " " * (4 * rng.randint(0, 3)) + words + " " * rng.randint(0, 2)
+            lines.append(line)
+            written += len(line) + len(newline)
+        body = (newline.join(lines) + newline).encode("ascii")
+        (directory / f"file_{index:03d}.txt").write_bytes(body)
+        total += len(body)
+    return total
+
+
+def measure_peak(func: Callable[[], Any], top: int = 10) -> PeakMeasurement:
+    """Runs ``func`` under tracemalloc; the peak excludes memory allocated before.
+
+    ``top_sites`` lists the source lines holding the most memory right after the
+    call returns (tracemalloc cannot snapshot the moment of the peak itself).
+    """
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+    finally:
+        tracemalloc.stop()
+    sites = [str(stat) for stat in snapshot.statistics("lineno")[:top]]
+    return PeakMeasurement(result, peak - baseline, sites)
+
+
+def assert_peak_within(
+    measurement: PeakMeasurement, input_bytes: int, ratio: float, label: str
+) -> None:
+    """Fails if the peak exceeds ``ratio`` times ``input_bytes``."""
+    limit = input_bytes * ratio
+    if measurement.peak_bytes > limit:
+        sites = "\n".join(f"  {site}" for site in measurement.top_sites)
+        raise AssertionError(
+            f"{label}: peak allocation {measurement.peak_bytes} bytes is "
+            f"{measurement.peak_bytes / input_bytes:.2f}x the input "
+            f"({input_bytes} bytes), limit is {ratio}x.\n"
+            f"Top allocation sites after the call:\n{sites}"
+        )
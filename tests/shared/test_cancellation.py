@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from backend.src.shared.cancellation import CancellationToken, OperationCancelled
+from backend.src.shared.combine_logic import combine_files_content
+from backend.src.shared.progress import ProgressTracker
+from backend.src.shared.scan_logic import scan_directory
+
+
+class CancelAfterFirstRead(ProgressTracker):
+    def __init__(self, token):
+        super().__init__()
+        self.token = token
+
+    def file_read(self, size):
+        super().file_read(size)
+        self.token.cancel()
+
+
+def test_scan_stops_at_next_file_after_cancel(tmp_path):
+    """Отмена во время чтения прерывает обход перед следующим файлом."""
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text(name)
+    token = CancellationToken()
+    progress = CancelAfterFirstRead(token)
+
+    with pytest.raises(OperationCancelled) as excinfo:
+        scan_directory(str(tmp_path), progress=progress, cancel=token)
+
+    assert excinfo.value.stage == "read"
+    assert progress.files_matched == 1
+
+
+@pytest.mark.parametrize("output_format", ["markdown", "json", "yaml"])
+def test_combine_checks_token_before_rendering(output_format):
+    """Отменённый токен прерывает рендеринг в любом формате."""
+    token = CancellationToken()
+    token.cancel()
+    files = [{"name": "a.txt", "content": "A", "last_modified": datetime.now()}]
+
+    with pytest.raises(OperationCancelled) as excinfo:
+        combine_files_content(files, output_format=output_format, cancel=token)
+
+    assert excinfo.value.stage == "render"
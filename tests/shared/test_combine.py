@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from backend.src.shared.combine import folder_prefixes, main
+
+
+@pytest.fixture
+def folders(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    (docs / "a.md").write_text("# A  \n")
+    (docs / "sub" / "b.txt").write_text("b")
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "main.py").write_text("print(1)\n")
+    return docs, src
+
+
+def test_markdown_from_several_folders(folders, tmp_path):
+    """Несколько папок дают один документ с именами от общего родителя."""
+    docs, src = folders
+    output = tmp_path / "out.md"
+
+    assert main([str(docs), str(src), "-o", str(output)]) == 0
+
+    text = output.read_text(encoding="utf-8")
+    assert "1. [docs/a.md](#docsa-md)" in text
+    assert "## docs/sub/b.txt\n" in text
+    assert "## src/main.py\n" in text
+
+
+def test_json_with_preprocessing_and_parallel_reads(folders, capsys):
+    """Опции совпадают с /combine-folder/; без -o результат идёт в stdout."""
+    docs, _ = folders
+
+    code = main(
+        [str(docs), "--output-format", "json", "--remove-trailing-whitespace", "-j", "4"]
+    )
+
+    assert code == 0
+    files = json.loads(capsys.readouterr().out)["files"]
+    assert [(f["name"], f["content"]) for f in files] == [
+        ("a.md", "# A\n"),
+        ("sub/b.txt", "b"),
+    ]
+
+
+def test_invalid_options_exit_with_usage_error(folders, tmp_path):
+    docs, _ = folders
+    with pytest.raises(SystemExit) as missing:
+        main([str(tmp_path / "missing")])
+    with pytest.raises(SystemExit) as unknown:
+        main([str(docs), "--preprocessors", "no_such_stage"])
+
+    assert missing.value.code == unknown.value.code == 2
+
+
+def test_folder_prefixes():
+    assert folder_prefixes(["/data/one"]) == [""]
+    assert folder_prefixes(["/data/one", "/data/two"]) == ["one", "two"]
+    assert folder_prefixes(["/data/one", "/data/one/inner"]) == ["one", "one/inner"]
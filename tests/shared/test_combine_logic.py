@@ -1,5 +1,7 @@
+import hashlib
 from datetime import datetime
-from backend.src.shared.combine_logic import combine_files_content, preprocess_content
+from backend.src.shared.combine_logic import FileCorpus, combine_files_content, preprocess_content
+from backend.src.shared.stats import CombineStats
 
 
 def test_combine_files_content_basic():
@@ -188,4 +190,87 @@ def test_preprocess_content_combined():
     result = preprocess_content(content, options)
     
     expected = "Line 1\n\nLine 2\nLine 3\n\n"
-    assert result == expected
\ No newline at end of file
+    assert result == expected
+
+
+
+def test_preprocess_content_strip_comments_in_same_pass():
+    """Удаление комментариев вместе с остальными построчными преобразованиями."""
+    content = "x = 1  # один\r\n\r\n\r\n# строка\r\ny = 2\t\r\n"
+    options = {
+        'strip_comments': True,
+        'normalize_line_endings': True,
+        'remove_trailing_whitespace': True,
+        'remove_extra_empty_lines': True,
+    }
+
+    assert preprocess_content(content, options, "a.py") == "x = 1\n\ny = 2\n"
+    # Без имени файла язык неизвестен, комментарии остаются
+    assert preprocess_content(content, {'strip_comments': True}) == content
+
+
+def test_section_index_points_at_each_file_section():
+    """Индекс разделов даёт точные байтовые смещения даже с кириллицей и схлопыванием пустых строк."""
+    file_data_list = [
+        {
+            'name': 'б.md',
+            'content': '\n\n\nПривет,\n\n\n\nмир\n\n\n',
+            'last_modified': datetime(2023, 10, 27, 10, 0, 0)
+        },
+        {
+            'name': 'a.txt',
+            'content': 'plain',
+            'last_modified': datetime(2023, 10, 27, 11, 0, 0)
+        },
+    ]
+    index = []
+
+    result = combine_files_content(file_data_list, sort_mode='name', section_index=index)
+
+    document = result.encode('utf-8')
+    assert [entry['name'] for entry in index] == ['a.txt', 'б.md']
+    for entry in index:
+        section = document[entry['offset']:entry['offset'] + entry['length']]
+        assert section.decode('utf-8').startswith(f"## {entry['name']}\n")
+        assert hashlib.sha256(section).hexdigest() == entry['sha256']
+    assert index[0]['anchor'] == 'a-txt'
+    assert document[index[1]['offset']:].decode('utf-8').split('\n\n---')[0].endswith('мир')
+
+
+def test_combine_does_not_modify_caller_data():
+    """Предобработка и сортировка не меняют переданные словари и список."""
+    file_data_list = [
+        {'name': 'b.txt', 'content': 'b  \n\n\n\nend', 'last_modified': datetime(2023, 10, 27)},
+        {'name': 'a.txt', 'content': 'a', 'last_modified': datetime(2023, 10, 28)},
+    ]
+    snapshot = [dict(f) for f in file_data_list]
+
+    combine_files_content(
+        file_data_list,
+        sort_mode='name',
+        preprocessing_options={'remove_trailing_whitespace': True, 'remove_extra_empty_lines': True},
+    )
+
+    assert file_data_list == snapshot
+
+
+def test_corpus_preprocesses_once_per_option_set():
+    """Несколько форматов из одного корпуса: каждый файл обрабатывается один раз."""
+    corpus = FileCorpus([
+        {'name': 'a.txt', 'content': 'a  \nb  ', 'last_modified': datetime(2023, 10, 27)},
+        {'name': 'b.md', 'content': 'c  ', 'last_modified': datetime(2023, 10, 28)},
+    ])
+    options = {'remove_trailing_whitespace': True}
+    stats = CombineStats()
+
+    markdown = corpus.render(preprocessing_options=options, stats=stats)
+    as_json = corpus.render(preprocessing_options=options, output_format='json', stats=stats)
+    only_md = corpus.render(extensions=['.md'], preprocessing_options=options, stats=stats)
+    raw = corpus.render()
+
+    assert 'a\nb' in markdown and '"content": "a\\nb"' in as_json
+    assert 'b.md' in only_md and 'a.txt' not in only_md
+    assert 'a  \nb  ' in raw
+    # Обработанные файлы запоминаются и переиспользуются
+    assert corpus.preprocessed([0, 1], options)[0] is corpus.preprocessed([0], options)[0]
+    assert stats.counters['files_rendered'] == 5
@@ -0,0 +1,80 @@
+import pytest
+
+from backend.src.shared.comments import strip_comments, supports
+
+
+def test_python_comments_and_docstrings():
+    """В Python удаляются комментарии и докстринги, но не строки с '#'."""
+    source = (
+        "#!/usr/bin/env python\n"
+        '"""Документация модуля."""\n'
+        "import os  # импорт\n"
+        "# отдельная строка\n"
+        "\n"
+        "def f():\n"
+        '    """Единственный оператор тела."""\n'
+        "\n"
+        "def g():\n"
+        '    """Документация."""\n'
+        '    x = "# не комментарий"  # комментарий\n'
+        "    return x\n"
+    )
+
+    assert strip_comments(source, "module.py") == (
+        "#!/usr/bin/env python\n"
+        "import os\n"
+        "\n"
+        "def f():\n"
+        '    """Единственный оператор тела."""\n'
+        "\n"
+        "def g():\n"
+        '    x = "# не комментарий"\n'
+        "    return x\n"
+    )
+
+
+def test_unparsable_python_is_left_unchanged():
+    source = "def f(:\n    # комментарий\n"
+    assert strip_comments(source, "broken.py") == source
+
+
+def test_c_family_comments_keep_strings_and_line_endings():
+    """Блочные и строчные комментарии удаляются, строки и CRLF сохраняются."""
+    source = (
+        "int a; // c\r\n"
+        "/* блок\r\n   на две строки */\r\n"
+        'char *s = "// /* не комментарий */";\r\n'
+        "int b; /* внутри */ int c;\r\n"
+    )
+
+    assert strip_comments(source, "main.c") == (
+        'int a;\r\nchar *s = "// /* не комментарий */";\r\nint b; int c;\r\n'
+    )
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        # Литерал регулярного выражения, а не комментарий
+        ("const r = /\\/\\//g; // c\n", "const r = /\\/\\//g;\n"),
+        ("return /[/*]/.test(s) // c\n", "return /[/*]/.test(s)\n"),
+        # Деление
+        ("const d = a / b / c; // c\n", "const d = a / b / c;\n"),
+        # Шаблонная строка на несколько строк
+        ("let t = `x //\n/* y */`; // c\n", "let t = `x //\n/* y */`;\n"),
+    ],
+)
+def test_javascript_regex_literals_and_templates(source, expected):
+    assert strip_comments(source, "app.ts") == expected
+
+
+def test_go_raw_strings_and_multiline_comments():
+    """Сырая строка Go без экранирования; многострочный комментарий - перевод строки."""
+    source = "s := `C:\\` // путь\nx := 1 /* a\nb */ y := 2\n"
+    assert strip_comments(source, "main.go") == "s := `C:\\`\nx := 1\n y := 2\n"
+
+
+def test_unknown_languages_are_not_touched():
+    assert not supports("notes.md")
+    source = "# Заголовок\n// не код\n"
+    assert strip_comments(source, "notes.md") == source
@@ -0,0 +1,78 @@
+import pytest
+
+from backend.src.shared import content_filter as content_filter_module
+from backend.src.shared.content_filter import ContentFilter
+from backend.src.shared.scan_logic import scan_directory
+from backend.src.shared.stats import CombineStats
+
+
+def _names(files):
+    return sorted(f["name"] for f in files)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    (tmp_path / "a.py").write_text("import os\nTODO: fix\n")
+    (tmp_path / "b.py").write_text("import sys\n")
+    (tmp_path / "c.md").write_bytes(b"# Title\r\nimport os\r\nDEPRECATED\r\n")
+    return tmp_path
+
+
+def test_literal_include_and_exclude(folder):
+    """Подстроки отбирают и исключают файлы по содержимому."""
+    files = scan_directory(str(folder), content_filter=ContentFilter("import os"))
+    assert _names(files) == ["a.py", "c.md"]
+
+    files = scan_directory(
+        str(folder), content_filter=ContentFilter("import", exclude_pattern="DEPRECATED")
+    )
+    assert _names(files) == ["a.py", "b.py"]
+
+
+def test_regex_patterns(folder):
+    """Регулярные выражения проверяются по декодированному тексту."""
+    files = scan_directory(
+        str(folder), content_filter=ContentFilter(r"^import (os|sys)$", regex=True)
+    )
+    assert _names(files) == ["a.py", "b.py", "c.md"]
+
+    files = scan_directory(
+        str(folder), content_filter=ContentFilter(exclude_pattern=r"TODO:\s", regex=True)
+    )
+    assert _names(files) == ["b.py", "c.md"]
+
+
+def test_case_insensitive_regex_is_not_prefiltered_by_case(tmp_path):
+    """Флаг (?i) в выражении не даёт байтовому отбору отбросить файл."""
+    (tmp_path / "a.py").write_text("todo: fix\n")
+    content_filter = ContentFilter("(?i)TODO", regex=True)
+
+    assert content_filter.read(str(tmp_path / "a.py")) is not None
+    assert content_filter.matches_text("todo: fix\n")
+    assert not ContentFilter(exclude_pattern="(?i)TODO", regex=True).matches_text("ToDo")
+
+
+def test_excluded_file_is_abandoned_at_first_chunk(tmp_path, monkeypatch):
+    """Файл с исключающим литералом перестаёт читаться на первом же блоке."""
+    monkeypatch.setattr(content_filter_module, "READ_CHUNK_SIZE", 4)
+    (tmp_path / "big.txt").write_text("SKIP" + "x" * 100)
+    (tmp_path / "edge.txt").write_text("abSK" + "IPcd")
+    stats = CombineStats()
+
+    files = scan_directory(
+        str(tmp_path), content_filter=ContentFilter(exclude_pattern="SKIP"), stats=stats
+    )
+
+    assert files == []
+    assert stats.counters["files_filtered_out"] == 2
+    assert "bytes_read" not in stats.counters
+
+
+def test_filtered_content_matches_unfiltered_read(folder):
+    """Прошедшие фильтр файлы читаются так же, как без фильтра."""
+    plain = {f["name"]: f["content"] for f in scan_directory(str(folder))}
+    filtered = scan_directory(str(folder), content_filter=ContentFilter("os"))
+
+    assert {f["name"]: f["content"] for f in filtered} == {
+        name: plain[name] for name in ("a.py", "c.md")
+    }
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from backend.src.shared import excerpt as excerpt_module
+from backend.src.shared.combine_logic import combine_files_content
+from backend.src.shared.excerpt import Excerpt, omission_marker
+from backend.src.shared.scan_logic import FileText, scan_directory
+from backend.src.shared.stats import CombineStats
+
+LINES = "".join(f"строка {i}\n" for i in range(1, 1001))
+
+
+@pytest.fixture
+def long_file(tmp_path, monkeypatch):
+    # Маленькие блоки, чтобы чтение шло в несколько шагов
+    monkeypatch.setattr(excerpt_module, "BLOCK_SIZE", 64)
+    path = tmp_path / "long.txt"
+    path.write_text(LINES, encoding="utf-8")
+    return str(path)
+
+
+def _expected(head: str, tail: str) -> str:
+    omitted = len(LINES.encode("utf-8")) - len(head.encode("utf-8")) - len(tail.encode("utf-8"))
+    return head + omission_marker(omitted) + "\n" + tail
+
+
+def test_head_lines_stop_reading_early(long_file):
+    """Начало читается только до нужной строки."""
+    stats = CombineStats()
+    file_text = Excerpt(head_lines=3).read(long_file, stats)
+
+    head = "строка 1\nстрока 2\nстрока 3\n"
+    assert file_text.content == _expected(head, "")
+    assert file_text.truncated
+    assert stats.counters["bytes_read"] == len(head.encode("utf-8"))
+    assert stats.counters["files_truncated"] == 1
+
+
+def test_tail_lines_are_read_from_the_end(long_file):
+    """Конец файла читается блоками с конца."""
+    tail = "строка 999\nстрока 1000\n"
+    assert Excerpt(tail_lines=2).read(long_file).content == _expected("", tail)
+
+
+
+def test_tail_without_final_newline(tmp_path):
+    path = tmp_path / "no_newline.txt"
+    path.write_text("первая\nвторая\nхвост", encoding="utf-8")
+
+    content = Excerpt(tail_lines=1).read(str(path)).content
+
+    assert content == omission_marker(len("первая\nвторая\n".encode("utf-8"))) + "\nхвост"
+
+
+def test_head_and_tail_around_marker(long_file):
+    content = Excerpt(head_lines=1, tail_lines=1).read(long_file).content
+    assert content == _expected("строка 1\n", "строка 1000\n")
+
+
+def test_short_file_is_not_truncated(tmp_path):
+    """Если начало и конец перекрываются, файл возвращается целиком."""
+    path = tmp_path / "short.txt"
+    path.write_text("a\nb\nc\n")
+
+    file_text = Excerpt(head_lines=2, tail_lines=2).read(str(path))
+
+    assert (file_text.content, file_text.truncated) == ("a\nb\nc\n", False)
+
+
+def test_max_bytes_does_not_split_characters(long_file):
+    """Ограничение по байтам не разрезает многобайтовый символ."""
+    # "строка" - 12 байт в UTF-8, 7 байт обрезают третью букву посередине
+    content = Excerpt(max_bytes=7).read(long_file).content
+    assert content.startswith("стр\n[... ")
+
+    # 11 последних байт начинаются со второй половины буквы "о"
+    content = Excerpt(tail_lines=1, max_bytes=11).read(long_file).content
+    assert content.endswith(" bytes omitted ...]\nка 1000\n")
+
+
+def test_apply_matches_read(long_file):
+    """Выборка из уже прочитанного текста совпадает с чтением с диска."""
+    excerpt = Excerpt(head_lines=2, tail_lines=3)
+    full = FileText(LINES, 0.0, len(LINES.encode("utf-8")))
+    assert excerpt.apply(full).content == excerpt.read(long_file).content
+
+
+def test_negative_values_are_rejected():
+    with pytest.raises(ValueError):
+        Excerpt(head_lines=-1)
+
+
+def test_truncated_files_are_marked_in_json(long_file, tmp_path):
+    """В JSON у обрезанных файлов есть ключ 'truncated'."""
+    (tmp_path / "short.txt").write_text("short\n")
+    files = scan_directory(str(tmp_path), excerpt=Excerpt(head_lines=5))
+
+    data = json.loads(combine_files_content(files, output_format="json"))
+
+    flags = {f["name"]: f.get("truncated", False) for f in data["files"]}
+    assert flags == {"long.txt": True, "short.txt": False}
@@ -0,0 +1,221 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+from backend.src.shared import folder_index as folder_index_module
+from backend.src.shared.folder_index import FolderIndex
+from backend.src.shared.scan_logic import (
+    directory_manifest,
+    list_folder_files,
+    scan_directory,
+)
+
+
+def _touch_dir(path, offset):
+    """Сдвигает время изменения директории, чтобы изменение было заметно."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset * 1_000_000_000))
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "root"
+    (root / "sub" / "deep").mkdir(parents=True)
+    (root / "other").mkdir()
+    (root / "a.txt").write_text("one\ntwo\n")
+    (root / "b.md").write_text("no trailing newline")
+    (root / "sub" / "c.py").write_text("x = 1\n")
+    (root / "sub" / "deep" / "d.txt").write_text("")
+    (root / "other" / "image.bin").write_bytes(b"\x89PNG\0\0data\n")
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = FolderIndex(str(tmp_path / "index.sqlite"))
+    yield index
+    index.close()
+
+
+def test_refresh_records_file_metadata(folder, index):
+    result = index.refresh(str(folder))
+
+    assert result.dirs_listed == 4
+    assert result.files_hashed == 5
+    files = {f.relative_path: f for f in index.files(str(folder))}
+    assert sorted(files) == sorted(
+        [
+            "a.txt",
+            "b.md",
+            os.path.join("sub", "c.py"),
+            os.path.join("sub", "deep", "d.txt"),
+            os.path.join("other", "image.bin"),
+        ]
+    )
+    assert files["a.txt"].line_count == 2
+    assert files["a.txt"].sha256 == hashlib.sha256(b"one\ntwo\n").hexdigest()
+    assert files["a.txt"].inode == os.stat(folder / "a.txt").st_ino
+    assert files["b.md"].line_count == 1
+    assert files[os.path.join("sub", "deep", "d.txt")].line_count == 0
+    assert files[os.path.join("other", "image.bin")].binary
+    assert not files["a.txt"].binary
+
+
+def test_unchanged_folder_is_not_listed_again(folder, index):
+    index.refresh(str(folder))
+
+    result = index.refresh(str(folder))
+
+    assert (result.dirs_listed, result.files_hashed, result.removed) == (0, 0, 0)
+
+
+def test_only_changed_directories_are_listed(folder, index):
+    """Перечитывается только изменённая директория; неизменные файлы не хэшируются."""
+    index.refresh(str(folder))
+    (folder / "sub" / "new.txt").write_text("new\n")
+    (folder / "sub" / "c.py").unlink()
+    _touch_dir(folder / "sub", 5)
+
+    result = index.refresh(str(folder))
+
+    assert (result.dirs_listed, result.files_hashed, result.removed) == (1, 1, 1)
+    names = [f.relative_path for f in index.files(str(folder))]
+    assert os.path.join("sub", "new.txt") in names
+    assert os.path.join("sub", "c.py") not in names
+
+
+def test_removed_directory_is_forgotten(folder, index):
+    index.refresh(str(folder))
+    (folder / "sub" / "deep" / "d.txt").unlink()
+    (folder / "sub" / "deep").rmdir()
+    _touch_dir(folder / "sub", 5)
+
+    result = index.refresh(str(folder))
+
+    assert result.removed == 2
+    with pytest.raises(PermissionError):
+        index.list_directory(str(folder / "sub" / "deep"))
+
+
+def test_in_place_edit_is_picked_up(folder, index):
+    """Файл, переписанный на месте, обновляется, хотя директория не изменилась."""
+    index.refresh(str(folder))
+    before = index.manifest(str(folder))
+    with open(folder / "a.txt", "a") as f:
+        f.write("three\n")
+
+    result = index.refresh(str(folder))
+
+    assert (result.dirs_listed, result.files_hashed) == (0, 1)
+    assert index.files(str(folder), extensions=[".txt"])[0].line_count == 3
+    assert index.manifest(str(folder)) == directory_manifest(str(folder))
+    assert index.manifest(str(folder)) != before
+
+
+def test_refresh_does_not_block_readers_while_hashing(folder, index, monkeypatch):
+    """Пока файл хэшируется, другие запросы к индексу не ждут."""
+    index.refresh(str(folder))
+    (folder / "new.txt").write_text("new\n")
+    _touch_dir(folder, 5)
+    hashing = threading.Event()
+    release = threading.Event()
+    describe = folder_index_module.describe_content
+
+    def slow_describe(path):
+        hashing.set()
+        release.wait(5)
+        return describe(path)
+
+    monkeypatch.setattr(folder_index_module, "describe_content", slow_describe)
+    worker = threading.Thread(target=index.refresh, args=(str(folder),))
+    worker.start()
+    try:
+        assert hashing.wait(5)
+        assert len(index.files(str(folder))) == 5
+    finally:
+        release.set()
+        worker.join()
+    assert len(index.files(str(folder))) == 6
+
+
+@pytest.mark.parametrize(
+    "max_depth, extensions", [(0, None), (1, None), (0, [".txt"]), (2, [".py", ".md"])]
+)
+def test_manifest_matches_directory_walk(folder, index, max_depth, extensions):
+    index.refresh(str(folder))
+
+    assert index.manifest(str(folder), max_depth, extensions) == directory_manifest(
+        str(folder), max_depth, extensions
+    )
+
+
+def test_scan_with_index_lister_matches_disk_scan(folder, index):
+    index.refresh(str(folder))
+
+    def by_path(files):
+        return sorted(files, key=lambda f: f["relative_path"])
+
+    assert by_path(
+        scan_directory(str(folder), 2, lister=index.list_directory)
+    ) == by_path(scan_directory(str(folder), 2))
+    assert by_path(
+        list_folder_files(str(folder), lister=index.list_directory)
+    ) == by_path(list_folder_files(str(folder)))
+
+
+def test_files_sort_modes(folder, index):
+    for offset, name in enumerate(["b.md", "a.txt"]):
+        stat = os.stat(folder / name)
+        os.utime(folder / name, ns=(stat.st_atime_ns, 1_000_000_000 * (offset + 1)))
+    index.refresh(str(folder))
+
+    assert [f.relative_path for f in index.files(str(folder))][:2] == ["a.txt", "b.md"]
+    assert [f.relative_path for f in index.files(str(folder), sort_mode="date_asc")][
+        :2
+    ] == ["b.md", "a.txt"]
+    assert index.files(str(folder), sort_mode="size")[0].relative_path == "b.md"
+
+
+def test_index_persists_between_connections(folder, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "persisted.sqlite")
+    first = FolderIndex(db_path)
+    first.refresh(str(folder))
+    first.close()
+
+    second = FolderIndex(db_path)
+    try:
+        hashed = []
+        monkeypatch.setattr(
+            folder_index_module,
+            "describe_content",
+            lambda path: hashed.append(path) or None,
+        )
+        assert second.refresh(str(folder)).dirs_listed == 0
+        assert hashed == []
+        assert len(second.files(str(folder))) == 5
+    finally:
+        second.close()
+
+
+def test_links_are_indexed_once(folder, index, tmp_path):
+    """Циклы из ссылок и жёсткие ссылки не повторяются в выдаче индекса."""
+    try:
+        os.symlink(str(folder), str(folder / "sub" / "loop"))
+        os.symlink(str(folder / "other"), str(folder / "alias"))
+        os.link(str(folder / "a.txt"), str(folder / "sub" / "hard.txt"))
+    except (OSError, NotImplementedError):
+        pytest.skip("symbolic or hard links are not supported here")
+
+    index.refresh(str(folder))
+
+    names = [f.relative_path for f in index.files(str(folder))]
+    assert len(names) == 5
+    assert "a.txt" in names
+    assert os.path.join("alias", "image.bin") in names
+    by_walk = scan_directory(str(folder), lister=index.list_directory)
+    assert sorted(f["relative_path"] for f in by_walk) == sorted(names)
+    assert len(index.files(str(folder), follow_symlinks=False)) == 5
+    without_links = {f.relative_path for f in index.files(str(folder), follow_symlinks=False)}
+    assert os.path.join("other", "image.bin") in without_links
@@ -0,0 +1,68 @@
+import pytest
+
+from backend.src.shared.combine_logic import combine_files_content
+from backend.src.shared.scan_logic import scan_directory
+from tests.memory_helpers import assert_peak_within, generate_corpus, measure_peak
+
+# Допустимый пик выделений памяти в долях от размера входных данных; в
+# комментариях — пик, измеренный на этом корпусе (CPython 3.11), запас 5–10%.
+PEAK_LIMITS = {
+    # 2.05x: результат (1.02x) плюс копии файлов, в которых схлопываются серии
+    # пустых строк (~1x), — обе живы во время "".join
+    "markdown": 2.25,
+    # 2.35x: json.dumps с indent кодирует на Python — список фрагментов с
+    # экранированным содержимым (~1x) и их склейка (1.06x)
+    "json": 2.5,
+    # 6.38x: PyYAML строит узлы и события для всего документа, эмиттер
+    # собирает результат (1.14x) в StringIO и копирует его в getvalue
+    "yaml": 7.0,
+}
+# Предобработка создаёт новую копию содержимого каждого файла
+PREPROCESSING_ALLOWANCE = 1.0
+ALL_PREPROCESSING = {
+    "remove_extra_empty_lines": True,
+    "normalize_line_endings": True,
+    "remove_trailing_whitespace": True,
+}
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    root = tmp_path_factory.mktemp("corpus")
+    size = generate_corpus(root)
+    return scan_directory(str(root)), size
+
+
+def _combine(files, output_format, options=None):
+    return lambda: combine_files_content(files, "name", None, options, output_format)
+
+
+@pytest.mark.parametrize("output_format", ["markdown", "json", "yaml"])
+def test_combine_peak_memory_is_bounded(corpus, output_format):
+    """Пик памяти при объединении не превышает заданной доли от размера входа."""
+    files, size = corpus
+
+    measurement = measure_peak(_combine(files, output_format))
+
+    assert_peak_within(measurement, size, PEAK_LIMITS[output_format], output_format)
+
+
+@pytest.mark.parametrize("output_format", ["markdown", "json"])
+def test_combine_with_preprocessing_peak_memory_is_bounded(corpus, output_format):
+    """Предобработка добавляет не больше одной копии содержимого."""
+    files, size = corpus
+
+    measurement = measure_peak(_combine(files, output_format, ALL_PREPROCESSING))
+
+    limit = PEAK_LIMITS[output_format] + PREPROCESSING_ALLOWANCE
+    assert_peak_within(measurement, size, limit, f"{output_format}+preprocessing")
+
+
+def test_markdown_without_blank_line_runs_does_not_copy_content(tmp_path):
+    """Файлы без серий пустых строк попадают в результат без промежуточных копий."""
+    size = generate_corpus(tmp_path, blank_line_density=0)
+    files = scan_directory(str(tmp_path))
+
+    measurement = measure_peak(_combine(files, "markdown"))
+
+    assert_peak_within(measurement, size, 1.5, "markdown")
@@ -0,0 +1,98 @@
+import builtins
+import io
+
+import pytest
+
+from backend.src.shared import passthrough, scan_logic
+from backend.src.shared.combine_logic import combine_files_content
+from backend.src.shared.passthrough import can_pass_through, write_folder_markdown
+from backend.src.shared.scan_logic import scan_directory
+from backend.src.shared.stats import CombineStats
+
+FILES = {
+    "plain.txt": b"first line\nsecond line\n",
+    "utf8.md": "\n\nзаголовок\n\n\n\nтекст с ё".encode("utf-8") + b"\n\n\n\n",
+    "crlf.txt": b"windows\r\nline endings\r\n",
+    "invalid.bin": b"bad \xff byte\n",
+    "cut.txt": "обрыв ".encode("utf-8") + "ж".encode("utf-8")[:1],
+    "empty.txt": b"",
+    "newlines.txt": b"\n\n\n",
+    "sub/nested.py": b"x = 1\n\n\n\ny = 2",
+}
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    # Маленькие блоки: серии переводов строк и символы UTF-8 попадают на стыки
+    monkeypatch.setattr(passthrough, "CHUNK_SIZE", 3)
+    for name, data in FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(data)
+    return tmp_path
+
+
+@pytest.mark.parametrize("sort_mode", ["name", "date_asc", "date_desc"])
+def test_output_matches_text_path(folder, sort_mode):
+    """Байты документа и индекс разделов те же, что при декодировании файлов."""
+    expected_index = []
+    expected = combine_files_content(
+        scan_directory(str(folder)), sort_mode, section_index=expected_index
+    ).encode("utf-8")
+
+    out = io.BytesIO()
+    section_index = []
+    write_folder_markdown(out, str(folder), sort_mode=sort_mode, section_index=section_index)
+
+    assert out.getvalue() == expected
+    assert section_index == expected_index
+
+
+def test_unreadable_file_is_left_out_like_in_text_path(folder, monkeypatch):
+    """Файл без прав на чтение пропускается целиком, вместе со строкой оглавления."""
+    locked = str(folder / "sub" / "nested.py")
+
+    def guarded_open(path, *args, **kwargs):
+        if str(path) == locked:
+            raise PermissionError(path)
+        return builtins.open(path, *args, **kwargs)
+
+    monkeypatch.setattr(passthrough, "open", guarded_open, raising=False)
+    monkeypatch.setattr(scan_logic, "open", guarded_open, raising=False)
+    expected_index = []
+    expected = combine_files_content(
+        scan_directory(str(folder)), section_index=expected_index
+    ).encode("utf-8")
+
+    out = io.BytesIO(b"prefix")
+    out.seek(0, io.SEEK_END)
+    section_index = []
+    write_folder_markdown(out, str(folder), section_index=section_index)
+
+    assert "nested.py" not in expected.decode("utf-8")
+    assert out.getvalue() == b"prefix" + expected
+    assert section_index == expected_index
+
+
+def test_invalid_files_fall_back_to_decoding(folder):
+    """Файлы с '\\r' и невалидным UTF-8 читаются заново обычным путём."""
+    stats = CombineStats()
+    write_folder_markdown(io.BytesIO(), str(folder), stats=stats)
+
+    # crlf.txt, invalid.bin и cut.txt декодируются, остальные копируются
+    assert stats.counters["files_read"] == len(FILES)
+    assert stats.counters["files_passed_through"] == len(FILES) - 3
+
+
+def test_empty_folder(tmp_path):
+    out = io.BytesIO()
+    write_folder_markdown(out, str(tmp_path))
+
+    assert out.getvalue() == combine_files_content([]).encode("utf-8")
+
+
+def test_only_plain_markdown_passes_through():
+    assert can_pass_through({}, "markdown")
+    assert can_pass_through({"remove_extra_empty_lines": False}, "markdown")
+    assert not can_pass_through({"remove_extra_empty_lines": True}, "markdown")
+    assert not can_pass_through({}, "json")
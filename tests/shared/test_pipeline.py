@@ -0,0 +1,115 @@
+from importlib import metadata
+
+import pytest
+
+from backend.src.shared import pipeline
+from backend.src.shared.pipeline import (
+    ENTRY_POINT_GROUP,
+    FileContext,
+    Stage,
+    build_pipeline,
+    register_stage,
+)
+
+
+class LineNumbers(Stage):
+    """Построчный этап с состоянием: номер строки в начале каждой строки."""
+
+    name = "line_numbers"
+    order = 200
+    fusable = True
+
+    def line_transform(self, context: FileContext):
+        numbers = iter(range(1, 1 << 62))
+        return lambda line: f"{next(numbers)}: {line}"
+
+
+class ExpandTabs(Stage):
+    name = "expand_tabs"
+    fusable = True
+
+    def line_transform(self, context: FileContext):
+        return lambda line: line.expandtabs(4)
+
+
+class UpperCase(Stage):
+    """Этап над всем текстом: разрывает слияние построчных этапов."""
+
+    name = "upper"
+    order = 35
+
+    def process(self, content: str, context: FileContext) -> str:
+        return content.upper()
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Каждый тест работает со своей копией реестра
+    monkeypatch.setattr(
+        pipeline, "_stages", {k: list(v) for k, v in pipeline._stages.items()}
+    )
+    monkeypatch.setattr(pipeline, "_pipelines", {})
+    monkeypatch.setattr(pipeline, "_entry_points", None)
+
+
+def test_line_stages_are_fused_into_one_pass():
+    """Все построчные этапы выполняются за один проход по строкам."""
+    register_stage(LineNumbers())
+    options = {
+        "remove_trailing_whitespace": True,
+        "remove_extra_empty_lines": True,
+        "line_numbers": True,
+    }
+
+    built = build_pipeline(options)
+
+    assert built.passes == 1
+    assert built.run("a  \n\n\n\nb\t\n") == "1: a\n2: \n3: b\n4: "
+
+
+def test_whole_text_stage_splits_fused_passes():
+    register_stage(UpperCase())
+    register_stage(LineNumbers())
+    options = {"remove_trailing_whitespace": True, "upper": True, "line_numbers": True}
+
+    built = build_pipeline(options)
+
+    assert built.passes == 3
+    assert built.run("a  \nb") == "1: A\n2: B"
+
+
+def test_unknown_option_is_rejected():
+    with pytest.raises(ValueError, match="Unknown preprocessing option"):
+        build_pipeline({"no_such_stage": True})
+    # Выключенные опции не проверяются
+    assert not build_pipeline({"no_such_stage": False})
+
+
+def test_entry_point_plugins_are_loaded_lazily(monkeypatch):
+    """Модуль плагина загружается только когда его опция включена."""
+    loaded = []
+
+    class FakeEntryPoint(metadata.EntryPoint):
+        def load(self):
+            loaded.append(self.name)
+            return super().load()
+
+    entry_points = metadata.EntryPoints(
+        [
+            FakeEntryPoint(
+                "expand_tabs", f"{__name__}:ExpandTabs", ENTRY_POINT_GROUP
+            ),
+            FakeEntryPoint(
+                "line_numbers", f"{__name__}:LineNumbers", ENTRY_POINT_GROUP
+            ),
+        ]
+    )
+    monkeypatch.setattr(pipeline.metadata, "entry_points", lambda: entry_points)
+
+    assert build_pipeline({"remove_trailing_whitespace": True}).run("x \n") == "x\n"
+    assert loaded == []
+
+    assert build_pipeline({"expand_tabs": True}).run("\tx") == "    x"
+    assert loaded == ["expand_tabs"]
+    assert "line_numbers" in pipeline.available_options()
+    assert loaded == ["expand_tabs"]
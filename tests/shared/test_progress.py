@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from backend.src.shared.combine_logic import combine_files_content
+from backend.src.shared.progress import ProgressTracker
+from backend.src.shared.scan_logic import scan_directory
+
+
+def test_progress_counts_scan_and_render_stages(tmp_path):
+    """Хуки обхода, чтения и рендеринга обновляют счётчики трекера."""
+    (tmp_path / "a.txt").write_text("12345")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.txt").write_text("678")
+    progress = ProgressTracker()
+
+    files = scan_directory(str(tmp_path), progress=progress)
+    combine_files_content(files, progress=progress)
+    progress.finish()
+
+    snapshot = progress.snapshot()
+    assert snapshot["directories_walked"] == 2
+    assert snapshot["files_matched"] == 2
+    assert snapshot["bytes_read"] == 8
+    assert snapshot["files_rendered"] == 2
+    assert snapshot["files_total"] == 2
+    assert snapshot["stage"] == "done"
+    assert snapshot["eta_seconds"] == 0.0
+
+
+def test_progress_notifies_subscribers_with_throttling():
+    """Подписчики получают принудительные события и не чаще min_interval остальные."""
+    progress = ProgressTracker(min_interval=3600)
+    events = []
+    unsubscribe = progress.subscribe(events.append)
+    file_data_list = [
+        {"name": f"f{i}.txt", "content": "x", "last_modified": datetime(2024, 1, 1)}
+        for i in range(5)
+    ]
+
+    combine_files_content(file_data_list, progress=progress)
+    unsubscribe()
+    progress.finish()
+
+    # Только принудительное событие начала рендеринга: остальные подавлены.
+    assert [e["stage"] for e in events] == ["render"]
+
+
+def test_structured_formats_have_no_eta_before_serialization():
+    """JSON отмечает файлы после сериализации, поэтому до неё оценки нет."""
+    progress = ProgressTracker(min_interval=0)
+    events = []
+    progress.subscribe(events.append)
+    progress.expect(5, 5)
+    file_data_list = [
+        {"name": f"f{i}.txt", "content": "x", "last_modified": datetime(2024, 1, 1)}
+        for i in range(5)
+    ]
+
+    combine_files_content(file_data_list, output_format="json", progress=progress)
+
+    assert events[0]["files_expected"] == 5
+    assert events[0]["bytes_expected"] == 5
+    render = [e for e in events if e["stage"] == "render"]
+    assert render[0]["files_rendered"] == 0
+    assert render[0]["eta_seconds"] is None
+    assert render[-1]["files_rendered"] == 5
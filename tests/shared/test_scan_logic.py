@@ -0,0 +1,165 @@
+import os
+
+import pytest
+
+from backend.src.shared.scan_logic import (
+    ScanCache,
+    directory_manifest,
+    list_folder_files,
+    read_file_group,
+    scan_directory,
+    walk_files,
+)
+from backend.src.shared.stats import CombineStats
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_scan_directory_recursive_with_depth_and_extensions(tmp_path):
+    """Сканирование учитывает глубину, фильтр расширений и относительные пути."""
+    _write(str(tmp_path / "a.txt"), "A")
+    _write(str(tmp_path / "b.py"), "B")
+    _write(str(tmp_path / "sub" / "c.txt"), "C")
+    _write(str(tmp_path / "sub" / "deep" / "d.txt"), "D")
+
+    files = scan_directory(str(tmp_path), max_depth=1, extensions=[".txt"])
+    names = sorted(f["name"] for f in files)
+
+    assert names == ["a.txt", os.path.join("sub", "c.txt")]
+    assert all("relative_path" in f for f in files)
+
+
+def test_scan_directory_replaces_invalid_utf8(tmp_path):
+    """Невалидный UTF-8 читается с символами замены."""
+    (tmp_path / "bad.txt").write_bytes(b"ok \xff\xfe end")
+
+    files = scan_directory(str(tmp_path))
+
+    assert files[0]["content"] == "ok �� end"
+
+
+def test_scan_cache_reuses_listings_and_reads(tmp_path):
+    """Повторное сканирование с общим кэшем не обращается к диску повторно."""
+    _write(str(tmp_path / "a.txt"), "A")
+    _write(str(tmp_path / "sub" / "b.txt"), "B")
+    cache = ScanCache()
+
+    first = scan_directory(str(tmp_path), cache=cache)
+    misses = cache.misses
+    second = scan_directory(str(tmp_path), cache=cache)
+
+    assert cache.misses == misses
+    assert cache.hits >= misses
+    assert sorted(f["content"] for f in first) == sorted(f["content"] for f in second)
+
+
+def test_scan_cache_builds_paths_for_each_caller(tmp_path):
+    """Листинг, прочитанный через ссылку, даёт верные имена обходу по реальному пути."""
+    _write(str(tmp_path / "real" / "a.txt"), "A")
+    try:
+        os.symlink(str(tmp_path / "real"), str(tmp_path / "link"))
+    except (OSError, NotImplementedError):
+        pytest.skip("symbolic links are not supported here")
+    cache = ScanCache()
+
+    via_link = scan_directory(str(tmp_path / "link"), cache=cache)
+    direct = scan_directory(str(tmp_path / "real"), cache=cache)
+
+    assert cache.hits >= 1
+    assert [f["name"] for f in via_link] == [f["name"] for f in direct] == ["a.txt"]
+    listing = cache.list_directory(str(tmp_path / "real"))
+    assert [entry.path for entry in listing] == [str(tmp_path / "real" / "a.txt")]
+
+
+def test_read_file_group_names_relative_to_common_parent(tmp_path):
+    """Имена файлов группы строятся от общего родительского каталога."""
+    _write(str(tmp_path / "x" / "same.txt"), "X")
+    _write(str(tmp_path / "y" / "same.txt"), "Y")
+
+    files = read_file_group(
+        [str(tmp_path / "x" / "same.txt"), str(tmp_path / "y" / "same.txt")]
+    )
+
+    assert [f["name"] for f in files] == [
+        os.path.join("x", "same.txt"),
+        os.path.join("y", "same.txt"),
+    ]
+
+
+def test_scan_directory_parallel_reads_keep_order_and_stats(tmp_path):
+    """Чтение пулом потоков даёт тот же результат и те же счётчики."""
+    for i in range(20):
+        _write(str(tmp_path / f"d{i % 3}" / f"f{i}.txt"), f"файл {i}")
+    serial_stats, parallel_stats = CombineStats(), CombineStats()
+
+    serial = scan_directory(str(tmp_path), stats=serial_stats)
+    parallel = scan_directory(str(tmp_path), stats=parallel_stats, workers=4)
+
+    assert parallel == serial
+    assert parallel_stats.counters == serial_stats.counters
+    assert parallel_stats.counters["files_read"] == 20
+
+
+@pytest.fixture
+def linked_tree(tmp_path):
+    """Дерево с циклом из ссылок, двумя ссылками на одну папку и жёсткой ссылкой."""
+    root = tmp_path / "root"
+    _write(str(root / "a.txt"), "A")
+    _write(str(root / "sub" / "b.txt"), "B")
+    _write(str(tmp_path / "outside" / "c.txt"), "C")
+    try:
+        os.symlink(str(root), str(root / "sub" / "loop"))
+        os.symlink(str(tmp_path / "outside"), str(root / "first"))
+        os.symlink(str(tmp_path / "outside"), str(root / "second"))
+        os.link(str(root / "a.txt"), str(root / "hard.txt"))
+    except (OSError, NotImplementedError):
+        pytest.skip("symbolic or hard links are not supported here")
+    return root
+
+
+def test_scan_directory_reads_every_file_once(linked_tree):
+    """Цикл не зацикливает обход, а файл под несколькими путями читается один раз."""
+    files = scan_directory(str(linked_tree))
+
+    contents = sorted(f["content"] for f in files)
+    assert contents == ["A", "B", "C"]
+    names = {f["name"] for f in files}
+    assert {os.path.join("first", "c.txt"), os.path.join("second", "c.txt")} & names
+    assert {"a.txt", "hard.txt"} & names
+    assert directory_manifest(str(linked_tree)).file_count == 3
+    assert len(list_folder_files(str(linked_tree))) == 3
+
+
+def test_scan_directory_without_following_symlinks(linked_tree):
+    """Без follow_symlinks ссылки пропускаются; жёсткие ссылки - нет, но без повторов."""
+    files = scan_directory(str(linked_tree), follow_symlinks=False)
+
+    assert sorted(f["content"] for f in files) == ["A", "B"]
+    manifest = directory_manifest(str(linked_tree), follow_symlinks=False)
+    assert manifest.file_count == 2
+
+
+@pytest.mark.parametrize("max_depth", [0, 1, 2])
+def test_manifest_walk_keeps_the_aliases_the_scan_reads(tmp_path, max_depth):
+    """Манифест и чтение выбирают одни и те же пути к папке с двумя путями."""
+    root = tmp_path / "root"
+    _write(str(root / "x" / "real" / "f.txt"), "F")
+    _write(str(root / "x" / "g.txt"), "G")
+    (root / "a").mkdir()
+    try:
+        os.symlink(str(root / "x" / "real"), str(root / "a" / "alias"))
+    except (OSError, NotImplementedError):
+        pytest.skip("symbolic links are not supported here")
+
+    walked = sorted(
+        os.path.relpath(entry.path, str(root))
+        for entry, _ in walk_files(str(root), max_depth)
+    )
+
+    scanned = sorted(f["relative_path"] for f in scan_directory(str(root), max_depth))
+    assert walked == scanned
+    assert directory_manifest(str(root), max_depth).file_count == len(scanned)
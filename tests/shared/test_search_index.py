@@ -0,0 +1,138 @@
+import os
+
+from backend.src.shared.search_index import SearchIndex, required_literals
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_search_finds_lines_and_uses_trigram_candidates(tmp_path):
+    """Поиск возвращает файлы со строками совпадений и читает только кандидатов."""
+    _write(str(tmp_path / "a.py"), "import os\n\ndef parse_config():\n    pass\n")
+    _write(str(tmp_path / "b.py"), "def other():\n    parse_config()\n")
+    _write(str(tmp_path / "sub" / "c.md"), "nothing to see\n")
+    index = SearchIndex()
+    index.update(str(tmp_path))
+
+    results, candidates = index.search(str(tmp_path), "parse_config")
+
+    assert candidates == 2
+    assert [r.relative_path for r in results] == ["a.py", "b.py"]
+    assert [(m.line, m.text) for m in results[0].matches] == [
+        (3, "def parse_config():")
+    ]
+    assert results[1].matches[0].line == 2
+
+
+def test_search_regex_and_ignore_case(tmp_path):
+    """Регулярные выражения и поиск без учёта регистра."""
+    _write(str(tmp_path / "a.txt"), "Class Foo:\nclass   Bar:\n")
+    index = SearchIndex()
+    index.update(str(tmp_path))
+
+    results, _ = index.search(str(tmp_path), r"class\s+\w+", regex=True)
+    assert [m.line for m in results[0].matches] == [2]
+
+    results, _ = index.search(
+        str(tmp_path), r"class\s+\w+", regex=True, ignore_case=True
+    )
+    assert [m.line for m in results[0].matches] == [1, 2]
+
+
+def test_update_is_incremental(tmp_path):
+    """Повторное обновление читает только изменённые файлы и удаляет исчезнувшие."""
+    _write(str(tmp_path / "a.txt"), "alpha")
+    _write(str(tmp_path / "b.txt"), "beta")
+    index = SearchIndex()
+
+    assert index.update(str(tmp_path)) == (2, 2, 0)
+    assert index.update(str(tmp_path)) == (2, 0, 0)
+
+    _write(str(tmp_path / "a.txt"), "gamma and more")
+    os.remove(tmp_path / "b.txt")
+    assert index.update(str(tmp_path)) == (1, 1, 1)
+    assert index.search(str(tmp_path), "alpha")[0] == []
+    assert len(index.search(str(tmp_path), "gamma")[0]) == 1
+
+
+def test_search_respects_depth_and_extensions(tmp_path):
+    """Глубина и фильтр расширений ограничивают область поиска."""
+    _write(str(tmp_path / "a.txt"), "needle")
+    _write(str(tmp_path / "a.md"), "needle")
+    _write(str(tmp_path / "sub" / "deep" / "b.txt"), "needle")
+    index = SearchIndex()
+    index.update(str(tmp_path))
+
+    results, _ = index.search(str(tmp_path), "needle", max_depth=1, extensions=[".txt"])
+
+    assert [r.relative_path for r in results] == ["a.txt"]
+
+
+def test_least_recently_used_root_is_evicted(tmp_path):
+    """При превышении предела вытесняется давно не использованный корень целиком."""
+    for name in ("one", "two", "three"):
+        _write(str(tmp_path / name / "a.txt"), f"needle {name}")
+        _write(str(tmp_path / name / "b.txt"), "other")
+    index = SearchIndex(max_files=4)
+
+    index.update(str(tmp_path / "one"))
+    index.update(str(tmp_path / "two"))
+    # Поиск в "one" делает его свежее, чем "two"
+    index.search(str(tmp_path / "one"), "needle")
+    index.update(str(tmp_path / "three"))
+
+    assert len(index) == 4
+    assert index.candidates(str(tmp_path / "two"), ["needle"]) == []
+    assert len(index.search(str(tmp_path / "one"), "needle")[0]) == 1
+    assert len(index.search(str(tmp_path / "three"), "needle")[0]) == 1
+    # Вытесненный корень индексируется заново при следующем обновлении
+    assert index.update(str(tmp_path / "two")) == (2, 2, 0)
+    assert len(index) == 4
+
+
+def test_eviction_keeps_files_shared_with_other_roots(tmp_path):
+    """Из вытесненного корня остаются файлы, которые нужны вложенному корню."""
+    base, other = tmp_path / "base", tmp_path / "other"
+    _write(str(base / "a.txt"), "needle")
+    _write(str(base / "sub" / "b.txt"), "needle")
+    _write(str(other / "c.txt"), "needle")
+    _write(str(other / "d.txt"), "needle")
+    index = SearchIndex(max_files=3)
+
+    index.update(str(base))
+    index.update(str(base / "sub"))
+    index.update(str(other))
+
+    assert len(index) == 3
+    assert index.candidates(str(base), ["needle"]) == [str(base / "sub" / "b.txt")]
+    results, _ = index.search(str(base / "sub"), "needle")
+    assert [r.relative_path for r in results] == ["b.txt"]
+
+
+def test_root_larger_than_the_cap_is_searched_without_index(tmp_path):
+    """Корень больше предела не индексируется, но поиск находит все совпадения."""
+    for name in ("a", "b", "c"):
+        _write(str(tmp_path / f"{name}.txt"), f"needle {name}")
+    index = SearchIndex(max_files=2)
+
+    assert index.update(str(tmp_path)) == (0, 0, 0)
+    assert len(index) == 0
+
+    results, candidates = index.search(str(tmp_path), "needle")
+    assert candidates == 3
+    assert [r.relative_path for r in results] == ["a.txt", "b.txt", "c.txt"]
+    assert len(index.matching_paths(str(tmp_path), "needle")) == 3
+
+    os.remove(tmp_path / "c.txt")
+    assert index.update(str(tmp_path)) == (2, 2, 0)
+    assert len(index.search(str(tmp_path), "needle")[0]) == 2
+
+
+def test_required_literals():
+    """Из регулярного выражения извлекаются только обязательные литералы верхнего уровня."""
+    assert required_literals(r"class\s+Foo") == ["class", "Foo"]
+    assert required_literals("foo|bar") == []
+    assert required_literals("ab.cd") == []
@@ -0,0 +1,28 @@
+from backend.src.shared.combine_logic import combine_files_content
+from backend.src.shared.scan_logic import scan_directory
+from backend.src.shared.stats import STAGES, CombineStats
+
+
+def test_combine_stats_records_all_stages(tmp_path):
+    """Сканирование и объединение заполняют длительности всех этапов."""
+    (tmp_path / "a.txt").write_text("line  \n\n\n\nnext")
+    (tmp_path / "b.txt").write_text("b")
+    stats = CombineStats()
+
+    files = scan_directory(str(tmp_path), stats=stats)
+    combine_files_content(
+        files, preprocessing_options={"remove_extra_empty_lines": True}, stats=stats
+    )
+
+    assert set(stats.durations) == set(STAGES)
+    assert all(seconds >= 0 for seconds in stats.durations.values())
+    assert stats.counters == {"bytes_read": 15, "files_read": 2, "files_rendered": 2}
+
+
+def test_scan_directory_translates_line_endings_like_text_mode(tmp_path):
+    """Чтение в бинарном режиме сохраняет поведение текстового режима для CRLF/CR."""
+    (tmp_path / "crlf.txt").write_bytes(b"a\r\nb\rc\n")
+
+    files = scan_directory(str(tmp_path))
+
+    assert files[0]["content"] == "a\nb\nc\n"